@@ -9,17 +9,126 @@ STAR_COLORS = {
     'pulsar': 1
 }
 
+# Galaxy map star markers, combined into the status of a star image.
+STAR_VISITED = 1
+STAR_CLEARED = 2
+STAR_DOCKED = 4
+
+# Image cache kinds; the variant picks colour/type within a kind.
+IMG_STAR = 'star'
+IMG_STAR_STATUS = 'star_status'
+IMG_CURSOR = 'cursor'
+IMG_SHIP = 'ship'
+IMG_ENEMY = 'enemy'
+IMG_BOMBER = 'bomber'
+IMG_DRONE = 'drone'
+IMG_LASER = 'laser'
+IMG_LOOT = 'loot'
+IMG_EXPLORER = 'explorer'
+IMG_RESOURCE = 'resource'
+IMG_GROUND_ENEMY = 'ground_enemy'
+IMG_TILE = 'tile'
+
+# Terrain tile colours per biome (galaxy.PLANET_BIOMES order):
+# floor, rock, water, feature.
+TILE_COLORS = [
+    [9, 1, 8, 13],
+    [4, 14, 8, 5],
+    [7, 6, 8, 5],
+    [6, 15, 2, 4],
+    [1, 11, 8, 13],
+    [5, 10, 8, 3]
+]
+
+# Images kept after trim_images(); comfortably above one scene's working set.
+IMAGE_CACHE_BUDGET = 24
+
+_image_cache = {}
+_image_order = []
+
+
+def get_image(kind, variant):
+    # Shared image for (kind, variant), drawn once. Callers must not draw on
+    # it; clone() it for a private copy.
+    key = kind + ':' + str(variant)
+    img = _image_cache.get(key)
+    if img is None:
+        img = _build_image(kind, variant)
+        _image_cache[key] = img
+        _image_order.append(key)
+    return img
+
+
+def trim_images(budget=IMAGE_CACHE_BUDGET):
+    # Forget the oldest cached images until at most `budget` remain. Sprites
+    # still showing an evicted image keep their reference.
+    while len(_image_order) > budget:
+        key = _image_order.pop(0)
+        _image_cache.pop(key)
+
+
+def _build_image(kind, variant):
+    if kind == IMG_STAR:
+        return make_star_image(variant)
+    if kind == IMG_STAR_STATUS:
+        return _make_status_star_image(variant >> 3, variant & 7)
+    if kind == IMG_CURSOR:
+        return make_cursor_image()
+    if kind == IMG_SHIP:
+        return make_ship_icon()
+    if kind == IMG_ENEMY:
+        return make_enemy_image(variant)
+    if kind == IMG_BOMBER:
+        return _make_block_image(14, 14, 1, _enemy_color(variant))
+    if kind == IMG_DRONE:
+        return _make_block_image(6, 6, 1, _enemy_color(variant))
+    if kind == IMG_LASER:
+        return _make_block_image(2, 4, 0, 9)
+    if kind == IMG_LOOT:
+        return _make_block_image(4, 4, 0, 2)
+    if kind == IMG_EXPLORER:
+        return _make_block_image(12, 12, 2, 11)
+    if kind == IMG_RESOURCE:
+        return _make_block_image(6, 6, 0, 13)
+    if kind == IMG_GROUND_ENEMY:
+        return _make_block_image(10, 10, 1, 2)
+    if kind == IMG_TILE:
+        return make_tile_image(variant)
+    return image.create(1, 1)
+
+
+def star_image(star_type, status):
+    # Shared map image for a star of `star_type` with STAR_* status bits.
+    if status == 0:
+        return get_image(IMG_STAR, star_type)
+    return get_image(IMG_STAR_STATUS, _star_color(star_type) * 8 + status)
+
 
 def make_star_image(star_type):
-    color = 7
+    return _make_status_star_image(_star_color(star_type), 0)
+
+
+def _star_color(star_type):
     if star_type in STAR_COLORS:
-        color = STAR_COLORS[star_type]
+        return STAR_COLORS[star_type]
+    return 7
+
+
+def _make_status_star_image(color, status):
+    # Visited stars are filled; cleared and docked add a corner marker.
     img = image.create(8, 8)
     img.fill(0)
     center = 4
     radius = 3
-    img.draw_circle(center, center, radius, color)
+    if status & STAR_VISITED:
+        img.fill_circle(center, center, radius, color)
+    else:
+        img.draw_circle(center, center, radius, color)
     img.set_pixel(center, center, 15)
+    if status & STAR_CLEARED:
+        img.set_pixel(7, 0, 7)
+    if status & STAR_DOCKED:
+        img.set_pixel(0, 0, 9)
     return img
 
 
@@ -46,4 +155,37 @@ def make_ship_icon():
     img.fill_rect(0, 4, 12, 4, 13)
     img.fill_rect(4, 4, 4, 8, 1)
     return img
-
+
+
+def make_enemy_image(difficulty):
+    return _make_block_image(10, 10, 2, _enemy_color(difficulty))
+
+
+def _enemy_color(difficulty):
+    color = 10
+    if difficulty >= 2:
+        color = 7
+    if difficulty >= 3:
+        color = 2
+    return color
+
+
+def make_tile_image(variant):
+    # variant = biome index * 4 + tile type.
+    colors = TILE_COLORS[(variant >> 2) % len(TILE_COLORS)]
+    tile = variant & 3
+    img = image.create(16, 16)
+    img.fill(colors[tile])
+    if tile == 1:
+        img.draw_rect(0, 0, 16, 16, 15)
+    elif tile == 3:
+        img.fill_rect(5, 5, 6, 6, 1)
+    return img
+
+
+def _make_block_image(width, height, inset, color):
+    # Solid square centred in a transparent frame `inset` pixels wide.
+    img = image.create(width, height)
+    img.fill(0)
+    img.fill_rect(inset, inset, width - 2 * inset, height - 2 * inset, color)
+    return img
@@ -0,0 +1,218 @@
+# broadphase.py
+# Spatial-hash broadphase replacing sprites.on_overlap for scene sprites.
+#
+# Scenes register overlap rules once and add/remove the sprites that take
+# part. Every frame step() buckets registered sprites by the 16x16 cell their
+# centre is in and only tests a sprite against the 3x3 cells around it, so the
+# cost grows with the number of sprites rather than with the number of pairs.
+# Sprites must be at most one cell wide and tall for the 3x3 search to be exact.
+
+import profiler
+import scheduler
+
+CELL_SHIFT = 4
+# Below this many sprites a plain pair scan beats building the hash.
+BRUTE_FORCE_LIMIT = 12
+GRID_BITS = 4
+GRID_MASK = (1 << GRID_BITS) - 1
+BUCKET_COUNT = 1 << (2 * GRID_BITS)
+
+# Registered sprites; removed entries become None until the next compaction.
+_sprites = []
+_kinds = []
+_removed = 0
+
+# Overlap rules, dispatched as handler(sprite_of_kind_a, sprite_of_kind_b).
+_rule_a = []
+_rule_b = []
+_rule_handler = []
+
+# Per-step scratch: bucket of each registered sprite, then a counting sort of
+# registry indices by bucket. Reused across frames to avoid allocation.
+_cell_x = []
+_cell_y = []
+_bucket_start = []
+_bucket_fill = []
+_entries = []
+
+_update_registered = False
+
+
+def on_overlap(kind_a, kind_b, handler):
+    global _update_registered
+    _rule_a.append(kind_a)
+    _rule_b.append(kind_b)
+    _rule_handler.append(handler)
+    if not _update_registered:
+        scheduler.register('broadphase', step, scheduler.PRIORITY_CRITICAL)
+        _update_registered = True
+
+
+def add(sprite):
+    if sprite.data_number('broadphase') == 1:
+        return
+    sprite.set_data_number('broadphase', 1)
+    _sprites.append(sprite)
+    _kinds.append(sprite.kind())
+
+
+def remove(sprite):
+    global _removed
+    if sprite.data_number('broadphase') == 0:
+        return
+    sprite.set_data_number('broadphase', 0)
+    index = 0
+    while index < len(_sprites):
+        if _sprites[index] is sprite:
+            _sprites[index] = None
+            _removed += 1
+            return
+        index += 1
+
+
+def clear():
+    # Safe to call from an overlap handler; slots are reclaimed next step.
+    global _removed
+    index = 0
+    while index < len(_sprites):
+        if _sprites[index] is not None:
+            _sprites[index].set_data_number('broadphase', 0)
+            _sprites[index] = None
+            _removed += 1
+        index += 1
+
+
+def count():
+    return len(_sprites) - _removed
+
+
+def step():
+    if len(_rule_a) == 0:
+        return
+    _compact()
+    total = len(_sprites)
+    if total < 2:
+        return
+    hashed = total > BRUTE_FORCE_LIMIT
+    if hashed:
+        _build_buckets(total)
+    index = 0
+    while index < total:
+        kind = _kinds[index]
+        rule = 0
+        while rule < len(_rule_a) and _sprites[index] is not None:
+            if _rule_a[rule] == kind:
+                if hashed:
+                    _dispatch(index, _rule_b[rule], _rule_handler[rule])
+                else:
+                    _dispatch_all(index, total, _rule_b[rule], _rule_handler[rule])
+            rule += 1
+        index += 1
+
+
+def _compact():
+    global _removed
+    if _removed == 0:
+        return
+    write = 0
+    read = 0
+    while read < len(_sprites):
+        sprite = _sprites[read]
+        if sprite is not None:
+            _sprites[write] = sprite
+            _kinds[write] = _kinds[read]
+            write += 1
+        read += 1
+    while len(_sprites) > write:
+        _sprites.pop()
+        _kinds.pop()
+    _removed = 0
+
+
+def _build_buckets(total):
+    while len(_bucket_start) <= BUCKET_COUNT:
+        _bucket_start.append(0)
+        _bucket_fill.append(0)
+    while len(_cell_x) < total:
+        _cell_x.append(0)
+        _cell_y.append(0)
+        _entries.append(0)
+    bucket = 0
+    while bucket <= BUCKET_COUNT:
+        _bucket_start[bucket] = 0
+        bucket += 1
+    index = 0
+    while index < total:
+        sprite = _sprites[index]
+        cx = int(sprite.x) >> CELL_SHIFT
+        cy = int(sprite.y) >> CELL_SHIFT
+        _cell_x[index] = cx
+        _cell_y[index] = cy
+        _bucket_start[_bucket_of(cx, cy) + 1] += 1
+        index += 1
+    bucket = 0
+    while bucket < BUCKET_COUNT:
+        _bucket_start[bucket + 1] += _bucket_start[bucket]
+        _bucket_fill[bucket] = _bucket_start[bucket]
+        bucket += 1
+    index = 0
+    while index < total:
+        bucket = _bucket_of(_cell_x[index], _cell_y[index])
+        _entries[_bucket_fill[bucket]] = index
+        _bucket_fill[bucket] += 1
+        index += 1
+
+
+def _bucket_of(cx, cy):
+    # Cells wrap onto a 16x16 torus; far-apart cells sharing a bucket only cost
+    # an extra bounds test, never a missed overlap.
+    return ((cy & GRID_MASK) << GRID_BITS) | (cx & GRID_MASK)
+
+
+def _overlapping(a, b):
+    return a.left < b.right and b.left < a.right and a.top < b.bottom and b.top < a.bottom
+
+
+def _dispatch_all(index, total, kind_b, handler):
+    sprite = _sprites[index]
+    other_index = 0
+    while other_index < total:
+        other = _sprites[other_index]
+        if other is not None and other_index != index and _kinds[other_index] == kind_b:
+            if _overlapping(sprite, other):
+                if profiler.ENABLED:
+                    profiler.begin(profiler.SCOPE_OVERLAP)
+                handler(sprite, other)
+                if profiler.ENABLED:
+                    profiler.end(profiler.SCOPE_OVERLAP)
+                if _sprites[index] is None:
+                    return
+        other_index += 1
+
+
+def _dispatch(index, kind_b, handler):
+    sprite = _sprites[index]
+    cx = _cell_x[index]
+    cy = _cell_y[index]
+    dy = -1
+    while dy <= 1:
+        dx = -1
+        while dx <= 1:
+            bucket = _bucket_of(cx + dx, cy + dy)
+            entry = _bucket_start[bucket]
+            end = _bucket_start[bucket + 1]
+            while entry < end:
+                other_index = _entries[entry]
+                other = _sprites[other_index]
+                if other is not None and other_index != index and _kinds[other_index] == kind_b:
+                    if _overlapping(sprite, other):
+                        if profiler.ENABLED:
+                            profiler.begin(profiler.SCOPE_OVERLAP)
+                        handler(sprite, other)
+                        if profiler.ENABLED:
+                            profiler.end(profiler.SCOPE_OVERLAP)
+                        if _sprites[index] is None:
+                            return
+                entry += 1
+            dx += 1
+        dy += 1
@@ -2,12 +2,35 @@
 # Space encounter logic for SpaceGame.
 
 import assets
+import broadphase
+import enemy_ai
+import galaxy
+import hud
+import missions
+import pool
+import profiler
+import save
+import scenes
+import waves
 
 SPACE_PLAYER_KIND = SpriteKind.create()
 SPACE_ENEMY_KIND = SpriteKind.create()
 SPACE_LOOT_KIND = SpriteKind.create()
+profiler.track_kind(SPACE_PLAYER_KIND, 'ship')
+profiler.track_kind(SPACE_ENEMY_KIND, 'enm')
+profiler.track_kind(SPACE_LOOT_KIND, 'loot')
+profiler.track_kind(SpriteKind.projectile, 'las')
 
+# Enemies, loot and lasers share pool.POOL_BUDGET.
 MAX_ENEMIES = 4
+MAX_LOOT = 3
+MAX_LASERS = 4
+
+_archetype_images = [assets.IMG_ENEMY, assets.IMG_BOMBER, assets.IMG_DRONE]
+
+pool.configure(SPACE_ENEMY_KIND, MAX_ENEMIES)
+pool.configure(SPACE_LOOT_KIND, MAX_LOOT)
+pool.configure(SpriteKind.projectile, MAX_LASERS)
 
 _handlers_registered = False
 _active_state = None
@@ -21,15 +44,22 @@ def start_space_encounter(state):
     _ensure_handlers()
     _setup_player(state)
     _spawn_enemy_wave(state)
+    hud.begin_layout()
+    hud.add_field('hull', 1, 7)
+    hud.add_field('shield', 49, 9)
+    hud.add_field('credits', 109, 8)
     _update_hud(state)
 
 
 def cleanup_space_scene(state):
     global _active_state
+    broadphase.clear()
+    enemy_ai.clear()
     sprites.destroy_all_sprites_of_kind(SPACE_PLAYER_KIND)
-    sprites.destroy_all_sprites_of_kind(SPACE_ENEMY_KIND)
-    sprites.destroy_all_sprites_of_kind(SPACE_LOOT_KIND)
-    sprites.destroy_all_sprites_of_kind(SpriteKind.projectile)
+    pool.clear(SPACE_ENEMY_KIND)
+    pool.clear(SPACE_LOOT_KIND)
+    pool.clear(SpriteKind.projectile)
+    waves.clear()
     state['space_player'] = None
     state['space_enemies'] = []
     state['space_status'] = 'idle'
@@ -45,12 +75,16 @@ def space_press_a(state):
 
 def space_press_b(state):
     if state.get('space_status') == 'finished':
-        if state['active_system'].get('has_station'):
+        if galaxy.system_has_station(state['galaxy'], state['active_system']):
             return 'station'
         return 'map'
     return None
 
 
+def update_space_scene(state):
+    _release_offscreen_lasers()
+
+
 def _ensure_handlers():
     global _handlers_registered
     if _handlers_registered:
@@ -68,48 +102,72 @@ def _ensure_handlers():
         if _active_state:
             _handle_loot_pickup(_active_state, loot)
 
-    sprites.on_overlap(SPACE_PLAYER_KIND, SPACE_ENEMY_KIND, on_player_enemy)
-    sprites.on_overlap(SpriteKind.projectile, SPACE_ENEMY_KIND, on_projectile_enemy)
-    sprites.on_overlap(SPACE_PLAYER_KIND, SPACE_LOOT_KIND, on_player_loot)
+    broadphase.on_overlap(SPACE_PLAYER_KIND, SPACE_ENEMY_KIND, on_player_enemy)
+    broadphase.on_overlap(SpriteKind.projectile, SPACE_ENEMY_KIND, on_projectile_enemy)
+    broadphase.on_overlap(SPACE_PLAYER_KIND, SPACE_LOOT_KIND, on_player_loot)
     _handlers_registered = True
 
 
+def _release(sprite):
+    broadphase.remove(sprite)
+    enemy_ai.remove(sprite)
+    pool.release(sprite)
+
+
+def _release_offscreen_lasers():
+    lasers = pool.live_sprites(SpriteKind.projectile)
+    index = len(lasers) - 1
+    while index >= 0:
+        if pool.is_offscreen(lasers[index]):
+            _release(lasers[index])
+        index -= 1
+
+
 def _setup_player(state):
-    player = sprites.create(assets.make_ship_icon(), SPACE_PLAYER_KIND)
+    player = sprites.create(assets.get_image(assets.IMG_SHIP, 0), SPACE_PLAYER_KIND)
     player.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
     player.set_data_number('shield', state['player'].get('shield', 3))
     player.set_data_number('hull', state['player'].get('hull', 5))
     controller.move_sprite(player, 60, 60)
     player.set_position(80, 60)
+    broadphase.add(player)
+    enemy_ai.set_target(player)
     state['space_player'] = player
 
 
 def _spawn_enemy_wave(state):
-    system = state['active_system']
-    rng = [system['seed'] & 0xffffffff]
-    enemies = []
-    count = 0
-    while count < MAX_ENEMIES:
-        enemy = _create_enemy_sprite(rng, system['difficulty'])
-        enemies.append(enemy)
-        count += 1
-    state['space_enemies'] = enemies
-
-
-def _create_enemy_sprite(rng_state, difficulty):
-    img = image.create(10, 10)
-    img.fill(0)
-    color = 10
-    if difficulty >= 2:
-        color = 7
-    if difficulty >= 3:
-        color = 2
-    img.fill_rect(2, 2, 6, 6, color)
-    enemy = sprites.create(img, SPACE_ENEMY_KIND)
-    enemy.set_position(_rand_range(rng_state, 10, 150), _rand_range(rng_state, 10, 110))
-    enemy.set_velocity(_rand_range(rng_state, -40, 40), _rand_range(rng_state, -40, 40))
+    # Plan every wave now; only MAX_ENEMIES of them are ever sprites.
+    store = state['galaxy']
+    index = state['active_system']
+    waves.plan(galaxy.system_seed(store, index), galaxy.system_difficulty(store, index),
+               MAX_ENEMIES, enemy_ai.ARCH_COUNT)
+    state['space_enemies'] = pool.live_sprites(SPACE_ENEMY_KIND)
+    _stream_enemies(state)
+
+
+def _stream_enemies(state):
+    # Top the live enemies back up to MAX_ENEMIES from the current wave. A
+    # spawn is only taken from the wave when the pool can hold it, so one
+    # that does not fit waits for the next call (after a kill or collision).
+    difficulty = galaxy.system_difficulty(state['galaxy'], state['active_system'])
+    while pool.live_count(SPACE_ENEMY_KIND) < MAX_ENEMIES and pool.has_room(SPACE_ENEMY_KIND):
+        spawn = waves.next_spawn()
+        if spawn < 0:
+            return
+        _create_enemy_sprite(spawn, difficulty)
+
+
+def _create_enemy_sprite(spawn, difficulty):
+    archetype = waves.spawn_archetype(spawn)
+    enemy = pool.acquire(SPACE_ENEMY_KIND, _new_enemy_image)
+    if enemy is None:
+        return None
+    enemy.set_image(assets.get_image(_archetype_images[archetype], difficulty))
+    enemy.set_position(waves.spawn_x(spawn), waves.spawn_y(spawn))
+    enemy.set_velocity(waves.spawn_vx(spawn), waves.spawn_vy(spawn))
     enemy.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
-    enemy.set_data_number('hp', 2 + difficulty)
+    enemy_ai.add(enemy, archetype, difficulty)
+    broadphase.add(enemy)
     return enemy
 
 
@@ -117,37 +175,53 @@ def _fire_laser(state):
     player = state.get('space_player')
     if not player:
         return
-    img = image.create(2, 4)
-    img.fill(0)
-    img.fill_rect(0, 0, 2, 4, 9)
-    proj = sprites.create_projectile_from_sprite(img, player, 0, -90)
+    proj = pool.acquire(SpriteKind.projectile, _new_laser_image)
+    if proj is None:
+        # Every laser is still in flight.
+        return
+    proj.set_position(player.x, player.y)
+    proj.set_velocity(0, -90)
     proj.set_data_number('damage', 1 + state['player'].get('weapon', 0))
+    broadphase.add(proj)
+
+
+def _new_enemy_image():
+    return assets.get_image(assets.IMG_ENEMY, 1)
+
+
+def _new_laser_image():
+    return assets.get_image(assets.IMG_LASER, 0)
+
+
+def _new_loot_image():
+    return assets.get_image(assets.IMG_LOOT, 0)
 
 
 def _handle_projectile_hit(state, projectile, enemy):
-    projectile.destroy()
-    hp = enemy.data_number('hp') - projectile.data_number('damage')
-    if hp <= 0:
+    _release(projectile)
+    if enemy_ai.damage(enemy, projectile.data_number('damage')) <= 0:
         _enemy_destroyed(state, enemy)
-    else:
-        enemy.set_data_number('hp', hp)
 
 
 def _handle_player_collision(state, player, enemy):
-    enemy.destroy()
-    shield = player.data_number('shield')
-    if shield > 0:
-        player.set_data_number('shield', shield - 1)
-    else:
-        hull = player.data_number('hull') - 1
-        player.set_data_number('hull', hull)
-        if hull <= 0:
-            game.over(False)
+    hits = enemy_ai.contact_damage(enemy)
+    _release(enemy)
+    while hits > 0:
+        shield = player.data_number('shield')
+        if shield > 0:
+            player.set_data_number('shield', shield - 1)
+        else:
+            hull = player.data_number('hull') - 1
+            player.set_data_number('hull', hull)
+            if hull <= 0:
+                game.over(False)
+        hits -= 1
     _update_hud(state)
+    _check_wave_completion(state)
 
 
 def _handle_loot_pickup(state, loot):
-    loot.destroy()
+    _release(loot)
     state['player']['credits'] = state['player'].get('credits', 0) + 5
     _update_hud(state)
 
@@ -155,52 +229,40 @@ def _handle_loot_pickup(state, loot):
 def _enemy_destroyed(state, enemy):
     x = enemy.x
     y = enemy.y
-    enemy.destroy()
-    loot = sprites.create(image.create(4, 4), SPACE_LOOT_KIND)
-    loot.fill(0)
-    loot.fill_rect(0, 0, 4, 4, 2)
-    loot.set_position(x, y)
-    loot.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
+    _release(enemy)
+    loot = pool.acquire(SPACE_LOOT_KIND, _new_loot_image)
+    if loot is not None:
+        loot.set_position(x, y)
+        loot.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
+        broadphase.add(loot)
+    missions.notify(state, missions.EVENT_KILL, state['active_system'])
     _check_wave_completion(state)
 
 
 def _check_wave_completion(state):
-    if len(sprites.all_of_kind(SPACE_ENEMY_KIND)) > 0:
+    _stream_enemies(state)
+    if pool.live_count(SPACE_ENEMY_KIND) > 0:
+        return
+    if waves.start_next_wave():
+        hud.show_message('Wave {}/{}'.format(waves.wave_number(), waves.wave_count()))
+        _stream_enemies(state)
         return
     state['space_status'] = 'finished'
-    if state['active_system'].get('has_station'):
-        _set_hud_text(state, 'Victory! A:Land  B:Station')
+    save.mark(state['cleared'], state['active_system'])
+    if galaxy.system_has_station(state['galaxy'], state['active_system']):
+        hud.show_message('Victory! A:Land  B:Station')
     else:
-        _set_hud_text(state, 'Victory! A:Land  B:Map')
+        hud.show_message('Victory! A:Land  B:Map')
 
 
 def _update_hud(state):
     player = state.get('space_player')
     if not player:
         return
-    hull = player.data_number('hull')
-    shield = player.data_number('shield')
-    credits = state['player'].get('credits', 0)
-    msg = 'Hull {} | Shield {} | Cr {}'.format(hull, shield, credits)
-    _set_hud_text(state, msg)
-
-
-def _set_hud_text(state, text):
-    hud = state.get('hud_text')
-    if hud:
-        hud.image.fill(0)
-        hud.image.print(text, 1, 1, 1)
-
-
-def _rand_range(rng_state, minimum, maximum):
-    span = maximum - minimum + 1
-    if span <= 0:
-        return minimum
-    value = _lcg_step(rng_state)
-    return minimum + value % span
+    hud.set_field('hull', 'Hull {}'.format(player.data_number('hull')))
+    hud.set_field('shield', 'Shield {}'.format(player.data_number('shield')))
+    hud.set_field('credits', 'Cr {}'.format(state['player'].get('credits', 0)))
 
 
-def _lcg_step(state):
-    state[0] = (1103515245 * state[0] + 12345) & 0x7fffffff
-    return state[0]
-
+scenes.register(scenes.SPACE_SCENE, start_space_encounter, cleanup_space_scene,
+                space_press_a, space_press_b, None, scenes.to_map, update_space_scene)
@@ -0,0 +1,158 @@
+# enemy_ai.py
+# Space enemy archetypes with steering toward the player.
+#
+# Enemy state lives in flat parallel arrays indexed by AI slot, and tick()
+# updates every enemy in one pass at AI_EVERY scheduler steps (15 Hz). The
+# arrays hold velocity and hit points; positions stay with the sprites, which
+# the physics engine moves and bounces, and are read once per tick. Maths
+# is integer fixed point with FX_SHIFT fractional bits: the direction to the
+# player is normalised with an octagonal length estimate instead of sqrt or
+# trig, and velocity turns toward it by at most the archetype's acceleration.
+
+import scheduler
+
+FX_SHIFT = 8
+
+ARCH_INTERCEPTOR = 0
+ARCH_BOMBER = 1
+ARCH_DRONE = 2
+ARCH_COUNT = 3
+
+# Per archetype: top speed (px/s), velocity change per tick (px/s), pursuit
+# range (px), base hit points, extra hit points per difficulty level and
+# contact damage. Interceptors keep the old 2 + difficulty hit points.
+ARCH_SPEED = [60, 25, 45]
+ARCH_ACCEL = [16, 5, 10]
+ARCH_RANGE = [110, 160, 80]
+ARCH_HP = [2, 4, 1]
+ARCH_HP_STEP = [1, 1, 0]
+ARCH_DAMAGE = [1, 2, 1]
+
+# Drones aim at one of four points around the player so a swarm spreads out.
+SWARM_SPREAD = 12
+AI_EVERY = 2
+
+# Slots (parallel arrays); removal swaps the last slot into the gap.
+_sprites = []
+_arch = []
+_vx = []
+_vy = []
+_hp = []
+
+_target = None
+
+
+def add(sprite, archetype, difficulty):
+    slot = len(_sprites)
+    _sprites.append(sprite)
+    _arch.append(archetype)
+    _vx.append(int(sprite.vx) << FX_SHIFT)
+    _vy.append(int(sprite.vy) << FX_SHIFT)
+    _hp.append(ARCH_HP[archetype] + difficulty * ARCH_HP_STEP[archetype])
+    # Stored as slot + 1 so the default data number 0 means "not tracked".
+    sprite.set_data_number('ai_slot', slot + 1)
+    return slot
+
+
+def remove(sprite):
+    slot = sprite.data_number('ai_slot') - 1
+    if slot < 0:
+        return
+    sprite.set_data_number('ai_slot', 0)
+    last = len(_sprites) - 1
+    if slot != last:
+        _sprites[slot] = _sprites[last]
+        _arch[slot] = _arch[last]
+        _vx[slot] = _vx[last]
+        _vy[slot] = _vy[last]
+        _hp[slot] = _hp[last]
+        _sprites[slot].set_data_number('ai_slot', slot + 1)
+    _sprites.pop()
+    _arch.pop()
+    _vx.pop()
+    _vy.pop()
+    _hp.pop()
+
+
+def clear():
+    global _target
+    while len(_sprites) > 0:
+        remove(_sprites[len(_sprites) - 1])
+    _target = None
+
+
+def count():
+    return len(_sprites)
+
+
+def set_target(sprite):
+    global _target
+    _target = sprite
+
+
+def damage(sprite, amount):
+    # Apply `amount` damage; returns the hit points left.
+    slot = sprite.data_number('ai_slot') - 1
+    if slot < 0:
+        return 0
+    _hp[slot] -= amount
+    return _hp[slot]
+
+
+def contact_damage(sprite):
+    slot = sprite.data_number('ai_slot') - 1
+    if slot < 0:
+        return 1
+    return ARCH_DAMAGE[_arch[slot]]
+
+
+def tick():
+    if _target is None:
+        return
+    target_x = int(_target.x)
+    target_y = int(_target.y)
+    slot = 0
+    total = len(_sprites)
+    while slot < total:
+        sprite = _sprites[slot]
+        arch = _arch[slot]
+        dx = target_x - int(sprite.x)
+        dy = target_y - int(sprite.y)
+        if arch == ARCH_DRONE:
+            dx += ((slot & 1) * 2 - 1) * SWARM_SPREAD
+            dy += ((slot & 2) - 1) * SWARM_SPREAD
+        reach = ARCH_RANGE[arch]
+        if dx * dx + dy * dy <= reach * reach:
+            _steer(slot, dx, dy, arch)
+            sprite.vx = _vx[slot] >> FX_SHIFT
+            sprite.vy = _vy[slot] >> FX_SHIFT
+        slot += 1
+
+
+def _steer(slot, dx, dy, arch):
+    adx = dx if dx >= 0 else -dx
+    ady = dy if dy >= 0 else -dy
+    # Octagonal estimate of sqrt(dx^2 + dy^2), within about 7%.
+    if adx > ady:
+        length = adx + ((ady * 3) >> 3)
+    else:
+        length = ady + ((adx * 3) >> 3)
+    if length == 0:
+        return
+    speed = ARCH_SPEED[arch] << FX_SHIFT
+    accel = ARCH_ACCEL[arch] << FX_SHIFT
+    change = dx * speed // length - _vx[slot]
+    if change > accel:
+        change = accel
+    elif change < -accel:
+        change = -accel
+    _vx[slot] += change
+    change = dy * speed // length - _vy[slot]
+    if change > accel:
+        change = accel
+    elif change < -accel:
+        change = -accel
+    _vy[slot] += change
+
+
+scheduler.register('enemy_ai', tick, scheduler.PRIORITY_NORMAL, AI_EVERY)
@@ -1,83 +1,228 @@
 # galaxy.py
 # Deterministic galaxy and planet seeding utilities for MakeCode Arcade.
 
+import rng
+
 GALAXY_SYSTEM_COUNT = 25
-SYSTEMS_PER_ROW = 5
+# Galaxy map world layout: systems sit on a grid of spacing-sized cells.
+MAP_MARGIN_X = 20
+MAP_MARGIN_Y = 12
+SYSTEM_SPACING_X = 30
+SYSTEM_SPACING_Y = 24
 STAR_TYPES = ['red', 'yellow', 'blue', 'binary', 'pulsar']
 PLANET_BIOMES = ['ice', 'desert', 'jungle', 'volcanic', 'ocean', 'crystal']
 
+SYSTEM_FLAG_STATION = 1
+MAX_PLANETS = 3
+# One full map screen of systems plus headroom for the active system.
+SYSTEM_CACHE_SIZE = 32
+PLANET_SEED_STRIDE = 104729
+# World-stream draws per system header (star, difficulty, station, planet
+# count) and per planet; planet p starts SYSTEM_DRAWS + p * PLANET_DRAWS in.
+SYSTEM_DRAWS = 4
+PLANET_DRAWS = 4
 
-def _lcg_next(state):
-    # Linear congruential generator parameters tuned for 32-bit.
-    state[0] = (1664525 * state[0] + 1013904223) & 0xffffffff
-    return state[0]
 
+def _base_seed(galaxy_seed, system_index):
+    return (galaxy_seed + system_index * 7919) & 0xffffffff
 
-def _rng_next(state, max_value):
-    if max_value <= 0:
-        return 0
-    value = _lcg_next(state)
-    return value % max_value
 
+def build_galaxy(galaxy_seed, count=GALAXY_SYSTEM_COUNT):
+    # Lazy store: nothing is generated up front. Systems are rolled on first
+    # access into one of SYSTEM_CACHE_SIZE slots, recycling the least recently
+    # used slot, so building a galaxy costs the same whatever its size.
+    return _new_store(galaxy_seed, count, SYSTEM_CACHE_SIZE)
 
-def _base_seed(galaxy_seed, system_index):
-    return (galaxy_seed + system_index * 7919) & 0xffffffff
 
+def _new_store(galaxy_seed, count, slots):
+    return {
+        'seed': galaxy_seed,
+        'count': count,
+        'columns': galaxy_columns(count),
+        'clock': 0,
+        'last_index': -1,
+        'last_slot': 0,
+        'slot_system': _filled(slots, -1),
+        'slot_used': _filled(slots, 0),
+        'system_seed': _filled(slots, 0),
+        'system_star': _filled(slots, 0),
+        'system_difficulty': _filled(slots, 0),
+        'system_flags': _filled(slots, 0),
+        'planet_count': _filled(slots, 0),
+        'planet_biome': _filled(slots * MAX_PLANETS, 0),
+        'planet_size': _filled(slots * MAX_PLANETS, 0),
+        'planet_hostility': _filled(slots * MAX_PLANETS, 0),
+        'planet_richness': _filled(slots * MAX_PLANETS, 0)
+    }
 
-def build_galaxy(galaxy_seed):
-    systems = []
-    index = 0
-    while index < GALAXY_SYSTEM_COUNT:
-        rng_state = [_base_seed(galaxy_seed, index)]
-        star_type = STAR_TYPES[_rng_next(rng_state, len(STAR_TYPES))]
-        difficulty = 1 + _rng_next(rng_state, 4)
-        has_station = _rng_next(rng_state, 100) < 20
-        planet_count = 1 + _rng_next(rng_state, 3)
-        planets = []
-        planet_idx = 0
-        while planet_idx < planet_count:
-            planets.append(_create_planet(index, planet_idx, rng_state))
-            planet_idx += 1
-        systems.append({
-            'index': index,
-            'seed': rng_state[0],
-            'star_type': star_type,
-            'difficulty': difficulty,
-            'has_station': has_station,
-            'planets': planets
-        })
-        index += 1
-    return systems
-
-
-def system_coordinates(system_index):
-    col = system_index % SYSTEMS_PER_ROW
-    row = system_index // SYSTEMS_PER_ROW
-    margin_x = 20
-    margin_y = 12
-    spacing_x = (160 - 2 * margin_x) // (SYSTEMS_PER_ROW - 1)
-    spacing_y = (120 - 2 * margin_y) // ((GALAXY_SYSTEM_COUNT // SYSTEMS_PER_ROW) - 1)
-    x = margin_x + spacing_x * col
-    y = margin_y + spacing_y * row
-    return x, y
+
+def _filled(length, value):
+    values = []
+    while len(values) < length:
+        values.append(value)
+    return values
+
+
+def get_system(galaxy, index):
+    # Returns the cache slot holding system `index`, generating it on a miss.
+    clock = galaxy['clock'] + 1
+    galaxy['clock'] = clock
+    used = galaxy['slot_used']
+    if galaxy['last_index'] == index:
+        slot = galaxy['last_slot']
+        used[slot] = clock
+        return slot
+    owners = galaxy['slot_system']
+    victim = 0
+    slot = 0
+    while slot < len(owners):
+        if owners[slot] == index:
+            break
+        if used[slot] < used[victim]:
+            victim = slot
+        slot += 1
+    if slot == len(owners):
+        slot = victim
+        _generate_system(galaxy, slot, index)
+    used[slot] = clock
+    galaxy['last_index'] = index
+    galaxy['last_slot'] = slot
+    return slot
+
+
+def _generate_system(galaxy, slot, index):
+    gen = rng.world(_base_seed(galaxy['seed'], index))
+    star = rng.below(gen, len(STAR_TYPES))
+    difficulty = 1 + rng.below(gen, 4)
+    flags = 0
+    if rng.below(gen, 100) < 20:
+        flags = flags | SYSTEM_FLAG_STATION
+    planet_count = 1 + rng.below(gen, 3)
+    planet_idx = 0
+    while planet_idx < planet_count:
+        _create_planet(galaxy, slot * MAX_PLANETS + planet_idx, gen)
+        planet_idx += 1
+    galaxy['slot_system'][slot] = index
+    galaxy['system_seed'][slot] = gen[0]
+    galaxy['system_star'][slot] = star
+    galaxy['system_difficulty'][slot] = difficulty
+    galaxy['system_flags'][slot] = flags
+    galaxy['planet_count'][slot] = planet_count
+
+
+def system_count(galaxy):
+    return galaxy['count']
+
+
+def system_seed(galaxy, index):
+    return galaxy['system_seed'][get_system(galaxy, index)]
+
+
+def system_star_type(galaxy, index):
+    return STAR_TYPES[galaxy['system_star'][get_system(galaxy, index)]]
+
+
+def system_difficulty(galaxy, index):
+    return galaxy['system_difficulty'][get_system(galaxy, index)]
 
 
-def _create_planet(system_index, planet_index, rng_state):
-    biome = PLANET_BIOMES[_rng_next(rng_state, len(PLANET_BIOMES))]
-    size = 16 + _rng_next(rng_state, 24)
-    hostility = _rng_next(rng_state, 100)
-    resource_richness = 1 + _rng_next(rng_state, 3)
+def system_has_station(galaxy, index):
+    return (galaxy['system_flags'][get_system(galaxy, index)] & SYSTEM_FLAG_STATION) != 0
+
+
+def system_planet_count(galaxy, index):
+    return galaxy['planet_count'][get_system(galaxy, index)]
+
+
+def planet_descriptor(galaxy, index, planet_index):
+    # Materialise one planet as a dict for the scene that is landing on it.
+    slot = get_system(galaxy, index)
+    row = slot * MAX_PLANETS + planet_index
     return {
-        'system_index': system_index,
+        'system_index': index,
         'planet_index': planet_index,
-        'biome': biome,
-        'size': size,
-        'hostility': hostility,
-        'richness': resource_richness
+        'seed': rng.next_value(rng.world(galaxy['system_seed'][slot] + (planet_index + 1) * PLANET_SEED_STRIDE)),
+        'biome': PLANET_BIOMES[galaxy['planet_biome'][row]],
+        'size': galaxy['planet_size'][row],
+        'hostility': galaxy['planet_hostility'][row],
+        'richness': galaxy['planet_richness'][row]
     }
 
 
+def galaxy_columns(count):
+    # Smallest square grid that holds `count` systems.
+    columns = 1
+    while columns * columns < count:
+        columns += 1
+    return columns
+
+
+def system_columns(galaxy):
+    return galaxy['columns']
+
+
+def system_rows(galaxy):
+    return (galaxy['count'] + galaxy['columns'] - 1) // galaxy['columns']
+
+
+def system_at(galaxy, col, row):
+    # System index in map cell (col, row), or -1 outside the galaxy.
+    columns = galaxy['columns']
+    if col < 0 or row < 0 or col >= columns:
+        return -1
+    index = row * columns + col
+    if index >= galaxy['count']:
+        return -1
+    return index
+
+
+def system_coordinates(galaxy, system_index):
+    # World-space position of a system on the galaxy map.
+    col = system_index % galaxy['columns']
+    row = system_index // galaxy['columns']
+    x = MAP_MARGIN_X + SYSTEM_SPACING_X * col
+    y = MAP_MARGIN_Y + SYSTEM_SPACING_Y * row
+    return x, y
+
+
+def _create_planet(galaxy, row, gen):
+    galaxy['planet_biome'][row] = rng.below(gen, len(PLANET_BIOMES))
+    galaxy['planet_size'][row] = 16 + rng.below(gen, 24)
+    galaxy['planet_hostility'][row] = rng.below(gen, 100)
+    galaxy['planet_richness'][row] = 1 + rng.below(gen, 3)
+
+
+def planet_stream(galaxy_seed, system_index, planet_index):
+    # World generator positioned at a planet's first draw, reached by
+    # jump-ahead instead of replaying the system header and earlier planets.
+    gen = rng.world(_base_seed(galaxy_seed, system_index))
+    return rng.skip(gen, SYSTEM_DRAWS + planet_index * PLANET_DRAWS)
+
+
+def system_header(galaxy_seed, system_index):
+    # Star type index << 1 | station flag, rolled from the first header
+    # draws alone: no planets, and the slot cache is left untouched. Matches
+    # system_star_type() and system_has_station() for the same system.
+    gen = rng.world(_base_seed(galaxy_seed, system_index))
+    star = rng.below(gen, len(STAR_TYPES))
+    # Difficulty draw, not needed here.
+    rng.next_value(gen)
+    flags = 0
+    if rng.below(gen, 100) < 20:
+        flags = SYSTEM_FLAG_STATION
+    return (star << 1) | flags
+
+
 def regenerate_system(galaxy_seed, system_index):
-    rng_state = [_base_seed(galaxy_seed, system_index)]
-    return _create_planet(system_index, 0, rng_state)
-
+    # First planet of a system without a galaxy store; matches
+    # planet_descriptor() for the same system.
+    scratch = _new_store(galaxy_seed, 1, 1)
+    _create_planet(scratch, 0, planet_stream(galaxy_seed, system_index, 0))
+    gen = rng.skip(rng.world(_base_seed(galaxy_seed, system_index)), SYSTEM_DRAWS - 1)
+    planet_count = 1 + rng.below(gen, 3)
+    rng.skip(gen, planet_count * PLANET_DRAWS)
+    scratch['system_seed'][0] = gen[0]
+    scratch['slot_system'][0] = 0
+    descriptor = planet_descriptor(scratch, 0, 0)
+    descriptor['system_index'] = system_index
+    return descriptor
@@ -1,66 +1,78 @@
 # gameplay.py
-# Scene coordinator tying main.py to combat, planet, and station modules.
+# Scene coordinator tying main.py to the scenes registered in scenes.py.
+#
+# Importing combat, planet and station registers their scenes. Every event
+# is one table lookup on the current scene id.
 
 import combat
 import planet
+import pool
+import profiler
+import scenes
+import scheduler
 import station
 
-SPACE_SCENE = 1
-PLANET_SCENE = 2
-STATION_SCENE = 3
+_state = None
 
 
-def setup_space_encounter(state):
-    combat.start_space_encounter(state)
+def bind(state):
+    # Start per-frame updates for whichever scene `state` is in.
+    global _state
+    if _state is None:
+        scheduler.register('scene', _tick)
+    _state = state
 
 
-def setup_planet_surface(state):
-    planet.start_planet_scene(state)
-
-
-def setup_space_station(state):
-    station.start_station_scene(state)
+def setup_scene(state):
+    setup = scenes.handler(state['scene'], scenes.SLOT_SETUP)
+    if setup is not None:
+        if profiler.ENABLED:
+            profiler.begin(profiler.SCOPE_SETUP)
+        setup(state)
+        if profiler.ENABLED:
+            profiler.end(profiler.SCOPE_SETUP)
 
 
 def teardown_current_scene(state):
-    if state['scene'] == SPACE_SCENE:
-        combat.cleanup_space_scene(state)
-    elif state['scene'] == PLANET_SCENE:
-        planet.cleanup_planet_scene(state)
-    elif state['scene'] == STATION_SCENE:
-        station.cleanup_station_scene(state)
-    sprites.destroy_all_sprites_of_kind(SpriteKind.projectile)
+    teardown = scenes.handler(state['scene'], scenes.SLOT_TEARDOWN)
+    if teardown is not None:
+        if profiler.ENABLED:
+            profiler.begin(profiler.SCOPE_TEARDOWN)
+        teardown(state)
+        if profiler.ENABLED:
+            profiler.end(profiler.SCOPE_TEARDOWN)
+    pool.clear(SpriteKind.projectile)
 
 
 def handle_button_a(state):
-    if state['scene'] == SPACE_SCENE:
-        return combat.space_press_a(state)
-    if state['scene'] == PLANET_SCENE:
-        return planet.handle_button_a(state)
-    if state['scene'] == STATION_SCENE:
-        return station.handle_button_a(state)
-    return None
+    handler = scenes.handler(state['scene'], scenes.SLOT_BUTTON_A)
+    if handler is None:
+        return None
+    return handler(state)
 
 
 def handle_button_b(state):
-    if state['scene'] == SPACE_SCENE:
-        return combat.space_press_b(state)
-    if state['scene'] == PLANET_SCENE:
-        return planet.handle_button_b(state)
-    if state['scene'] == STATION_SCENE:
-        return station.handle_button_b(state)
-    return None
+    handler = scenes.handler(state['scene'], scenes.SLOT_BUTTON_B)
+    if handler is None:
+        return None
+    return handler(state)
 
 
 def handle_direction(state, dx, dy):
-    if state['scene'] == STATION_SCENE:
-        return station.handle_direction(state, dx, dy)
-    if state['scene'] == PLANET_SCENE:
-        return planet.handle_direction(state, dx, dy)
-    return None
+    handler = scenes.handler(state['scene'], scenes.SLOT_DIRECTION)
+    if handler is None:
+        return None
+    return handler(state, dx, dy)
 
 
 def handle_menu(state):
-    if state['scene'] == SPACE_SCENE or state['scene'] == PLANET_SCENE or state['scene'] == STATION_SCENE:
-        return 'map'
-    return None
+    handler = scenes.handler(state['scene'], scenes.SLOT_MENU)
+    if handler is None:
+        return None
+    return handler(state)
+
+
+def _tick():
+    update = scenes.handler(_state['scene'], scenes.SLOT_UPDATE)
+    if update is not None:
+        update(_state)
@@ -0,0 +1,143 @@
+# hud.py
+# Shared 160x10 HUD strip with per-field dirty tracking.
+#
+# Scenes either show a full-line message or lay out named fields (hull,
+# shield, credits, fuel, ...). Updates only record the new text; flush() runs
+# once per frame and repaints just the fields whose text changed, so several
+# updates in one frame cost a single redraw.
+
+import profiler
+import scheduler
+
+HUD_KIND = SpriteKind.create()
+profiler.track_kind(HUD_KIND, 'hud')
+
+HUD_WIDTH = 160
+HUD_HEIGHT = 10
+CHAR_WIDTH = 6
+TEXT_COLOR = 1
+
+_sprite = None
+
+# Field layout (parallel arrays): name, left x, width in characters, the text
+# currently on screen and the text to show at the next flush.
+_names = []
+_lefts = []
+_chars = []
+_drawn = []
+_pending = []
+
+_message = ''
+_message_drawn = None
+_show_message = True
+_full_redraw = True
+_dirty = False
+
+
+def ensure():
+    global _sprite
+    if _sprite is None:
+        _sprite = sprites.create(image.create(HUD_WIDTH, HUD_HEIGHT), HUD_KIND)
+        _sprite.set_flag(SpriteFlag.RELATIVE_TO_CAMERA, True)
+        _sprite.top = 0
+        _sprite.left = 0
+        _sprite.z = 100
+        scheduler.register('hud', flush, scheduler.PRIORITY_LOW)
+    return _sprite
+
+
+def begin_layout():
+    # Start a new field layout; follow with add_field() calls.
+    global _full_redraw, _dirty
+    while len(_names) > 0:
+        _names.pop()
+        _lefts.pop()
+        _chars.pop()
+        _drawn.pop()
+        _pending.pop()
+    _full_redraw = True
+    _dirty = True
+
+
+def add_field(name, left, chars):
+    _names.append(name)
+    _lefts.append(left)
+    _chars.append(chars)
+    _drawn.append(None)
+    _pending.append('')
+
+
+def set_field(name, text):
+    global _show_message, _full_redraw, _dirty
+    index = _field_index(name)
+    if index < 0:
+        return
+    if _show_message:
+        _show_message = False
+        _full_redraw = True
+        _dirty = True
+    if _pending[index] != text:
+        _pending[index] = text
+        _dirty = True
+
+
+def show_message(text):
+    # Replace the fields with one full-width line until the next set_field().
+    global _message, _show_message, _dirty
+    _message = text
+    _show_message = True
+    _dirty = True
+
+
+def flush():
+    global _dirty
+    if not _dirty or _sprite is None:
+        return
+    _dirty = False
+    if profiler.ENABLED:
+        profiler.begin(profiler.SCOPE_HUD)
+    _redraw(_sprite.image)
+    if profiler.ENABLED:
+        profiler.end(profiler.SCOPE_HUD)
+
+
+def _redraw(img):
+    global _message_drawn, _full_redraw
+    if _show_message:
+        if _message_drawn != _message or _full_redraw:
+            img.fill(0)
+            img.print(_message, 1, 1, TEXT_COLOR)
+            _message_drawn = _message
+            _full_redraw = False
+            _forget_fields()
+        return
+    if _full_redraw:
+        img.fill(0)
+        _forget_fields()
+        _message_drawn = None
+        _full_redraw = False
+    index = 0
+    while index < len(_names):
+        text = _pending[index]
+        if _drawn[index] != text:
+            left = _lefts[index]
+            img.fill_rect(left, 0, _chars[index] * CHAR_WIDTH, HUD_HEIGHT, 0)
+            img.print(text[:_chars[index]], left, 1, TEXT_COLOR)
+            _drawn[index] = text
+        index += 1
+
+
+def _forget_fields():
+    index = 0
+    while index < len(_drawn):
+        _drawn[index] = None
+        index += 1
+
+
+def _field_index(name):
+    index = 0
+    while index < len(_names):
+        if _names[index] == name:
+            return index
+        index += 1
+    return -1
@@ -0,0 +1,127 @@
+# listview.py
+# Paged list widget for menus: a title row over a page of text rows with a
+# highlighted cursor, all drawn into one sprite.
+#
+# Rows are not stored; the owner passes a row_text(index) callback and the
+# widget asks for the rows it draws. Moving the cursor within a page repaints
+# just the old and new cursor rows; crossing a page boundary repaints the
+# page. Owners call redraw_row() or set_title() when the text behind a row
+# changes, so a list of any length costs at most one page per keypress.
+
+import profiler
+
+LISTVIEW_KIND = SpriteKind.create()
+profiler.track_kind(LISTVIEW_KIND, 'list')
+
+ROW_HEIGHT = 10
+CHAR_WIDTH = 6
+TEXT_COLOR = 1
+HIGHLIGHT_COLOR = 1
+HIGHLIGHT_TEXT_COLOR = 15
+TITLE_COLOR = 5
+
+_sprite = None
+_rows = 0
+_count = 0
+_cursor = 0
+_first = 0
+_row_text = None
+_title = ''
+# Rows painted since show(), for tools/bench.py.
+_rows_drawn = 0
+
+
+def show(left, top, width, rows, count, row_text, title):
+    # Open the list with `rows` visible rows under a title row, cursor on 0.
+    global _sprite, _rows, _count, _cursor, _first, _row_text, _title, _rows_drawn
+    height = (rows + 1) * ROW_HEIGHT
+    if _sprite is not None and (_sprite.image.width != width or _sprite.image.height != height):
+        hide()
+    if _sprite is None:
+        _sprite = sprites.create(image.create(width, height), LISTVIEW_KIND)
+        _sprite.set_flag(SpriteFlag.RELATIVE_TO_CAMERA, True)
+        _sprite.z = 90
+    _sprite.left = left
+    _sprite.top = top
+    _rows = rows
+    _count = count
+    _cursor = 0
+    _first = 0
+    _row_text = row_text
+    _title = title
+    _rows_drawn = 0
+    _draw_page()
+
+
+def hide():
+    global _sprite, _row_text
+    if _sprite is not None:
+        _sprite.destroy()
+        _sprite = None
+    _row_text = None
+
+
+def rows_drawn():
+    return _rows_drawn
+
+
+def move(delta):
+    # Move the cursor by `delta`, wrapping at the ends; returns the new index.
+    global _cursor, _first
+    if _count == 0:
+        return 0
+    previous = _cursor
+    _cursor = (_cursor + delta) % _count
+    if _cursor < 0:
+        _cursor += _count
+    first = _cursor - _cursor % _rows
+    if first != _first:
+        _first = first
+        _draw_page()
+    else:
+        redraw_row(previous)
+        redraw_row(_cursor)
+    return _cursor
+
+
+def set_title(text):
+    global _title
+    if text != _title:
+        _title = text
+        _draw_title()
+
+
+def redraw_row(index):
+    # Repaint row `index` if it is on the current page.
+    global _rows_drawn
+    if _sprite is None or index < _first or index >= _first + _rows:
+        return
+    img = _sprite.image
+    y = (index - _first + 1) * ROW_HEIGHT
+    if index == _cursor:
+        img.fill_rect(0, y, img.width, ROW_HEIGHT, HIGHLIGHT_COLOR)
+        img.print(_row_text(index), 2, y + 1, HIGHLIGHT_TEXT_COLOR)
+    else:
+        img.fill_rect(0, y, img.width, ROW_HEIGHT, 0)
+        if index < _count:
+            img.print(_row_text(index), 2, y + 1, TEXT_COLOR)
+    _rows_drawn += 1
+
+
+def _draw_page():
+    _draw_title()
+    index = _first
+    while index < _first + _rows:
+        redraw_row(index)
+        index += 1
+
+
+def _draw_title():
+    # Title on the left, page number on the right.
+    img = _sprite.image
+    img.fill_rect(0, 0, img.width, ROW_HEIGHT, 0)
+    img.print(_title, 2, 1, TITLE_COLOR)
+    pages = (_count + _rows - 1) // _rows
+    if pages > 1:
+        page = '{}/{}'.format(_first // _rows + 1, pages)
+        img.print(page, img.width - len(page) * CHAR_WIDTH - 1, 1, TITLE_COLOR)
@@ -4,41 +4,71 @@
 import galaxy
 import assets
 import gameplay
-
-galaxy_scene = 0
-space_scene = 1
-planet_scene = 2
-station_scene = 3
+import hud
+import market
+import missions
+import profiler
+import replay
+import rng
+import route
+import save
+import scenes
+
+galaxy_scene = scenes.GALAXY_SCENE
+space_scene = scenes.SPACE_SCENE
+planet_scene = scenes.PLANET_SCENE
+station_scene = scenes.STATION_SCENE
 
 galaxy_star_kind = SpriteKind.create()
 galaxy_cursor_kind = SpriteKind.create()
-hud_text_kind = SpriteKind.create()
+profiler.track_kind(galaxy_star_kind, 'star')
+profiler.track_kind(galaxy_cursor_kind, 'cur')
+
+# Cells of the galaxy grid shown at once; the camera scrolls a whole cell at a
+# time, so these many star sprites cover the 160x120 view at any galaxy size.
+MAP_VIEW_COLS = 5
+MAP_VIEW_ROWS = 5
+# star_systems value for a slot not yet synced (-1 is an empty cell).
+STAR_UNASSIGNED = -2
 
 game_state = {
     'scene': galaxy_scene,
     'galaxy_seed': 0,
-    'systems': [],
+    'galaxy': None,
+    'galaxy_size': galaxy.GALAXY_SYSTEM_COUNT,
     'cursor_index': 0,
+    'map_col': 0,
+    'map_row': 0,
     'star_sprites': [],
+    'star_systems': [],
+    'star_status': [],
     'cursor_sprite': None,
-    'hud_text': None,
-    'station_text': None,
     'player': {
         'hull': 5,
         'shield': 3,
         'credits': 0,
         'weapon': 0,
         'fuel': 100,
-        'resources': 0
+        'resources': 0,
+        'cargo': [0, 0, 0, 0]
     },
     'space_player': None,
     'space_enemies': [],
     'space_status': 'idle',
-    'planet_player': None
+    'planet_player': None,
+    'planet_tiles': None,
+    'planet_terrain': -1,
+    'visited': None,
+    'cleared': None,
+    'collected': None,
+    'docked': None
 }
 
 
 def _generate_seed():
+    if replay.is_active():
+        # A reroll inside a recording must reach the same galaxy on replay.
+        return rng.next_value(rng.encounter(game_state['galaxy_seed']))
     base = control.millis()
     if base == 0:
         base = 1234567
@@ -47,167 +77,319 @@ def _generate_seed():
 
 def start_new_galaxy(seed):
     game_state['galaxy_seed'] = seed
-    game_state['systems'] = galaxy.build_galaxy(seed)
+    game_state['galaxy'] = galaxy.build_galaxy(seed, game_state['galaxy_size'])
     game_state['cursor_index'] = 0
+    # No system played yet in this galaxy.
+    game_state['active_system'] = -1
+    game_state['map_col'] = 0
+    game_state['map_row'] = 0
     game_state['player'] = {
         'hull': 5,
         'shield': 3,
         'credits': 0,
         'weapon': 0,
         'fuel': 100,
-        'resources': 0
+        'resources': 0,
+        'cargo': [0, 0, 0, 0]
     }
+    save.new_progress(game_state)
+    missions.reset(game_state['galaxy_size'])
+    market.reset()
+    _forget_star_systems()
+    if replay.RECORD:
+        replay.start_recording(seed, game_state['galaxy_size'])
     _enter_scene(galaxy_scene)
 
 
-def _enter_scene(scene_id):
-    if game_state['scene'] == galaxy_scene:
-        _teardown_galaxy_scene()
-    elif game_state['scene'] == space_scene:
-        gameplay.teardown_current_scene(game_state)
-    elif game_state['scene'] == planet_scene:
-        gameplay.teardown_current_scene(game_state)
-    elif game_state['scene'] == station_scene:
-        gameplay.teardown_current_scene(game_state)
-    game_state['scene'] = scene_id
-    if scene_id == galaxy_scene:
-        _setup_galaxy_scene()
-    elif scene_id == space_scene:
-        gameplay.setup_space_encounter(game_state)
-    elif scene_id == planet_scene:
-        gameplay.setup_planet_surface(game_state)
-    elif scene_id == station_scene:
-        gameplay.setup_space_station(game_state)
+def _restore_or_start():
+    # Resume the saved run if there is one; only the seed, cursor, player and
+    # progress bits are stored, the galaxy itself is rebuilt from the seed.
+    if replay.REPLAY_ON_BOOT and _replay_stored():
+        return
+    if save.load(game_state):
+        game_state['galaxy'] = galaxy.build_galaxy(game_state['galaxy_seed'], game_state['galaxy_size'])
+        market.reset()
+        _forget_star_systems()
+        _enter_scene(galaxy_scene)
+    else:
+        start_new_galaxy(_generate_seed())
+
 
+def _replay_stored():
+    data = replay.stored()
+    if not replay.is_valid(data):
+        return False
+    game_state['galaxy_size'] = replay.recorded_galaxy_size(data)
+    start_new_galaxy(replay.recorded_seed(data))
+    return replay.play(data)
 
-def _setup_galaxy_scene():
+
+def _enter_scene(scene_id):
+    if profiler.ENABLED:
+        profiler.begin(profiler.SCOPE_ENTER_SCENE)
+    gameplay.teardown_current_scene(game_state)
+    game_state['scene'] = scene_id
+    if profiler.ENABLED:
+        profiler.set_scene(scene_id)
+    assets.trim_images()
+    gameplay.setup_scene(game_state)
+    save.save(game_state)
+    if replay.PERSIST and replay.is_recording():
+        replay.store()
+    if profiler.ENABLED:
+        profiler.end(profiler.SCOPE_ENTER_SCENE)
+
+
+def _setup_galaxy_scene(state):
+    # The map sprites outlive the scene; coming back re-shows them and
+    # redraws a star only if its visited/cleared/docked status changed.
     scene.set_background_color(1)
-    _build_star_sprites()
+    if len(game_state['star_sprites']) == 0:
+        _build_star_sprites()
+    _scroll_map_to_cursor(True)
+    _show_star_sprites(True)
+    _refresh_star(game_state.get('active_system', -1))
     _ensure_cursor_sprite()
     _update_cursor_position()
-    _ensure_hud_text()
+    hud.ensure()
     _refresh_galaxy_info()
 
 
-def _teardown_galaxy_scene():
-    _destroy_star_sprites()
-    if game_state['cursor_sprite']:
-        game_state['cursor_sprite'].destroy()
-        game_state['cursor_sprite'] = None
+def _teardown_galaxy_scene(state):
+    _show_star_sprites(False)
+    scene.center_camera_at(80, 60)
 
 
 def _build_star_sprites():
-    _destroy_star_sprites()
+    # One sprite per visible map cell. Cell (col, row) always maps to slot
+    # (col % MAP_VIEW_COLS, row % MAP_VIEW_ROWS), so scrolling by one cell
+    # only re-targets the sprites of the column or row that scrolled in.
     sprites_list = []
-    index = 0
-    systems = game_state['systems']
-    while index < len(systems):
-        system = systems[index]
-        img = assets.make_star_image(system['star_type'])
-        star_sprite = sprites.create(img, galaxy_star_kind)
-        coords = galaxy.system_coordinates(system['index'])
-        star_sprite.set_position(coords[0], coords[1])
-        star_sprite.set_data_number('index', index)
+    systems = []
+    status = []
+    slot = 0
+    while slot < MAP_VIEW_COLS * MAP_VIEW_ROWS:
+        star_sprite = sprites.create(assets.get_image(assets.IMG_STAR, 'red'), galaxy_star_kind)
+        star_sprite.set_flag(SpriteFlag.INVISIBLE, True)
         sprites_list.append(star_sprite)
-        index += 1
+        systems.append(STAR_UNASSIGNED)
+        status.append(-1)
+        slot += 1
     game_state['star_sprites'] = sprites_list
+    game_state['star_systems'] = systems
+    game_state['star_status'] = status
 
 
-def _destroy_star_sprites():
-    sprites_list = game_state['star_sprites']
+def _forget_star_systems():
+    # A new galaxy: every slot must be re-targeted on the next sync.
+    systems = game_state['star_systems']
     index = 0
-    while index < len(sprites_list):
-        sprites_list[index].destroy()
+    while index < len(systems):
+        systems[index] = STAR_UNASSIGNED
         index += 1
-    game_state['star_sprites'] = []
+
+
+def _show_star_sprites(visible):
+    # Hide the map while other scenes run, without touching the images.
+    sprites_list = game_state['star_sprites']
+    systems = game_state['star_systems']
+    slot = 0
+    while slot < len(sprites_list):
+        if systems[slot] >= 0:
+            sprites_list[slot].set_flag(SpriteFlag.INVISIBLE, not visible)
+        slot += 1
+    cursor = game_state['cursor_sprite']
+    if cursor:
+        cursor.set_flag(SpriteFlag.INVISIBLE, not visible)
+
+
+def _refresh_star(index):
+    # Redraw one system's star if it is on the map and its status changed;
+    # only the system just played can have changed while the map was hidden.
+    store = game_state['galaxy']
+    if index < 0 or index >= galaxy.system_count(store):
+        return
+    columns = galaxy.system_columns(store)
+    slot = ((index // columns) % MAP_VIEW_ROWS) * MAP_VIEW_COLS + (index % columns) % MAP_VIEW_COLS
+    if game_state['star_systems'][slot] != index:
+        return
+    current = _star_status(index)
+    if game_state['star_status'][slot] != current:
+        game_state['star_status'][slot] = current
+        game_state['star_sprites'][slot].set_image(
+            assets.star_image(galaxy.system_star_type(store, index), current))
+
+
+def _star_status(index):
+    status = 0
+    if save.is_marked(game_state['visited'], index):
+        status |= assets.STAR_VISITED
+    if save.is_marked(game_state['cleared'], index):
+        status |= assets.STAR_CLEARED
+    if save.is_marked(game_state['docked'], index):
+        status |= assets.STAR_DOCKED
+    return status
+
+
+def _scroll_map_to_cursor(force):
+    # Keep the cursor's cell inside the view window, moving the window (and
+    # camera) by whole cells; re-sync star sprites only when it moved.
+    store = game_state['galaxy']
+    index = game_state['cursor_index']
+    col = index % galaxy.system_columns(store)
+    row = index // galaxy.system_columns(store)
+    map_col = game_state['map_col']
+    map_row = game_state['map_row']
+    if col < map_col:
+        map_col = col
+    elif col >= map_col + MAP_VIEW_COLS:
+        map_col = col - MAP_VIEW_COLS + 1
+    if row < map_row:
+        map_row = row
+    elif row >= map_row + MAP_VIEW_ROWS:
+        map_row = row - MAP_VIEW_ROWS + 1
+    if not force and map_col == game_state['map_col'] and map_row == game_state['map_row']:
+        return
+    game_state['map_col'] = map_col
+    game_state['map_row'] = map_row
+    scene.center_camera_at(map_col * galaxy.SYSTEM_SPACING_X + 80,
+                           map_row * galaxy.SYSTEM_SPACING_Y + 60)
+    _sync_star_sprites()
+
+
+def _sync_star_sprites():
+    store = game_state['galaxy']
+    sprites_list = game_state['star_sprites']
+    systems = game_state['star_systems']
+    status = game_state['star_status']
+    row = game_state['map_row']
+    while row < game_state['map_row'] + MAP_VIEW_ROWS:
+        col = game_state['map_col']
+        while col < game_state['map_col'] + MAP_VIEW_COLS:
+            slot = (row % MAP_VIEW_ROWS) * MAP_VIEW_COLS + col % MAP_VIEW_COLS
+            index = galaxy.system_at(store, col, row)
+            if systems[slot] != index:
+                systems[slot] = index
+                star_sprite = sprites_list[slot]
+                if index < 0:
+                    star_sprite.set_flag(SpriteFlag.INVISIBLE, True)
+                else:
+                    status[slot] = _star_status(index)
+                    star_sprite.set_image(assets.star_image(galaxy.system_star_type(store, index), status[slot]))
+                    coords = galaxy.system_coordinates(store, index)
+                    star_sprite.set_position(coords[0], coords[1])
+                    star_sprite.set_flag(SpriteFlag.INVISIBLE, False)
+            col += 1
+        row += 1
 
 
 def _ensure_cursor_sprite():
     cursor = game_state['cursor_sprite']
     if cursor is None:
-        cursor = sprites.create(assets.make_cursor_image(), galaxy_cursor_kind)
+        cursor = sprites.create(assets.get_image(assets.IMG_CURSOR, 0), galaxy_cursor_kind)
         cursor.z = 10
         game_state['cursor_sprite'] = cursor
 
 
 def _update_cursor_position():
     cursor = game_state['cursor_sprite']
-    systems = game_state['systems']
     index = game_state['cursor_index']
-    if cursor and index < len(systems):
-        coords = galaxy.system_coordinates(index)
+    if cursor and index < galaxy.system_count(game_state['galaxy']):
+        coords = galaxy.system_coordinates(game_state['galaxy'], index)
         cursor.set_position(coords[0], coords[1])
 
 
-def _ensure_hud_text():
-    if game_state['hud_text'] is None:
-        hud = sprites.create(image.create(160, 10), hud_text_kind)
-        hud.set_flag(SpriteFlag.RELATIVE_TO_CAMERA, True)
-        hud.top = 0
-        hud.left = 0
-        hud.z = 100
-        game_state['hud_text'] = hud
-        _set_hud_text('')
-
-
-def _set_hud_text(text):
-    hud = game_state['hud_text']
-    if hud:
-        hud.image.fill(0)
-        hud.image.print(text, 1, 1, 1)
-
-
 def _refresh_galaxy_info():
-    systems = game_state['systems']
+    store = game_state['galaxy']
     index = game_state['cursor_index']
-    if index < len(systems):
-        system = systems[index]
-        label = 'Sys ' + str(index + 1) + ' ' + system['star_type']
-        label = label + ' | diff ' + str(system['difficulty'])
-        if system['has_station']:
+    if index < galaxy.system_count(store):
+        label = 'Sys ' + str(index + 1) + ' ' + galaxy.system_star_type(store, index)
+        label = label + ' | diff ' + str(galaxy.system_difficulty(store, index))
+        if galaxy.system_has_station(store, index):
             label = label + ' | station'
-        label = label + ' | planets ' + str(len(system['planets']))
-        _set_hud_text(label)
+        label = label + ' | planets ' + str(galaxy.system_planet_count(store, index))
+        hud.show_message(label)
 
 
 def _cursor_move(delta):
     index = game_state['cursor_index'] + delta
+    count = galaxy.system_count(game_state['galaxy'])
     if index < 0:
         index = 0
-    if index >= len(game_state['systems']):
-        index = len(game_state['systems']) - 1
+    if index >= count:
+        index = count - 1
     game_state['cursor_index'] = index
+    _scroll_map_to_cursor(False)
     _update_cursor_position()
     _refresh_galaxy_info()
 
 
 def _cursor_move_xy(dx, dy):
+    store = game_state['galaxy']
+    columns = galaxy.system_columns(store)
     current = game_state['cursor_index']
-    row = current // galaxy.SYSTEMS_PER_ROW
-    col = current % galaxy.SYSTEMS_PER_ROW
+    row = current // columns
+    col = current % columns
     row += dy
     col += dx
     if row < 0:
         row = 0
     if col < 0:
         col = 0
-    max_row = (galaxy.GALAXY_SYSTEM_COUNT - 1) // galaxy.SYSTEMS_PER_ROW
+    max_row = galaxy.system_rows(store) - 1
     if row > max_row:
         row = max_row
-    if col >= galaxy.SYSTEMS_PER_ROW:
-        col = galaxy.SYSTEMS_PER_ROW - 1
-    index = row * galaxy.SYSTEMS_PER_ROW + col
-    if index >= len(game_state['systems']):
-        index = len(game_state['systems']) - 1
+    if col >= columns:
+        col = columns - 1
+    index = row * columns + col
+    count = galaxy.system_count(store)
+    if index >= count:
+        index = count - 1
     game_state['cursor_index'] = index
+    _scroll_map_to_cursor(False)
     _update_cursor_position()
     _refresh_galaxy_info()
 
 
+def _galaxy_button_a(state):
+    _enter_selected_system()
+    return None
+
+
+def _galaxy_button_b(state):
+    _randomize_galaxy()
+    return None
+
+
+def _galaxy_direction(state, dx, dy):
+    _cursor_move_xy(dx, dy)
+    return None
+
+
+def _galaxy_menu(state):
+    # Route summary from the current system: the cheapest station within
+    # the fuel left and how many systems that fuel reaches.
+    store = state['galaxy']
+    start = state.get('active_system', -1)
+    if start < 0 or start >= galaxy.system_count(store):
+        start = state['cursor_index']
+    fuel = state['player'].get('fuel', 0)
+    stops = route.nearest_station(store, start, fuel)
+    reach = route.reachable_count(store, start, fuel)
+    if stops is None:
+        hud.show_message('No station in range | reach ' + str(reach))
+    else:
+        hud.show_message('Station Sys ' + str(stops[len(stops) - 1] + 1) + ' ' + str(len(stops) - 1)
+                         + 'j ' + str(route.last_cost()) + 'f | reach ' + str(reach))
+    return None
+
+
 def _enter_selected_system():
-    system = game_state['systems'][game_state['cursor_index']]
-    game_state['active_system'] = system
+    game_state['active_system'] = game_state['cursor_index']
+    save.mark(game_state['visited'], game_state['active_system'])
+    market.advance_day()
     _enter_scene(space_scene)
+    missions.notify(game_state, missions.EVENT_ARRIVE, game_state['active_system'])
 
 
 def _randomize_galaxy():
@@ -222,85 +404,75 @@ def _register_controls():
     controller.A.on_event(ControllerButtonEvent.PRESSED, _on_button_a)
     controller.B.on_event(ControllerButtonEvent.PRESSED, _on_button_b)
     controller.menu.on_event(ControllerButtonEvent.PRESSED, _on_menu_press)
+    gameplay.bind(game_state)
 
 
 def _on_left_press():
-    if game_state['scene'] == galaxy_scene:
-        _cursor_move_xy(-1, 0)
-    else:
-        action = gameplay.handle_direction(game_state, -1, 0)
-        _process_action(action)
+    _process_action(gameplay.handle_direction(game_state, -1, 0))
 
 
 def _on_right_press():
-    if game_state['scene'] == galaxy_scene:
-        _cursor_move_xy(1, 0)
-    else:
-        action = gameplay.handle_direction(game_state, 1, 0)
-        _process_action(action)
+    _process_action(gameplay.handle_direction(game_state, 1, 0))
 
 
 def _on_up_press():
-    if game_state['scene'] == galaxy_scene:
-        _cursor_move_xy(0, -1)
-    else:
-        action = gameplay.handle_direction(game_state, 0, -1)
-        _process_action(action)
+    _process_action(gameplay.handle_direction(game_state, 0, -1))
 
 
 def _on_down_press():
-    if game_state['scene'] == galaxy_scene:
-        _cursor_move_xy(0, 1)
-    else:
-        action = gameplay.handle_direction(game_state, 0, 1)
-        _process_action(action)
+    _process_action(gameplay.handle_direction(game_state, 0, 1))
 
 
 def _on_button_a():
-    scene_id = game_state['scene']
-    if scene_id == galaxy_scene:
-        _enter_selected_system()
-    else:
-        action = gameplay.handle_button_a(game_state)
-        _process_action(action)
+    _process_action(gameplay.handle_button_a(game_state))
 
 
 def _on_button_b():
-    scene_id = game_state['scene']
-    if scene_id == galaxy_scene:
-        _randomize_galaxy()
-    else:
-        action = gameplay.handle_button_b(game_state)
-        _process_action(action)
+    _process_action(gameplay.handle_button_b(game_state))
 
 
 def _on_menu_press():
-    action = gameplay.handle_menu(game_state)
-    _process_action(action)
+    _process_action(gameplay.handle_menu(game_state))
 
 
 def _process_action(action):
     if action is None:
         return
-    if action == 'map':
-        _enter_scene(galaxy_scene)
-        _refresh_galaxy_info()
-    elif action == 'land':
-        _transition_to_planet()
-    elif action == 'station':
-        _enter_scene(station_scene)
+    handler = _actions.get(action)
+    if handler is not None:
+        handler()
+
+
+def _return_to_map():
+    _enter_scene(galaxy_scene)
+    _refresh_galaxy_info()
+
+
+def _dock_at_station():
+    save.mark(game_state['docked'], game_state['active_system'])
+    _enter_scene(station_scene)
 
 
 def _transition_to_planet():
-    system = game_state['active_system']
-    if len(system['planets']) == 0:
+    store = game_state['galaxy']
+    index = game_state['active_system']
+    if galaxy.system_planet_count(store, index) == 0:
         game.splash('No planets here')
         _enter_scene(galaxy_scene)
         return
-    game_state['active_planet'] = system['planets'][0]
+    game_state['active_planet'] = galaxy.planet_descriptor(store, index, 0)
     _enter_scene(planet_scene)
 
 
+# Scene actions returned by input handlers.
+_actions = {
+    'map': _return_to_map,
+    'land': _transition_to_planet,
+    'station': _dock_at_station
+}
+
+scenes.register(galaxy_scene, _setup_galaxy_scene, _teardown_galaxy_scene,
+                _galaxy_button_a, _galaxy_button_b, _galaxy_direction, _galaxy_menu, None)
 _register_controls()
-start_new_galaxy(_generate_seed())
-
+_restore_or_start()
+
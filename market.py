@@ -0,0 +1,253 @@
+# market.py
+# Station commodity market with lazily advanced supply.
+#
+# Every station trades COMMODITY_COUNT goods. Its equilibrium stock of each
+# comes from the system seed, difficulty and planet biomes; prices follow the
+# current stock, so well supplied goods are cheap and player trades move the
+# price. Stock drifts back toward equilibrium one market day per jump, but a
+# station is only advanced when it is visited: visit() catches it up by the
+# days since its last visit. Stock lives in MARKET_SLOTS byte rows reused
+# least-recently-visited first, like galaxy's system cache; a station whose
+# row was recycled reopens at equilibrium, where drift would have taken it
+# anyway. Opening a market costs the same however many stations exist.
+
+import galaxy
+import rng
+
+COMMODITY_ORE = 0
+COMMODITY_FOOD = 1
+COMMODITY_TECH = 2
+COMMODITY_MEDIC = 3
+COMMODITY_COUNT = 4
+COMMODITY_NAMES = ['Ore', 'Food', 'Tech', 'Medic']
+BASE_PRICE = [6, 5, 18, 12]
+BASE_STOCK = [40, 50, 24, 30]
+# Goods each biome's planets add to the local supply (galaxy.PLANET_BIOMES order).
+BIOME_GOODS = [COMMODITY_MEDIC, COMMODITY_ORE, COMMODITY_FOOD, COMMODITY_ORE, COMMODITY_FOOD, COMMODITY_TECH]
+PRODUCER_STOCK = 24
+# Dangerous systems burn through tech and medicine.
+DIFFICULTY_DEMAND = 4
+MIN_STOCK = 4
+MAX_STOCK = 255
+# The hold is saved as one byte per good (save.OFFSET_CARGO).
+MAX_CARGO = 255
+# Stock at which a good sells for its base price.
+REFERENCE_STOCK = 48
+# Stations pay this many quarters of the buy price.
+SELL_QUARTERS = 3
+
+MARKET_SLOTS = 16
+# Each day closes 1/2^DRIFT_SHIFT of the gap to equilibrium; after
+# CATCHUP_DAYS days a station is treated as settled.
+DRIFT_SHIFT = 3
+CATCHUP_DAYS = 32
+NOISE = 3
+MARKET_SALT = 0x3a4b
+
+_day = 0
+
+# Slot rows: station, last day advanced, LRU clock and one stock byte per good.
+_slot_system = []
+_slot_day = []
+_slot_used = []
+_stock = control.create_buffer(MARKET_SLOTS * COMMODITY_COUNT)
+_clock = 0
+
+# The open station's slot and equilibrium stock.
+_open_slot = 0
+_equilibrium = []
+
+
+def reset():
+    # New or restored run: forget every station's stock and the day count.
+    global _day, _clock
+    while len(_slot_system) < MARKET_SLOTS:
+        _slot_system.append(-1)
+        _slot_day.append(0)
+        _slot_used.append(0)
+    slot = 0
+    while slot < MARKET_SLOTS:
+        _slot_system[slot] = -1
+        _slot_used[slot] = 0
+        slot += 1
+    _day = 0
+    _clock = 0
+
+
+def advance_day():
+    # One market day passes per jump.
+    global _day
+    _day += 1
+
+
+def visit(store, system):
+    # Make `system` the open market, catching its stock up to today.
+    global _clock, _open_slot
+    _compute_equilibrium(store, system)
+    slot = _find_slot(system)
+    if slot < 0:
+        slot = _oldest_slot()
+        _slot_system[slot] = system
+        good = 0
+        while good < COMMODITY_COUNT:
+            _stock[slot * COMMODITY_COUNT + good] = _equilibrium[good]
+            good += 1
+    else:
+        _catch_up(store, system, slot)
+    _slot_day[slot] = _day
+    _clock += 1
+    _slot_used[slot] = _clock
+    _open_slot = slot
+
+
+def stock(good):
+    return _stock[_open_slot * COMMODITY_COUNT + good]
+
+
+def buy_price(good):
+    price = BASE_PRICE[good] * 2 * REFERENCE_STOCK // (REFERENCE_STOCK + stock(good))
+    return price if price > 0 else 1
+
+
+def sell_price(good):
+    price = buy_price(good) * SELL_QUARTERS // 4
+    return price if price > 0 else 1
+
+
+def cargo(state, good):
+    # Ore is the resources the explorer gathers on planets.
+    player = state['player']
+    if good == COMMODITY_ORE:
+        return player.get('resources', 0)
+    return _hold(player)[good]
+
+
+def buy(state, good):
+    # Buy one unit at the open station; returns the price paid, 0 if not.
+    player = state['player']
+    price = buy_price(good)
+    row = _open_slot * COMMODITY_COUNT + good
+    if _stock[row] <= 0 or player.get('credits', 0) < price:
+        return 0
+    if good != COMMODITY_ORE and _hold(player)[good] >= MAX_CARGO:
+        return 0
+    player['credits'] -= price
+    _stock[row] = _stock[row] - 1
+    _add_cargo(player, good, 1)
+    return price
+
+
+def sell(state, good):
+    # Sell one unit to the open station; returns the credits earned, 0 if not.
+    player = state['player']
+    if cargo(state, good) <= 0:
+        return 0
+    price = sell_price(good)
+    row = _open_slot * COMMODITY_COUNT + good
+    player['credits'] = player.get('credits', 0) + price
+    if _stock[row] < MAX_STOCK:
+        _stock[row] = _stock[row] + 1
+    _add_cargo(player, good, -1)
+    return price
+
+
+def _hold(player):
+    hold = player.get('cargo')
+    if hold is None:
+        hold = []
+        while len(hold) < COMMODITY_COUNT:
+            hold.append(0)
+        player['cargo'] = hold
+    return hold
+
+
+def _add_cargo(player, good, amount):
+    if good == COMMODITY_ORE:
+        player['resources'] = player.get('resources', 0) + amount
+    else:
+        hold = _hold(player)
+        hold[good] += amount
+
+
+def _compute_equilibrium(store, system):
+    while len(_equilibrium) < COMMODITY_COUNT:
+        _equilibrium.append(0)
+    gen = rng.encounter(galaxy.system_seed(store, system) ^ MARKET_SALT)
+    difficulty = galaxy.system_difficulty(store, system)
+    good = 0
+    while good < COMMODITY_COUNT:
+        _equilibrium[good] = BASE_STOCK[good] + rng.below(gen, 16)
+        good += 1
+    _equilibrium[COMMODITY_TECH] -= difficulty * DIFFICULTY_DEMAND
+    _equilibrium[COMMODITY_MEDIC] -= difficulty * DIFFICULTY_DEMAND
+    planet = 0
+    while planet < galaxy.system_planet_count(store, system):
+        _equilibrium[_biome_good(galaxy.planet_descriptor(store, system, planet)['biome'])] += PRODUCER_STOCK
+        planet += 1
+    good = 0
+    while good < COMMODITY_COUNT:
+        _equilibrium[good] = _clamp(_equilibrium[good])
+        good += 1
+
+
+def _catch_up(store, system, slot):
+    # Drift each good toward equilibrium for the days missed, then add a
+    # little seeded noise for today so prices move between visits.
+    days = _day - _slot_day[slot]
+    if days <= 0:
+        return
+    if days > CATCHUP_DAYS:
+        days = CATCHUP_DAYS
+    gen = rng.encounter(galaxy.system_seed(store, system) ^ MARKET_SALT ^ (_day * 7919))
+    good = 0
+    while good < COMMODITY_COUNT:
+        row = slot * COMMODITY_COUNT + good
+        target = _equilibrium[good]
+        level = _stock[row]
+        step = 0
+        while step < days and level != target:
+            gap = target - level
+            move = gap >> DRIFT_SHIFT if gap > 0 else -((-gap) >> DRIFT_SHIFT)
+            if move == 0:
+                move = 1 if gap > 0 else -1
+            level += move
+            step += 1
+        _stock[row] = _clamp(level + rng.between(gen, -NOISE, NOISE))
+        good += 1
+
+
+def _biome_good(biome):
+    index = 0
+    while index < len(galaxy.PLANET_BIOMES):
+        if galaxy.PLANET_BIOMES[index] == biome:
+            return BIOME_GOODS[index]
+        index += 1
+    return COMMODITY_ORE
+
+
+def _find_slot(system):
+    slot = 0
+    while slot < MARKET_SLOTS:
+        if _slot_system[slot] == system:
+            return slot
+        slot += 1
+    return -1
+
+
+def _oldest_slot():
+    oldest = 0
+    slot = 1
+    while slot < MARKET_SLOTS:
+        if _slot_used[slot] < _slot_used[oldest]:
+            oldest = slot
+        slot += 1
+    return oldest
+
+
+def _clamp(level):
+    if level < MIN_STOCK:
+        return MIN_STOCK
+    if level > MAX_STOCK:
+        return MAX_STOCK
+    return level
+
@@ -0,0 +1,270 @@
+# missions.py
+# Seeded station missions and the index that resolves their events.
+#
+# Each station offers OFFERS_PER_STATION missions rolled from its system
+# seed: visit a nearby system, defeat pirates there, or gather resources on
+# its planet. Accepted missions sit in MAX_ACTIVE slots of flat arrays and
+# are indexed by key = target system * EVENT_SLOTS + event, hashed into
+# INDEX_BUCKETS chains. combat, planet and main call notify() when a kill,
+# pickup or arrival happens; it walks only the chain for that key, so an
+# event costs the same however many missions are active, and objectives are
+# only re-evaluated when one of their own events fires.
+
+import galaxy
+import hud
+import rng
+
+EVENT_ARRIVE = 0
+EVENT_KILL = 1
+EVENT_PICKUP = 2
+EVENT_SLOTS = 4
+
+OFFERS_PER_STATION = 3
+MAX_ACTIVE = 4
+INDEX_BUCKETS = 16
+BUCKET_MASK = INDEX_BUCKETS - 1
+# Targets are picked within this many map cells of the station.
+TARGET_RANGE = 3
+MISSION_SALT = 0x4d15
+
+# Offers of the station last rolled (parallel arrays).
+_offer_system = -1
+_offer_event = []
+_offer_target = []
+_offer_need = []
+_offer_reward = []
+
+# Offers already accepted, one bit per system * OFFERS_PER_STATION + offer.
+_taken = None
+
+# Active missions (parallel arrays); _event is -1 for a free slot.
+_event = []
+_target = []
+_need = []
+_done = []
+_reward = []
+_key = []
+_chain = []
+_heads = []
+
+
+def reset(galaxy_size):
+    # Forget every active mission and accepted offer (new run, or before
+    # save.py restores them).
+    global _taken, _offer_system
+    _taken = control.create_buffer((galaxy_size * OFFERS_PER_STATION + 7) >> 3)
+    _offer_system = -1
+    while len(_event) < MAX_ACTIVE:
+        _event.append(-1)
+        _target.append(0)
+        _need.append(0)
+        _done.append(0)
+        _reward.append(0)
+        _key.append(0)
+        _chain.append(-1)
+    while len(_heads) < INDEX_BUCKETS:
+        _heads.append(-1)
+    slot = 0
+    while slot < MAX_ACTIVE:
+        _event[slot] = -1
+        _chain[slot] = -1
+        slot += 1
+    bucket = 0
+    while bucket < INDEX_BUCKETS:
+        _heads[bucket] = -1
+        bucket += 1
+
+
+def roll_offers(store, system):
+    # Roll the missions offered at `system`'s station; same seed, same offers.
+    global _offer_system
+    if _offer_system == system:
+        return
+    while len(_offer_event) > 0:
+        _offer_event.pop()
+        _offer_target.pop()
+        _offer_need.pop()
+        _offer_reward.pop()
+    gen = rng.encounter(galaxy.system_seed(store, system) ^ MISSION_SALT)
+    offer = 0
+    while offer < OFFERS_PER_STATION:
+        event = rng.below(gen, EVENT_PICKUP + 1)
+        target = _pick_target(store, system, gen, event)
+        # Fallbacks that cannot be done become a fight at the target.
+        if event == EVENT_PICKUP and galaxy.system_planet_count(store, target) == 0:
+            event = EVENT_KILL
+        if event == EVENT_ARRIVE and target == system:
+            event = EVENT_KILL
+        if event == EVENT_ARRIVE:
+            need = 1
+            reward = 8 + 2 * _cell_distance(store, system, target)
+        elif event == EVENT_KILL:
+            need = 2 + rng.below(gen, 2 + galaxy.system_difficulty(store, target))
+            reward = 4 * need + 2 * galaxy.system_difficulty(store, target)
+        else:
+            need = 1 + rng.below(gen, 3)
+            reward = 6 * need
+        _offer_event.append(event)
+        _offer_target.append(target)
+        _offer_need.append(need)
+        _offer_reward.append(reward)
+        offer += 1
+    _offer_system = system
+
+
+def offer_count():
+    return len(_offer_event)
+
+
+def offer_taken(offer):
+    bit = _offer_system * OFFERS_PER_STATION + offer
+    return (_taken[bit >> 3] >> (bit & 7)) & 1 == 1
+
+
+def offer_reward(offer):
+    return _offer_reward[offer]
+
+
+def offer_label(offer):
+    return _describe(_offer_event[offer], _offer_target[offer], _offer_need[offer])
+
+
+def accept(offer):
+    # Take offer `offer` of the rolled station; False if taken or slots full.
+    if offer_taken(offer):
+        return False
+    slot = 0
+    while slot < MAX_ACTIVE and _event[slot] >= 0:
+        slot += 1
+    if slot >= MAX_ACTIVE:
+        return False
+    bit = _offer_system * OFFERS_PER_STATION + offer
+    _taken[bit >> 3] = _taken[bit >> 3] | (1 << (bit & 7))
+    _fill_slot(slot, _offer_event[offer], _offer_target[offer], _offer_need[offer], 0, _offer_reward[offer])
+    return True
+
+
+def restore(slot, event, target, need, done, reward):
+    # Put a saved mission back into `slot` (after reset()); event -1 leaves
+    # the slot free.
+    if event >= 0:
+        _fill_slot(slot, event, target, need, done, reward)
+
+
+def taken_bits():
+    # The accepted-offer bitset, for save.py.
+    return _taken
+
+
+def slot_event(slot):
+    return _event[slot]
+
+
+def slot_target(slot):
+    return _target[slot]
+
+
+def slot_need(slot):
+    return _need[slot]
+
+
+def slot_done(slot):
+    return _done[slot]
+
+
+def slot_reward(slot):
+    return _reward[slot]
+
+
+def active_count():
+    count = 0
+    slot = 0
+    while slot < MAX_ACTIVE:
+        if _event[slot] >= 0:
+            count += 1
+        slot += 1
+    return count
+
+
+def notify(state, event, system):
+    # A kill, pickup or arrival at `system`: advance the missions waiting on
+    # it and pay out the ones completed. Returns the credits paid.
+    key = system * EVENT_SLOTS + event
+    paid = 0
+    slot = _heads[key & BUCKET_MASK]
+    while slot >= 0:
+        following = _chain[slot]
+        if _key[slot] == key:
+            _done[slot] += 1
+            if _done[slot] >= _need[slot]:
+                paid += _reward[slot]
+                _unlink(slot)
+        slot = following
+    if paid > 0:
+        state['player']['credits'] = state['player'].get('credits', 0) + paid
+        hud.show_message('Mission complete +{} cr'.format(paid))
+    return paid
+
+
+def _fill_slot(slot, event, target, need, done, reward):
+    _event[slot] = event
+    _target[slot] = target
+    _need[slot] = need
+    _done[slot] = done
+    _reward[slot] = reward
+    key = target * EVENT_SLOTS + event
+    _key[slot] = key
+    _chain[slot] = _heads[key & BUCKET_MASK]
+    _heads[key & BUCKET_MASK] = slot
+
+
+def _unlink(slot):
+    bucket = _key[slot] & BUCKET_MASK
+    if _heads[bucket] == slot:
+        _heads[bucket] = _chain[slot]
+    else:
+        previous = _heads[bucket]
+        while _chain[previous] != slot:
+            previous = _chain[previous]
+        _chain[previous] = _chain[slot]
+    _event[slot] = -1
+    _chain[slot] = -1
+
+
+def _pick_target(store, system, gen, event):
+    # A system within TARGET_RANGE cells; visits go elsewhere and pickups
+    # need a planet. Falls back to the station's own system.
+    columns = galaxy.system_columns(store)
+    tries = 0
+    while tries < 8:
+        col = system % columns + rng.between(gen, -TARGET_RANGE, TARGET_RANGE)
+        row = system // columns + rng.between(gen, -TARGET_RANGE, TARGET_RANGE)
+        target = galaxy.system_at(store, col, row)
+        if target >= 0 and target < galaxy.system_count(store):
+            if event == EVENT_ARRIVE and target != system:
+                return target
+            if event == EVENT_KILL:
+                return target
+            if event == EVENT_PICKUP and galaxy.system_planet_count(store, target) > 0:
+                return target
+        tries += 1
+    return system
+
+
+def _cell_distance(store, a, b):
+    columns = galaxy.system_columns(store)
+    dx = a % columns - b % columns
+    dy = a // columns - b // columns
+    if dx < 0:
+        dx = -dx
+    if dy < 0:
+        dy = -dy
+    return dx if dx > dy else dy
+
+
+def _describe(event, target, need):
+    if event == EVENT_ARRIVE:
+        return 'Visit Sys {}'.format(target + 1)
+    if event == EVENT_KILL:
+        return 'Defeat {} at Sys {}'.format(need, target + 1)
+    return 'Gather {} at Sys {}'.format(need, target + 1)
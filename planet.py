@@ -1,9 +1,54 @@
 # planet.py
 # Planet surface exploration logic.
 
+import assets
+import broadphase
+import hud
+import missions
+import pool
+import profiler
+import replay
+import rng
+import save
+import scenes
+import surface
+import terrain
+
 PLANET_PLAYER_KIND = SpriteKind.create()
 PLANET_RESOURCE_KIND = SpriteKind.create()
 PLANET_ENEMY_KIND = SpriteKind.create()
+profiler.track_kind(PLANET_PLAYER_KIND, 'expl')
+profiler.track_kind(PLANET_RESOURCE_KIND, 'res')
+profiler.track_kind(PLANET_ENEMY_KIND, 'gnd')
+
+# The landing chunk keeps the original spawns: richness tops out at 3 (+2
+# nodes) and hostility > 70 spawns 3 enemies. Other chunks bring at most
+# CHUNK_RESOURCES_MAX and CHUNK_ENEMIES_MAX, and at most
+# surface.LIVE_CHUNKS_MAX chunks are live at once. The two pools share
+# pool.POOL_BUDGET, so a chunk entered while they are full spawns what fits;
+# its skipped nodes are not taken and appear when it next comes into view.
+LANDING_CHUNK = 0
+LANDING_RESOURCES_MAX = 5
+LANDING_ENEMIES_MAX = 3
+CHUNK_RESOURCES_MAX = 2
+CHUNK_ENEMIES_MAX = 2
+MAX_RESOURCES = LANDING_RESOURCES_MAX + CHUNK_RESOURCES_MAX
+MAX_GROUND_ENEMIES = LANDING_ENEMIES_MAX + 1
+# Spawns stay this far inside their chunk.
+CHUNK_INSET = 16
+
+# Surface tiles visible on the fixed 160x120 camera.
+VISIBLE_TILES_X = 9
+VISIBLE_TILES_Y = 7
+TILE_PIXELS = 16
+
+# Terrain generation time allowed per frame while descending; recorded and
+# replayed runs use a fixed number of rows per frame so they stay in step.
+TERRAIN_BUDGET_US = 6000
+TERRAIN_REPLAY_UNITS = 48
+
+pool.configure(PLANET_RESOURCE_KIND, MAX_RESOURCES)
+pool.configure(PLANET_ENEMY_KIND, MAX_GROUND_ENEMIES)
 
 _biome_colors = {
     'ice': 9,
@@ -22,13 +67,31 @@ def start_planet_scene(state):
     global _active_state
     _active_state = state
     planet = state.get('active_planet')
-    state['planet_status'] = 'explore'
+    state['planet_status'] = 'descending'
     scene.set_background_color(_biome_colors.get(planet['biome'], 3))
     _ensure_handlers()
+    state['planet_terrain'] = terrain.begin_planet(planet)
+    hud.show_message('Descending...')
+    if terrain.is_ready(state['planet_terrain']):
+        _finish_landing(state)
+
+
+def _finish_landing(state):
+    # Runs once the terrain is ready: show it and populate the surface.
+    planet = state.get('active_planet')
+    state['planet_status'] = 'explore'
+    terrain.apply(state['planet_terrain'], planet['biome'])
+    state['planet_tiles'] = terrain.tile_map(state['planet_terrain'])
     _spawn_player(state)
-    _spawn_resources(state, planet)
-    _spawn_enemies(state, planet)
+    surface.begin(planet, _chunk_resource_count)
+    state['planet_resources'] = pool.live_sprites(PLANET_RESOURCE_KIND)
+    state['planet_enemies'] = pool.live_sprites(PLANET_ENEMY_KIND)
+    _follow_explorer(state)
     _consume_fuel(state)
+    hud.begin_layout()
+    hud.add_field('resources', 1, 7)
+    hud.add_field('fuel', 49, 8)
+    hud.add_field('hull', 103, 7)
     _update_hud(state)
 
 
@@ -38,10 +101,17 @@ def cleanup_planet_scene(state):
     if player:
         controller.move_sprite(player, 0, 0)
         player.destroy()
+    broadphase.clear()
     sprites.destroy_all_sprites_of_kind(PLANET_PLAYER_KIND)
-    sprites.destroy_all_sprites_of_kind(PLANET_RESOURCE_KIND)
-    sprites.destroy_all_sprites_of_kind(PLANET_ENEMY_KIND)
+    pool.clear(PLANET_RESOURCE_KIND)
+    pool.clear(PLANET_ENEMY_KIND)
+    terrain.cancel()
+    terrain.clear()
+    surface.end()
+    scene.center_camera_at(80, 60)
     state['planet_player'] = None
+    state['planet_tiles'] = None
+    state['planet_terrain'] = -1
     state['planet_status'] = 'idle'
     _active_state = None
 
@@ -61,6 +131,18 @@ def handle_direction(state, dx, dy):
     return None
 
 
+def update_planet_scene(state):
+    if state['planet_status'] == 'descending':
+        if replay.is_active():
+            ready = terrain.step_units(TERRAIN_REPLAY_UNITS)
+        else:
+            ready = terrain.step(TERRAIN_BUDGET_US)
+        if ready:
+            _finish_landing(state)
+    elif state['planet_status'] == 'explore':
+        _follow_explorer(state)
+
+
 def _ensure_handlers():
     global _handlers_registered
     if _handlers_registered:
@@ -74,60 +156,202 @@ def _ensure_handlers():
         if _active_state:
             _enemy_collision(_active_state, enemy)
 
-    sprites.on_overlap(PLANET_PLAYER_KIND, PLANET_RESOURCE_KIND, on_resource_overlap)
-    sprites.on_overlap(PLANET_PLAYER_KIND, PLANET_ENEMY_KIND, on_enemy_overlap)
+    broadphase.on_overlap(PLANET_PLAYER_KIND, PLANET_RESOURCE_KIND, on_resource_overlap)
+    broadphase.on_overlap(PLANET_PLAYER_KIND, PLANET_ENEMY_KIND, on_enemy_overlap)
     _handlers_registered = True
 
 
 def _spawn_player(state):
-    img = image.create(12, 12)
-    img.fill(0)
-    img.fill_rect(2, 2, 8, 8, 11)
-    explorer = sprites.create(img, PLANET_PLAYER_KIND)
-    explorer.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
+    explorer = sprites.create(assets.get_image(assets.IMG_EXPLORER, 0), PLANET_PLAYER_KIND)
     explorer.set_position(80, 60)
     controller.move_sprite(explorer, 50, 50)
+    broadphase.add(explorer)
     state['planet_player'] = explorer
 
 
-def _spawn_resources(state, planet):
-    rng = [planet['size'] & 0xffffffff]
-    richness = planet['richness'] + 2
-    resources = []
+def _follow_explorer(state):
+    # Camera follows the explorer inside the surface; chunks near the view
+    # are spawned and far ones released.
+    explorer = state['planet_player']
+    extent = surface.extent_px()
+    explorer.x = _clamp(explorer.x, TILE_PIXELS // 2, extent - TILE_PIXELS // 2)
+    explorer.y = _clamp(explorer.y, TILE_PIXELS // 2, extent - TILE_PIXELS // 2)
+    center = surface.camera_center(explorer.x, explorer.y)
+    scene.center_camera_at(center[0], center[1])
+    surface.sync(center[0] - 80, center[1] - 60, _enter_chunk, _leave_chunk)
+    _keep_enemies_on_surface(extent)
+
+
+def _enter_chunk(chunk):
+    if chunk == LANDING_CHUNK:
+        _spawn_landing(_active_state, _active_state['active_planet'])
+    else:
+        _spawn_chunk(_active_state, _active_state['active_planet'], chunk)
+
+
+def _leave_chunk(chunk):
+    _release_chunk(PLANET_RESOURCE_KIND, chunk)
+    _release_chunk(PLANET_ENEMY_KIND, chunk)
+
+
+def _release_chunk(kind, chunk):
+    live = pool.live_sprites(kind)
+    index = len(live) - 1
+    while index >= 0:
+        sprite = live[index]
+        if sprite.data_number('chunk') == chunk:
+            broadphase.remove(sprite)
+            pool.release(sprite)
+        index -= 1
+
+
+def _chunk_resource_count(chunk):
+    planet = _active_state['active_planet']
+    if chunk == LANDING_CHUNK:
+        return planet['richness'] + 2
+    return 1 + planet['richness'] // 2
+
+
+def _enemy_count(hostility):
+    if hostility > 70:
+        return 3
+    if hostility > 40:
+        return 2
+    if hostility > 20:
+        return 1
+    return 0
+
+
+def _spawn_landing(state, planet):
+    # The landing screen keeps the original rolls: resources from the size
+    # stream and enemies from the hostility stream, on visible tiles.
+    gen = rng.encounter(planet['size'])
+    count = _chunk_resource_count(LANDING_CHUNK)
+    index = 0
+    while index < count:
+        x = rng.between(gen, 10, 150)
+        y = rng.between(gen, 10, 110)
+        if not surface.is_taken(LANDING_CHUNK, index):
+            node = _new_chunk_sprite(PLANET_RESOURCE_KIND, _new_resource_image, LANDING_CHUNK, index)
+            if node is not None:
+                _place_on_open_tile(state, node, x, y)
+        index += 1
+    gen = rng.encounter(planet['hostility'])
+    count = _enemy_count(planet['hostility'])
     index = 0
-    while index < richness:
-        node = sprites.create(image.create(6, 6), PLANET_RESOURCE_KIND)
-        node.image.fill(0)
-        node.image.fill_rect(0, 0, 6, 6, 13)
-        node.set_position(_rand_range(rng, 10, 150), _rand_range(rng, 10, 110))
-        node.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
-        resources.append(node)
+    while index < count:
+        enemy = _new_chunk_sprite(PLANET_ENEMY_KIND, _new_enemy_image, LANDING_CHUNK, index)
+        # Draw the rolls either way so later enemies keep their positions.
+        x = rng.between(gen, 10, 150)
+        y = rng.between(gen, 10, 110)
+        vx = rng.between(gen, -30, 30)
+        vy = rng.between(gen, -30, 30)
+        if enemy is not None:
+            _place_on_open_tile(state, enemy, x, y)
+            enemy.set_velocity(vx, vy)
+            enemy.set_flag(SpriteFlag.BOUNCE_ON_WALL, True)
         index += 1
-    state['planet_resources'] = resources
 
 
-def _spawn_enemies(state, planet):
-    hostility = planet['hostility']
-    count = 0
-    if hostility > 70:
-        count = 3
-    elif hostility > 40:
-        count = 2
-    elif hostility > 20:
-        count = 1
-    rng = [planet['hostility'] & 0xffffffff]
-    enemies = []
-    idx = 0
-    while idx < count:
-        enemy = sprites.create(image.create(10, 10), PLANET_ENEMY_KIND)
-        enemy.image.fill(0)
-        enemy.image.fill_rect(1, 1, 8, 8, 2)
-        enemy.set_position(_rand_range(rng, 10, 150), _rand_range(rng, 10, 110))
-        enemy.set_velocity(_rand_range(rng, -30, 30), _rand_range(rng, -30, 30))
-        enemy.set_flag(SpriteFlag.STAY_IN_SCREEN, True)
-        enemies.append(enemy)
-        idx += 1
-    state['planet_enemies'] = enemies
+def _spawn_chunk(state, planet, chunk):
+    # Any other chunk rolls from its own stream, so it spawns the same
+    # things every time it comes into view.
+    gen = rng.encounter(surface.chunk_seed(planet['seed'], chunk))
+    left = surface.chunk_left_tile(chunk) * TILE_PIXELS
+    top = surface.chunk_top_tile(chunk) * TILE_PIXELS
+    count = _chunk_resource_count(chunk)
+    index = 0
+    while index < count:
+        x = left + rng.between(gen, CHUNK_INSET, surface.CHUNK_PIXELS - CHUNK_INSET)
+        y = top + rng.between(gen, CHUNK_INSET, surface.CHUNK_PIXELS - CHUNK_INSET)
+        if not surface.is_taken(chunk, index):
+            node = _new_chunk_sprite(PLANET_RESOURCE_KIND, _new_resource_image, chunk, index)
+            if node is not None:
+                _place_in_chunk(state, node, chunk, x, y)
+        index += 1
+    count = _enemy_count(planet['hostility'])
+    if count > CHUNK_ENEMIES_MAX:
+        count = CHUNK_ENEMIES_MAX
+    index = 0
+    while index < count:
+        enemy = _new_chunk_sprite(PLANET_ENEMY_KIND, _new_enemy_image, chunk, index)
+        x = left + rng.between(gen, CHUNK_INSET, surface.CHUNK_PIXELS - CHUNK_INSET)
+        y = top + rng.between(gen, CHUNK_INSET, surface.CHUNK_PIXELS - CHUNK_INSET)
+        vx = rng.between(gen, -30, 30)
+        vy = rng.between(gen, -30, 30)
+        if enemy is not None:
+            _place_in_chunk(state, enemy, chunk, x, y)
+            enemy.set_velocity(vx, vy)
+            enemy.set_flag(SpriteFlag.BOUNCE_ON_WALL, True)
+        index += 1
+
+
+def _new_chunk_sprite(kind, build_image, chunk, index):
+    sprite = pool.acquire(kind, build_image)
+    if sprite is None:
+        return None
+    sprite.set_data_number('chunk', chunk)
+    sprite.set_data_number('node', index)
+    broadphase.add(sprite)
+    return sprite
+
+
+def _keep_enemies_on_surface(extent):
+    # Bounce ground enemies off the surface edge, which need not be rock.
+    enemies = pool.live_sprites(PLANET_ENEMY_KIND)
+    index = 0
+    while index < len(enemies):
+        enemy = enemies[index]
+        if (enemy.x < TILE_PIXELS and enemy.vx < 0) or (enemy.x > extent - TILE_PIXELS and enemy.vx > 0):
+            enemy.vx = -enemy.vx
+        if (enemy.y < TILE_PIXELS and enemy.vy < 0) or (enemy.y > extent - TILE_PIXELS and enemy.vy > 0):
+            enemy.vy = -enemy.vy
+        index += 1
+
+
+def _place_on_open_tile(state, sprite, x, y):
+    # Keep the rolled position when it is walkable, otherwise snap to the
+    # centre of the nearest open tile on screen.
+    tiles = state['planet_tiles']
+    tx = x // TILE_PIXELS
+    ty = y // TILE_PIXELS
+    if not terrain.is_open(tiles, tx, ty):
+        found = terrain.nearest_open(tiles, tx, ty, VISIBLE_TILES_X, VISIBLE_TILES_Y)
+        if found >= 0:
+            x = (found % terrain.TERRAIN_SIZE) * TILE_PIXELS + TILE_PIXELS // 2
+            y = (found // terrain.TERRAIN_SIZE) * TILE_PIXELS + TILE_PIXELS // 2
+    sprite.set_position(x, y)
+
+
+def _place_in_chunk(state, sprite, chunk, x, y):
+    tiles = state['planet_tiles']
+    tx = x // TILE_PIXELS
+    ty = y // TILE_PIXELS
+    if not terrain.is_open(tiles, tx, ty):
+        min_tx = surface.chunk_left_tile(chunk)
+        min_ty = surface.chunk_top_tile(chunk)
+        found = terrain.nearest_open_in(tiles, tx, ty, min_tx, min_ty,
+                                        min_tx + surface.CHUNK_TILES - 1, min_ty + surface.CHUNK_TILES - 1)
+        if found >= 0:
+            x = (found % terrain.TERRAIN_SIZE) * TILE_PIXELS + TILE_PIXELS // 2
+            y = (found // terrain.TERRAIN_SIZE) * TILE_PIXELS + TILE_PIXELS // 2
+    sprite.set_position(x, y)
+
+
+def _clamp(value, low, high):
+    if value < low:
+        return low
+    if value > high:
+        return high
+    return value
+
+
+def _new_resource_image():
+    return assets.get_image(assets.IMG_RESOURCE, 0)
+
+
+def _new_enemy_image():
+    return assets.get_image(assets.IMG_GROUND_ENEMY, 0)
 
 
 def _consume_fuel(state):
@@ -137,9 +361,12 @@ def _consume_fuel(state):
 
 
 def _collect_resource(state, resource):
-    resource.destroy()
+    surface.take(resource.data_number('chunk'), resource.data_number('node'))
+    broadphase.remove(resource)
+    pool.release(resource)
     state['player']['resources'] = state['player'].get('resources', 0) + 1
     _update_hud(state)
+    missions.notify(state, missions.EVENT_PICKUP, state['active_planet']['system_index'])
     _check_completion(state)
 
 
@@ -153,35 +380,17 @@ def _enemy_collision(state, enemy):
 
 
 def _check_completion(state):
-    remaining = sprites.all_of_kind(PLANET_RESOURCE_KIND)
-    if len(remaining) == 0:
-        _set_hud_text(state, 'Resources gathered! B:Depart')
+    if surface.collected() >= surface.total():
+        planet = state['active_planet']
+        save.mark(state['collected'], save.planet_key(planet['system_index'], planet['planet_index']))
+        hud.show_message('Resources gathered! B:Depart')
 
 
 def _update_hud(state):
-    resources = state['player'].get('resources', 0)
-    fuel = state['player'].get('fuel', 0)
-    hull = state['player'].get('hull', 0)
-    text = 'Res {} | Fuel {} | Hull {}'.format(resources, fuel, hull)
-    _set_hud_text(state, text)
-
-
-def _set_hud_text(state, text):
-    hud = state.get('hud_text')
-    if hud:
-        hud.image.fill(0)
-        hud.image.print(text, 1, 1, 1)
-
-
-def _rand_range(rng_state, minimum, maximum):
-    span = maximum - minimum + 1
-    if span <= 0:
-        return minimum
-    value = _lcg_step(rng_state)
-    return minimum + value % span
+    hud.set_field('resources', 'Res {}'.format(state['player'].get('resources', 0)))
+    hud.set_field('fuel', 'Fuel {}'.format(state['player'].get('fuel', 0)))
+    hud.set_field('hull', 'Hull {}'.format(state['player'].get('hull', 0)))
 
 
-def _lcg_step(state):
-    state[0] = (1103515245 * state[0] + 12345) & 0x7fffffff
-    return state[0]
-
+scenes.register(scenes.PLANET_SCENE, start_planet_scene, cleanup_planet_scene,
+                handle_button_a, handle_button_b, handle_direction, scenes.to_map, update_planet_scene)
@@ -0,0 +1,133 @@
+# pool.py
+# Per-kind sprite pools so short-lived sprites are recycled, not reallocated.
+#
+# Pools only recycle within a scene: teardown calls clear(), which destroys
+# the kind's live and free sprites. Together the pools never hold more than
+# POOL_BUDGET sprites; a full pool refuses to hand out more.
+
+# design.md keeps total sprites under 40. The galaxy map's 25 stars and
+# cursor stay alive (hidden) in every scene, plus the HUD and the player.
+POOL_BUDGET = 39 - 25 - 1 - 1 - 1
+
+# Parallel arrays, one entry per pooled kind.
+_kinds = []
+_caps = []
+_live = []
+_free = []
+# Sprites created by all pools and not yet destroyed (live or free).
+_pooled = 0
+
+
+def configure(kind, cap):
+    # Declare a pool for `kind` holding at most `cap` sprites (no more than
+    # POOL_BUDGET). Idempotent.
+    if cap > POOL_BUDGET:
+        cap = POOL_BUDGET
+    slot = _pool_slot(kind)
+    if slot < 0:
+        _kinds.append(kind)
+        _caps.append(cap)
+        _live.append([])
+        _free.append([])
+    else:
+        _caps[slot] = cap
+
+
+def acquire(kind, build_image):
+    # Hand out a visible sprite of `kind`. Released sprites are reused with
+    # their existing image; build_image() is only called when the pool grows.
+    # Returns None once `cap` sprites are live or the budget is spent, and
+    # for a kind never configured; live sprites are never taken back.
+    global _pooled
+    slot = _pool_slot(kind)
+    if slot < 0:
+        return None
+    live = _live[slot]
+    free = _free[slot]
+    if len(free) > 0:
+        sprite = free.pop()
+    elif len(live) < _caps[slot] and _pooled < POOL_BUDGET:
+        sprite = sprites.create(build_image(), kind)
+        _pooled += 1
+    else:
+        return None
+    sprite.set_flag(SpriteFlag.INVISIBLE, False)
+    sprite.set_flag(SpriteFlag.GHOST, False)
+    live.append(sprite)
+    return sprite
+
+
+def release(sprite):
+    slot = _pool_slot(sprite.kind())
+    if slot < 0:
+        sprite.destroy()
+        return
+    live = _live[slot]
+    if sprite not in live:
+        return
+    live.remove(sprite)
+    _hide(sprite)
+    _free[slot].append(sprite)
+
+
+def clear(kind):
+    # Scene teardown: destroy every sprite of the pool, live or free.
+    global _pooled
+    slot = _pool_slot(kind)
+    if slot < 0:
+        return
+    live = _live[slot]
+    free = _free[slot]
+    while len(live) > 0:
+        live.pop().destroy()
+        _pooled -= 1
+    while len(free) > 0:
+        free.pop().destroy()
+        _pooled -= 1
+
+
+def is_offscreen(sprite):
+    # Pooled sprites cannot use SpriteFlag.AUTO_DESTROY; scenes poll this.
+    left = scene.camera_property(CameraProperty.LEFT)
+    top = scene.camera_property(CameraProperty.TOP)
+    return (sprite.bottom < top or sprite.top > top + scene.screen_height()
+            or sprite.right < left or sprite.left > left + scene.screen_width())
+
+
+def has_room(kind):
+    # True when acquire(kind) would hand out a sprite.
+    slot = _pool_slot(kind)
+    if slot < 0:
+        return False
+    if len(_free[slot]) > 0:
+        return True
+    return len(_live[slot]) < _caps[slot] and _pooled < POOL_BUDGET
+
+
+def live_count(kind):
+    slot = _pool_slot(kind)
+    if slot < 0:
+        return 0
+    return len(_live[slot])
+
+
+def live_sprites(kind):
+    slot = _pool_slot(kind)
+    if slot < 0:
+        return []
+    return _live[slot]
+
+
+def _hide(sprite):
+    sprite.set_velocity(0, 0)
+    sprite.set_flag(SpriteFlag.INVISIBLE, True)
+    sprite.set_flag(SpriteFlag.GHOST, True)
+
+
+def _pool_slot(kind):
+    index = 0
+    while index < len(_kinds):
+        if _kinds[index] == kind:
+            return index
+        index += 1
+    return -1
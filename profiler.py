@@ -0,0 +1,270 @@
+# profiler.py
+# Optional runtime instrumentation: timing scopes, frame times and sprite
+# counts, drawn as an overlay on the device and read by the headless tools.
+#
+# Call sites guard every hook with `if profiler.ENABLED:`, so with ENABLED
+# False the compiler drops them and the profiler costs nothing. Scope stats
+# are kept per scene in flat arrays indexed by scope * SCENE_SLOTS + scene;
+# frame intervals go into a FRAME_RING ring buffer. Holding Menu toggles the
+# overlay (the menu press itself still acts, so toggle from the galaxy map).
+
+import scenes
+
+ENABLED = False
+
+SCOPE_ENTER_SCENE = 0
+SCOPE_SETUP = 1
+SCOPE_TEARDOWN = 2
+SCOPE_OVERLAP = 3
+SCOPE_HUD = 4
+SCOPE_COUNT = 5
+SCOPE_NAMES = ['enter', 'setup', 'tear', 'ovlp', 'hud']
+
+SCENE_SLOTS = scenes.STATION_SCENE + 1
+FRAME_RING = 64
+# Sprite counts are sampled, and the overlay redrawn, every SAMPLE_EVERY frames.
+SAMPLE_EVERY = 15
+
+OVERLAY_WIDTH = 160
+OVERLAY_HEIGHT = 42
+LINE_HEIGHT = 8
+TEXT_COLOR = 5
+
+
+def _zeros(count):
+    values = []
+    while len(values) < count:
+        values.append(0)
+    return values
+
+
+_scene = 0
+_started = _zeros(SCOPE_COUNT)
+_calls = _zeros(SCOPE_COUNT * SCENE_SLOTS)
+_total_us = _zeros(SCOPE_COUNT * SCENE_SLOTS)
+_max_us = _zeros(SCOPE_COUNT * SCENE_SLOTS)
+
+# Frame intervals (us); _frame_count keeps growing, the ring keeps the last
+# FRAME_RING. Per scene: frames seen and summed interval.
+_ring = _zeros(FRAME_RING)
+_frame_count = 0
+_last_frame_us = -1
+_scene_frames = _zeros(SCENE_SLOTS)
+_scene_us = _zeros(SCENE_SLOTS)
+
+# Tracked sprite kinds (parallel arrays) with the last sampled and peak counts.
+_kinds = []
+_kind_names = []
+_kind_count = []
+_kind_max = []
+
+_overlay = None
+# Created the first time the overlay is shown.
+_overlay_kind = None
+_controls_bound = False
+_hold_toggled = False
+
+
+def track_kind(kind, name):
+    # Include `kind` in the per-kind sprite counts under a short label.
+    if not ENABLED:
+        return
+    _kinds.append(kind)
+    _kind_names.append(name)
+    _kind_count.append(0)
+    _kind_max.append(0)
+
+
+def set_scene(scene_id):
+    global _scene
+    _scene = scene_id
+
+
+def begin(scope):
+    _started[scope] = control.micros()
+
+
+def end(scope):
+    elapsed = control.micros() - _started[scope]
+    slot = scope * SCENE_SLOTS + _scene
+    _calls[slot] += 1
+    _total_us[slot] += elapsed
+    if elapsed > _max_us[slot]:
+        _max_us[slot] = elapsed
+
+
+def frame():
+    # Once per game frame, from the scheduler.
+    global _frame_count, _last_frame_us
+    _bind_controls()
+    now = control.micros()
+    if _last_frame_us >= 0:
+        interval = now - _last_frame_us
+        _ring[_frame_count % FRAME_RING] = interval
+        _frame_count += 1
+        _scene_frames[_scene] += 1
+        _scene_us[_scene] += interval
+        if _frame_count % SAMPLE_EVERY == 0:
+            sample_sprites()
+            if _overlay is not None:
+                _draw_overlay()
+    _last_frame_us = now
+
+
+def sample_sprites():
+    index = 0
+    while index < len(_kinds):
+        count = len(sprites.all_of_kind(_kinds[index]))
+        _kind_count[index] = count
+        if count > _kind_max[index]:
+            _kind_max[index] = count
+        index += 1
+
+
+def reset():
+    global _frame_count, _last_frame_us
+    index = 0
+    while index < len(_calls):
+        _calls[index] = 0
+        _total_us[index] = 0
+        _max_us[index] = 0
+        index += 1
+    index = 0
+    while index < SCENE_SLOTS:
+        _scene_frames[index] = 0
+        _scene_us[index] = 0
+        index += 1
+    index = 0
+    while index < len(_kinds):
+        _kind_count[index] = 0
+        _kind_max[index] = 0
+        index += 1
+    _frame_count = 0
+    _last_frame_us = -1
+
+
+def frame_count():
+    return _frame_count
+
+
+def recent_frames():
+    # The ring in oldest-to-newest order.
+    result = []
+    total = FRAME_RING if _frame_count > FRAME_RING else _frame_count
+    index = _frame_count - total
+    while index < _frame_count:
+        result.append(_ring[index % FRAME_RING])
+        index += 1
+    return result
+
+
+def scope_calls(scope, scene_id):
+    return _calls[scope * SCENE_SLOTS + scene_id]
+
+
+def scope_total_us(scope, scene_id):
+    return _total_us[scope * SCENE_SLOTS + scene_id]
+
+
+def scope_max_us(scope, scene_id):
+    return _max_us[scope * SCENE_SLOTS + scene_id]
+
+
+def scene_frames(scene_id):
+    return _scene_frames[scene_id]
+
+
+def scene_frame_us(scene_id):
+    return _scene_us[scene_id]
+
+
+def kind_count():
+    return len(_kinds)
+
+
+def kind_name(index):
+    return _kind_names[index]
+
+
+def kind_live(index):
+    return _kind_count[index]
+
+
+def kind_max(index):
+    return _kind_max[index]
+
+
+def toggle_overlay():
+    global _overlay, _overlay_kind
+    if _overlay is None:
+        if _overlay_kind is None:
+            _overlay_kind = SpriteKind.create()
+        _overlay = sprites.create(image.create(OVERLAY_WIDTH, OVERLAY_HEIGHT), _overlay_kind)
+        _overlay.set_flag(SpriteFlag.RELATIVE_TO_CAMERA, True)
+        _overlay.left = 0
+        _overlay.bottom = 120
+        _overlay.z = 200
+        _draw_overlay()
+    else:
+        _overlay.destroy()
+        _overlay = None
+
+
+def _bind_controls():
+    # Menu PRESSED belongs to the scenes; toggle once per hold on its repeats.
+    global _controls_bound
+    if not _controls_bound:
+        controller.menu.on_event(ControllerButtonEvent.REPEATED, _on_menu_held)
+        controller.menu.on_event(ControllerButtonEvent.RELEASED, _on_menu_released)
+        _controls_bound = True
+
+
+def _on_menu_held():
+    global _hold_toggled
+    if not _hold_toggled:
+        _hold_toggled = True
+        toggle_overlay()
+
+
+def _on_menu_released():
+    global _hold_toggled
+    _hold_toggled = False
+
+
+def _draw_overlay():
+    img = _overlay.image
+    img.fill(15)
+    frames = recent_frames()
+    worst = 0
+    total = 0
+    index = 0
+    while index < len(frames):
+        total += frames[index]
+        if frames[index] > worst:
+            worst = frames[index]
+        index += 1
+    mean = total // len(frames) if len(frames) > 0 else 0
+    img.print('frame {}.{}ms max {}.{}ms'.format(mean // 1000, (mean // 100) % 10,
+                                                 worst // 1000, (worst // 100) % 10), 1, 1, TEXT_COLOR)
+    line = ''
+    scope = 0
+    while scope < SCOPE_COUNT:
+        worst = _max_us[scope * SCENE_SLOTS + _scene]
+        line = line + '{} {} '.format(SCOPE_NAMES[scope], worst // 100)
+        if scope == 2:
+            img.print(line, 1, 1 + LINE_HEIGHT, TEXT_COLOR)
+            line = ''
+        scope += 1
+    img.print(line + '(max .1ms)', 1, 1 + LINE_HEIGHT * 2, TEXT_COLOR)
+    line = ''
+    row = 3
+    index = 0
+    while index < len(_kinds):
+        line = line + '{}:{} '.format(_kind_names[index], _kind_count[index])
+        if len(line) > 20 and row < 5:
+            img.print(line, 1, 1 + LINE_HEIGHT * row, TEXT_COLOR)
+            line = ''
+            row += 1
+        index += 1
+    if len(line) > 0 and row < 5:
+        img.print(line, 1, 1 + LINE_HEIGHT * row, TEXT_COLOR)
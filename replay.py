@@ -0,0 +1,209 @@
+# replay.py
+# Deterministic input recording and playback.
+#
+# Every scheduler step the seven buttons are sampled into a bit mask and
+# appended to a run-length encoded buffer: a header (magic, galaxy size,
+# seed) followed by [mask, repeat] byte pairs, so held or idle input costs
+# two bytes per 255 steps. Because all generation is seeded, playing the
+# buffer back from start_new_galaxy(seed) reproduces the run step for step.
+# Playback drives the buttons with set_pressed(), so the normal controller
+# handlers fire; while recording or playing, time-budgeted work runs fixed
+# amounts per step (is_active()) so wall-clock time cannot change the run,
+# and the scheduler runs in lockstep: exactly one STEP_MS step per frame, so
+# step n of the recording is frame n of the physics on playback too. The
+# recording buffer only exists from start_recording() until it is stored
+# after recording stops.
+# Headless, tools/input_replay.py plays recordings as fast as it can.
+
+import scheduler
+
+REPLAY_MAGIC_0 = 0x52
+REPLAY_MAGIC_1 = 0x50
+OFFSET_GALAXY_SIZE = 2
+OFFSET_SEED = 4
+HEADER_SIZE = 8
+MAX_RUNS = 1024
+MAX_REPEAT = 255
+SETTINGS_KEY = 'rp'
+
+# Debug switches: record new runs, keep the recording in settings on every
+# scene change, and play the stored recording instead of starting a run at
+# boot.
+RECORD = False
+PERSIST = False
+REPLAY_ON_BOOT = False
+
+# Mask bit order.
+_buttons = [controller.left, controller.right, controller.up, controller.down,
+            controller.A, controller.B, controller.menu]
+
+_buffer = None
+_length = 0
+_recording = False
+
+_playback = None
+_play_pos = 0
+_play_repeat = 0
+
+
+def start_recording(seed, galaxy_size):
+    # Rerolling the galaxy mid-recording keeps the one recording going.
+    global _buffer, _length, _recording
+    if _recording or _playback is not None:
+        return
+    if _buffer is None:
+        _buffer = control.create_buffer(HEADER_SIZE + MAX_RUNS * 2)
+    _buffer[0] = REPLAY_MAGIC_0
+    _buffer[1] = REPLAY_MAGIC_1
+    _buffer[OFFSET_GALAXY_SIZE] = galaxy_size & 0xff
+    _buffer[OFFSET_GALAXY_SIZE + 1] = (galaxy_size >> 8) & 0xff
+    index = 0
+    while index < 4:
+        _buffer[OFFSET_SEED + index] = (seed >> (index * 8)) & 0xff
+        index += 1
+    _length = HEADER_SIZE
+    _recording = True
+    scheduler.set_lockstep(True)
+
+
+def stop_recording():
+    global _recording
+    _recording = False
+    scheduler.set_lockstep(_playback is not None)
+
+
+def is_recording():
+    return _recording
+
+
+def runs_left():
+    if _buffer is None:
+        return 0
+    return (len(_buffer) - _length) // 2
+
+
+def is_active():
+    # True while timing must not change outcomes: recording or playing back.
+    return _recording or _playback is not None
+
+
+def recording():
+    # A copy of the recording so far, trimmed to its used length.
+    data = control.create_buffer(_length)
+    index = 0
+    while index < _length:
+        data[index] = _buffer[index]
+        index += 1
+    return data
+
+
+def store():
+    # Keep the recording in settings; once recording has stopped the
+    # buffer is freed, as nothing more can be added to it.
+    global _buffer, _length
+    if _length > 0:
+        settings.write_buffer(SETTINGS_KEY, recording())
+    if not _recording:
+        _buffer = None
+        _length = 0
+
+
+def stored():
+    if not settings.exists(SETTINGS_KEY):
+        return None
+    return settings.read_buffer(SETTINGS_KEY)
+
+
+def is_valid(data):
+    return (data is not None and len(data) >= HEADER_SIZE
+            and data[0] == REPLAY_MAGIC_0 and data[1] == REPLAY_MAGIC_1)
+
+
+def recorded_seed(data):
+    return (data[OFFSET_SEED] | (data[OFFSET_SEED + 1] << 8)
+            | (data[OFFSET_SEED + 2] << 16) | (data[OFFSET_SEED + 3] << 24))
+
+
+def recorded_galaxy_size(data):
+    return data[OFFSET_GALAXY_SIZE] | (data[OFFSET_GALAXY_SIZE + 1] << 8)
+
+
+def recorded_steps(data):
+    steps = 0
+    pos = HEADER_SIZE
+    while pos + 1 < len(data):
+        steps += data[pos + 1]
+        pos += 2
+    return steps
+
+
+def play(data):
+    # Feed `data` to the buttons from the next step on. Call right after
+    # start_new_galaxy(recorded_seed(data)); False for a bad buffer.
+    global _playback, _play_pos, _play_repeat, _recording
+    if not is_valid(data):
+        return False
+    _playback = data
+    _play_pos = HEADER_SIZE
+    _play_repeat = 0
+    _recording = False
+    scheduler.set_lockstep(True)
+    return True
+
+
+def is_playing():
+    return _playback is not None
+
+
+def _tick():
+    if _playback is not None:
+        _play_step()
+    elif _recording:
+        _record_step()
+
+
+def _record_step():
+    global _length, _recording
+    mask = 0
+    bit = 1
+    index = 0
+    while index < len(_buttons):
+        if _buttons[index].is_pressed():
+            mask |= bit
+        bit = bit << 1
+        index += 1
+    if _length > HEADER_SIZE and _buffer[_length - 2] == mask and _buffer[_length - 1] < MAX_REPEAT:
+        _buffer[_length - 1] = _buffer[_length - 1] + 1
+    elif _length + 2 <= len(_buffer):
+        _buffer[_length] = mask
+        _buffer[_length + 1] = 1
+        _length += 2
+    else:
+        # Full: keep what fits rather than wrapping and losing the start.
+        stop_recording()
+
+
+def _play_step():
+    global _playback, _play_pos, _play_repeat
+    if _play_pos + 1 >= len(_playback):
+        _playback = None
+        scheduler.set_lockstep(False)
+        _apply(0)
+        return
+    _apply(_playback[_play_pos])
+    _play_repeat += 1
+    if _play_repeat >= _playback[_play_pos + 1]:
+        _play_pos += 2
+        _play_repeat = 0
+
+
+def _apply(mask):
+    bit = 1
+    index = 0
+    while index < len(_buttons):
+        _buttons[index].set_pressed((mask & bit) != 0)
+        bit = bit << 1
+        index += 1
+
+
+scheduler.register('replay', _tick, scheduler.PRIORITY_INPUT)
@@ -0,0 +1,102 @@
+# rng.py
+# Seeded linear congruential generators shared by worldgen and scenes.
+#
+# A generator is a list [state, multiplier, increment, mask] so callers keep
+# it in a local and every draw is one multiply-add, done through _mul so the
+# product stays exact where numbers are doubles. Two families exist and
+# must stay distinct to reproduce existing seeds: world() drives galaxy and
+# terrain generation, encounter() drives enemy and surface spawns.
+
+WORLD_MULTIPLIER = 1664525
+WORLD_INCREMENT = 1013904223
+WORLD_MASK = 0xffffffff
+
+ENCOUNTER_MULTIPLIER = 1103515245
+ENCOUNTER_INCREMENT = 12345
+ENCOUNTER_MASK = 0x7fffffff
+
+
+def world(seed):
+    return [seed & WORLD_MASK, WORLD_MULTIPLIER, WORLD_INCREMENT, WORLD_MASK]
+
+
+def encounter(seed):
+    return [seed & ENCOUNTER_MASK, ENCOUNTER_MULTIPLIER, ENCOUNTER_INCREMENT, ENCOUNTER_MASK]
+
+
+def next_value(gen):
+    gen[0] = (_mul(gen[1], gen[0], gen[3]) + gen[2]) & gen[3]
+    return gen[0]
+
+
+def below(gen, bound):
+    # Uniform-ish draw in [0, bound); 0 without drawing for an empty range.
+    if bound <= 0:
+        return 0
+    gen[0] = (_mul(gen[1], gen[0], gen[3]) + gen[2]) & gen[3]
+    return gen[0] % bound
+
+
+def between(gen, minimum, maximum):
+    # Draw in [minimum, maximum], inclusive; minimum without drawing when
+    # the range is empty.
+    span = maximum - minimum + 1
+    if span <= 0:
+        return minimum
+    gen[0] = (_mul(gen[1], gen[0], gen[3]) + gen[2]) & gen[3]
+    return minimum + gen[0] % span
+
+
+def fill(gen, count, minimum, maximum, out=None):
+    # `count` draws of between(gen, minimum, maximum) written to out[0..count),
+    # growing `out` if needed. Same values as calling between() in a loop.
+    if out is None:
+        out = []
+    while len(out) < count:
+        out.append(0)
+    span = maximum - minimum + 1
+    if span <= 0:
+        index = 0
+        while index < count:
+            out[index] = minimum
+            index += 1
+        return out
+    state = gen[0]
+    multiplier = gen[1]
+    increment = gen[2]
+    mask = gen[3]
+    index = 0
+    while index < count:
+        state = (_mul(multiplier, state, mask) + increment) & mask
+        out[index] = minimum + state % span
+        index += 1
+    gen[0] = state
+    return out
+
+
+def skip(gen, draws):
+    # Advance by `draws` values in O(log draws): compose the step x -> a*x + c
+    # with itself by repeated squaring and apply the result once. Products go
+    # through _mul so they stay exact where numbers are doubles.
+    mask = gen[3]
+    step_mul = gen[1]
+    step_add = gen[2]
+    total_mul = 1
+    total_add = 0
+    while draws > 0:
+        if draws & 1:
+            total_mul = _mul(total_mul, step_mul, mask)
+            total_add = (_mul(total_add, step_mul, mask) + step_add) & mask
+        step_add = (_mul(step_add, step_mul, mask) + step_add) & mask
+        step_mul = _mul(step_mul, step_mul, mask)
+        draws = draws >> 1
+    gen[0] = (_mul(total_mul, gen[0], mask) + total_add) & mask
+    return gen
+
+
+def _mul(a, b, mask):
+    # a * b & mask for 32-bit a and b. On the device numbers are JS doubles,
+    # exact only below 2^53, so multiply by b's 16-bit halves the way a
+    # 32-bit imul does: the high half only matters mod 2^16.
+    high = ((a * ((b // 0x10000) & 0xffff)) & 0xffff) * 0x10000
+    return (high + a * (b & 0xffff)) & mask
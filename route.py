@@ -0,0 +1,349 @@
+# route.py
+# Jump routes across the galaxy map: a precomputed neighbour graph with fuel
+# costs, Dijkstra for "nearest station" and "reachable with this fuel", and
+# A* for system-to-system paths.
+#
+# The graph is built once per galaxy store in compressed sparse row form:
+# _offsets[i].._offsets[i + 1] index system i's edges in byte buffers holding
+# the 16-bit target and the fuel cost of each jump. A jump reaches the eight
+# neighbouring map cells and costs more the longer it is and the more
+# hazardous the destination star. Searches stamp the nodes they touch with a
+# query number instead of clearing per-node arrays, so a search costs what
+# it explores, not the galaxy size, and results are cached until the galaxy,
+# start system or fuel changes.
+
+import galaxy
+
+JUMP_FUEL_PER_PX = 10
+# Pixel distance between neighbouring map cells.
+SYSTEM_STEP_X_PX = galaxy.SYSTEM_SPACING_X
+SYSTEM_STEP_Y_PX = galaxy.SYSTEM_SPACING_Y
+# Extra fuel to jump into each star type (galaxy.STAR_TYPES order).
+STAR_HAZARD = [0, 0, 0, 1, 2]
+# Node flags are galaxy.system_header(): star type << 1 | station bit.
+NODE_STATION = galaxy.SYSTEM_FLAG_STATION
+# Heap entries pack cost * HEAP_SPAN + system into one int.
+HEAP_SPAN = 65536
+
+_store = None
+_store_seed = 0
+_store_count = 0
+_offsets = []
+_targets = None
+_costs = None
+_node_flags = None
+# Cheapest jump that changes the column, and one that changes the row.
+_col_jump = 1
+_row_jump = 1
+
+# Per-system search state, valid only where _stamp matches _query.
+_stamp = []
+_dist = []
+_prev = []
+_query = 0
+_heap = []
+# Systems stamped by the current query, in the order they were reached.
+_touched = []
+
+# Last query of each kind: its start system and fuel, and the result.
+_station_start = -1
+_station_fuel = 0
+_station_path = None
+_station_cost = 0
+_reach_start = -1
+_reach_fuel = 0
+_reach_bits = None
+_reach_count = 0
+_last_cost = 0
+
+
+def build(store):
+    # (Re)build the jump graph for `store`; queries call this when needed.
+    global _store, _store_seed, _store_count, _targets, _costs, _node_flags, _col_jump, _row_jump
+    count = galaxy.system_count(store)
+    columns = galaxy.system_columns(store)
+    while len(_offsets) > 0:
+        _offsets.pop()
+    _node_flags = control.create_buffer(count)
+    seed = store['seed']
+    index = 0
+    while index < count:
+        # Light header roll: generating whole systems here would flush the
+        # store's slot cache and roll every planet in the galaxy.
+        _node_flags[index] = galaxy.system_header(seed, index)
+        index += 1
+    # Jump fuel before hazard per direction, (dy + 1) * 3 + dx + 1.
+    fuel = []
+    dy = -1
+    while dy <= 1:
+        dx = -1
+        while dx <= 1:
+            fuel.append(_jump_fuel(SYSTEM_STEP_X_PX * (dx * dx), SYSTEM_STEP_Y_PX * (dy * dy)))
+            dx += 1
+        dy += 1
+    # Sized for eight jumps per system; edge cells use fewer.
+    _targets = control.create_buffer(count * 16)
+    _costs = control.create_buffer(count * 8)
+    edges = 0
+    index = 0
+    while index < count:
+        _offsets.append(edges)
+        edges += _neighbour_cells(index, columns, count, fuel, edges)
+        index += 1
+    _offsets.append(edges)
+    diagonal = _jump_fuel(SYSTEM_STEP_X_PX, SYSTEM_STEP_Y_PX)
+    _col_jump = min(_jump_fuel(SYSTEM_STEP_X_PX, 0), diagonal)
+    _row_jump = min(_jump_fuel(0, SYSTEM_STEP_Y_PX), diagonal)
+    while len(_stamp) < count:
+        _stamp.append(0)
+        _dist.append(0)
+        _prev.append(-1)
+    _store = store
+    _store_seed = store['seed']
+    _store_count = count
+    invalidate()
+
+
+def invalidate():
+    # Forget cached query results (the graph itself is kept).
+    global _station_start, _reach_start
+    _station_start = -1
+    _reach_start = -1
+
+
+def edge_start(index):
+    return _offsets[index]
+
+
+def edge_end(index):
+    return _offsets[index + 1]
+
+
+def edge_target(edge):
+    return _targets[edge * 2] | (_targets[edge * 2 + 1] << 8)
+
+
+def edge_cost(edge):
+    return _costs[edge]
+
+
+def last_cost():
+    # Fuel cost of the path returned by the last path query.
+    return _last_cost
+
+
+def nearest_station(store, start, fuel):
+    # Cheapest path (list of systems, start first) to the closest station
+    # within `fuel`; None when no station is in range.
+    global _station_start, _station_fuel, _station_path, _station_cost, _last_cost
+    _ensure(store)
+    if start != _station_start or fuel != _station_fuel:
+        goal = _search(start, fuel, NODE_STATION)
+        _station_path = _path_to(goal) if goal >= 0 else None
+        _station_cost = _dist[goal] if goal >= 0 else 0
+        _station_start = start
+        _station_fuel = fuel
+    _last_cost = _station_cost
+    return _station_path
+
+
+def reachable(store, start, fuel):
+    # Bitset (one bit per system, save.py layout) of systems within `fuel`.
+    global _reach_start, _reach_fuel, _reach_bits, _reach_count
+    _ensure(store)
+    if start != _reach_start or fuel != _reach_fuel:
+        _search(start, fuel, 0)
+        _reach_bits = control.create_buffer((_store_count + 7) >> 3)
+        _reach_count = len(_touched)
+        index = 0
+        while index < _reach_count:
+            system = _touched[index]
+            _reach_bits[system >> 3] = _reach_bits[system >> 3] | (1 << (system & 7))
+            index += 1
+        _reach_start = start
+        _reach_fuel = fuel
+    return _reach_bits
+
+
+def reachable_count(store, start, fuel):
+    reachable(store, start, fuel)
+    return _reach_count
+
+
+def path(store, start, goal):
+    # Cheapest path from start to goal with A*; None if there is none.
+    global _last_cost
+    _ensure(store)
+    columns = galaxy.system_columns(store)
+    _begin_query(start)
+    _push(_heuristic(start, goal, columns), start)
+    while len(_heap) > 0:
+        entry = _pop()
+        node = entry % HEAP_SPAN
+        cost = _dist[node]
+        if entry // HEAP_SPAN != cost + _heuristic(node, goal, columns):
+            continue
+        if node == goal:
+            _last_cost = cost
+            return _path_to(goal)
+        edge = _offsets[node]
+        end = _offsets[node + 1]
+        while edge < end:
+            target = _targets[edge * 2] | (_targets[edge * 2 + 1] << 8)
+            total = cost + _costs[edge]
+            if _stamp[target] != _query or total < _dist[target]:
+                if _stamp[target] != _query:
+                    _touched.append(target)
+                _stamp[target] = _query
+                _dist[target] = total
+                _prev[target] = node
+                _push(total + _heuristic(target, goal, columns), target)
+            edge += 1
+    _last_cost = 0
+    return None
+
+
+def _ensure(store):
+    if store is not _store or store['seed'] != _store_seed or galaxy.system_count(store) != _store_count:
+        build(store)
+
+
+def _jump_fuel(dx, dy):
+    # Octagonal distance estimate, as in enemy_ai, turned into fuel.
+    if dx > dy:
+        length = dx + ((dy * 3) >> 3)
+    else:
+        length = dy + ((dx * 3) >> 3)
+    return 1 + length // JUMP_FUEL_PER_PX
+
+
+def _neighbour_cells(index, columns, count, fuel, edge):
+    # Write the jumps out of `index` from `edge` on; returns how many.
+    col = index % columns
+    written = 0
+    dy = -1
+    while dy <= 1:
+        target = index + dy * columns - 1
+        dx = -1
+        while dx <= 1:
+            if (dx != 0 or dy != 0) and target >= 0 and target < count and col + dx >= 0 and col + dx < columns:
+                at = edge + written
+                _targets[at * 2] = target & 0xff
+                _targets[at * 2 + 1] = target >> 8
+                _costs[at] = fuel[(dy + 1) * 3 + dx + 1] + STAR_HAZARD[_node_flags[target] >> 1]
+                written += 1
+            target += 1
+            dx += 1
+        dy += 1
+    return written
+
+
+def _heuristic(node, goal, columns):
+    # A path needs dc column-changing jumps (each >= _col_jump) and dr
+    # row-changing ones (each >= _row_jump); jumps beyond the larger of the
+    # two cost at least the cheaper kind. Never overestimates, so A* is exact.
+    dc = node % columns - goal % columns
+    dr = node // columns - goal // columns
+    if dc < 0:
+        dc = -dc
+    if dr < 0:
+        dr = -dr
+    cheapest = _col_jump if _col_jump < _row_jump else _row_jump
+    by_cols = dc * _col_jump
+    by_rows = dr * _row_jump
+    if dr > dc:
+        by_cols += (dr - dc) * cheapest
+    else:
+        by_rows += (dc - dr) * cheapest
+    if by_rows > by_cols:
+        return by_rows
+    return by_cols
+
+
+def _begin_query(start):
+    global _query
+    _query += 1
+    while len(_heap) > 0:
+        _heap.pop()
+    while len(_touched) > 0:
+        _touched.pop()
+    _touched.append(start)
+    _stamp[start] = _query
+    _dist[start] = 0
+    _prev[start] = -1
+
+
+def _search(start, fuel, wanted):
+    # Dijkstra from start within `fuel`. With `wanted` flags, stops at and
+    # returns the first system that has them (-1 if none); otherwise runs
+    # until everything in range is settled and returns -1.
+    _begin_query(start)
+    _push(0, start)
+    while len(_heap) > 0:
+        entry = _pop()
+        node = entry % HEAP_SPAN
+        cost = entry // HEAP_SPAN
+        if cost != _dist[node]:
+            continue
+        if wanted != 0 and (_node_flags[node] & wanted) != 0:
+            return node
+        edge = _offsets[node]
+        end = _offsets[node + 1]
+        while edge < end:
+            target = _targets[edge * 2] | (_targets[edge * 2 + 1] << 8)
+            total = cost + _costs[edge]
+            if total <= fuel and (_stamp[target] != _query or total < _dist[target]):
+                if _stamp[target] != _query:
+                    _touched.append(target)
+                _stamp[target] = _query
+                _dist[target] = total
+                _prev[target] = node
+                _push(total, target)
+            edge += 1
+    return -1
+
+
+def _path_to(goal):
+    result = []
+    node = goal
+    while node >= 0:
+        result.insert(0, node)
+        node = _prev[node]
+    return result
+
+
+def _push(cost, node):
+    heap = _heap
+    heap.append(cost * HEAP_SPAN + node)
+    child = len(heap) - 1
+    while child > 0:
+        parent = (child - 1) >> 1
+        if heap[parent] <= heap[child]:
+            break
+        swap = heap[parent]
+        heap[parent] = heap[child]
+        heap[child] = swap
+        child = parent
+
+
+def _pop():
+    heap = _heap
+    top = heap[0]
+    last = heap.pop()
+    size = len(heap)
+    if size > 0:
+        heap[0] = last
+        parent = 0
+        while True:
+            child = parent * 2 + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[parent] <= heap[child]:
+                break
+            swap = heap[parent]
+            heap[parent] = heap[child]
+            heap[child] = swap
+            parent = child
+    return top
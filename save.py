@@ -0,0 +1,353 @@
+# save.py
+# Compact save/restore of a run through the settings key-value store.
+#
+# A save is a fixed byte layout split into BLOCK_SIZE blocks, each stored
+# under its own settings key. Block 0 holds the header (magic, version,
+# seed, galaxy size) and the player record with its cargo hold; the
+# visited, cleared, collected and docked bitsets follow, then the active
+# missions and the accepted-offer bitset, each starting on a block
+# boundary. save() packs the current state and writes only the blocks whose
+# bytes changed since the last write, so a typical save touches one or two
+# small keys. Everything else (systems, planets, terrain, market stock) is
+# regenerated from the seed on restore.
+
+import galaxy
+import missions
+
+SAVE_MAGIC_0 = 0x58
+SAVE_MAGIC_1 = 0x53
+SAVE_VERSION = 4
+# Version 1 saves end before the docked bitset; they load with none docked.
+SAVE_VERSION_NO_DOCKED = 1
+# Version 2 saves left the cargo bytes zero; they load with an empty hold.
+SAVE_VERSION_NO_CARGO = 2
+# Version 3 saves end before the missions; they load with none active.
+SAVE_VERSION_NO_MISSIONS = 3
+BLOCK_SIZE = 32
+KEY_PREFIX = 'sg'
+
+# Block 0 field offsets.
+OFFSET_MAGIC = 0
+OFFSET_VERSION = 2
+OFFSET_SEED = 4
+OFFSET_GALAXY_SIZE = 8
+OFFSET_CURSOR = 10
+OFFSET_ACTIVE_SYSTEM = 12
+# Stored active system before any system has been played (-1 in state).
+NO_SYSTEM = 0xffff
+OFFSET_HULL = 14
+OFFSET_SHIELD = 16
+OFFSET_CREDITS = 18
+OFFSET_RESOURCES = 22
+OFFSET_FUEL = 26
+OFFSET_WEAPON = 27
+# One byte per market commodity (market.COMMODITY_COUNT).
+OFFSET_CARGO = 28
+CARGO_BYTES = 4
+
+# Missions block: one record per missions.MAX_ACTIVE slot, laid out as
+# event (0xff for a free slot), target (16 bits), need, done, reward (16 bits).
+MISSION_BYTES = 7
+MISSION_EVENT = 0
+MISSION_TARGET = 1
+MISSION_NEED = 3
+MISSION_DONE = 4
+MISSION_REWARD = 5
+MISSION_FREE = 0xff
+
+# Packed image (one buffer per block) and the bytes last written per block.
+_blocks = []
+_written = []
+_last_blocks_written = 0
+
+
+def new_progress(state):
+    # Fresh, empty progress bitsets sized for the current galaxy.
+    size = state['galaxy_size']
+    state['visited'] = control.create_buffer(_bitset_bytes(size))
+    state['cleared'] = control.create_buffer(_bitset_bytes(size))
+    state['collected'] = control.create_buffer(_bitset_bytes(size * galaxy.MAX_PLANETS))
+    state['docked'] = control.create_buffer(_bitset_bytes(size))
+
+
+def mark(bits, index):
+    if bits is not None:
+        bits[index >> 3] = bits[index >> 3] | (1 << (index & 7))
+
+
+def planet_key(system_index, planet_index):
+    # Bit index of a planet in the collected bitset.
+    return system_index * galaxy.MAX_PLANETS + planet_index
+
+
+def is_marked(bits, index):
+    if bits is None:
+        return False
+    return (bits[index >> 3] >> (index & 7)) & 1 == 1
+
+
+def save(state):
+    # Write the blocks that differ from the last save; returns how many.
+    global _last_blocks_written
+    _pack(state)
+    written = 0
+    block = 0
+    while block < len(_blocks):
+        if _block_changed(block):
+            settings.write_buffer(KEY_PREFIX + str(block), _blocks[block])
+            _remember(block)
+            written += 1
+        block += 1
+    _last_blocks_written = written
+    return written
+
+
+def load(state):
+    # Restore seed, cursor, player and progress into `state`; False when no
+    # compatible save exists. The caller rebuilds the galaxy from the seed.
+    header = _read_block(0)
+    if header is None or header[OFFSET_MAGIC] != SAVE_MAGIC_0 or header[OFFSET_MAGIC + 1] != SAVE_MAGIC_1:
+        return False
+    version = header[OFFSET_VERSION]
+    if version < SAVE_VERSION_NO_DOCKED or version > SAVE_VERSION:
+        return False
+    size = _get16(header, OFFSET_GALAXY_SIZE)
+    count = _block_count(size)
+    if version == SAVE_VERSION_NO_DOCKED:
+        count = _docked_start(size) // BLOCK_SIZE
+    elif version < SAVE_VERSION:
+        count = _missions_start(size) // BLOCK_SIZE
+    loaded = [header]
+    block = 1
+    while block < count:
+        data = _read_block(block)
+        if data is None:
+            return False
+        loaded.append(data)
+        block += 1
+    _resize(count)
+    block = 0
+    while block < count:
+        _copy_block(loaded[block], _blocks[block])
+        _remember(block)
+        block += 1
+    state['galaxy_seed'] = _get32(header, OFFSET_SEED)
+    state['galaxy_size'] = size
+    state['cursor_index'] = _get16(header, OFFSET_CURSOR)
+    state['active_system'] = _get16(header, OFFSET_ACTIVE_SYSTEM)
+    if state['active_system'] == NO_SYSTEM:
+        state['active_system'] = -1
+    player = state['player']
+    player['hull'] = _get16(header, OFFSET_HULL)
+    player['shield'] = _get16(header, OFFSET_SHIELD)
+    player['credits'] = _get32(header, OFFSET_CREDITS)
+    player['resources'] = _get32(header, OFFSET_RESOURCES)
+    player['fuel'] = header[OFFSET_FUEL]
+    player['weapon'] = header[OFFSET_WEAPON]
+    cargo = []
+    while len(cargo) < CARGO_BYTES:
+        cargo.append(header[OFFSET_CARGO + len(cargo)])
+    player['cargo'] = cargo
+    new_progress(state)
+    _unpack_bits(state['visited'], _visited_start())
+    _unpack_bits(state['cleared'], _cleared_start(size))
+    _unpack_bits(state['collected'], _collected_start(size))
+    if version != SAVE_VERSION_NO_DOCKED:
+        _unpack_bits(state['docked'], _docked_start(size))
+    missions.reset(size)
+    if version == SAVE_VERSION:
+        _unpack_missions(size)
+    return True
+
+
+def last_blocks_written():
+    return _last_blocks_written
+
+
+def save_bytes():
+    return len(_blocks) * BLOCK_SIZE
+
+
+def _pack(state):
+    size = state['galaxy_size']
+    _resize(_block_count(size))
+    header = _blocks[0]
+    header[OFFSET_MAGIC] = SAVE_MAGIC_0
+    header[OFFSET_MAGIC + 1] = SAVE_MAGIC_1
+    header[OFFSET_VERSION] = SAVE_VERSION
+    _put32(header, OFFSET_SEED, state['galaxy_seed'])
+    _put16(header, OFFSET_GALAXY_SIZE, size)
+    _put16(header, OFFSET_CURSOR, state['cursor_index'])
+    active = state.get('active_system', -1)
+    _put16(header, OFFSET_ACTIVE_SYSTEM, active if active >= 0 else NO_SYSTEM)
+    player = state['player']
+    _put16(header, OFFSET_HULL, _clamp(player.get('hull', 0), 0xffff))
+    _put16(header, OFFSET_SHIELD, _clamp(player.get('shield', 0), 0xffff))
+    _put32(header, OFFSET_CREDITS, _clamp(player.get('credits', 0), 0xffffffff))
+    _put32(header, OFFSET_RESOURCES, _clamp(player.get('resources', 0), 0xffffffff))
+    header[OFFSET_FUEL] = _clamp(player.get('fuel', 0), 0xff)
+    header[OFFSET_WEAPON] = _clamp(player.get('weapon', 0), 0xff)
+    cargo = player.get('cargo')
+    index = 0
+    while index < CARGO_BYTES:
+        header[OFFSET_CARGO + index] = _clamp(cargo[index], 0xff) if cargo is not None else 0
+        index += 1
+    _pack_bits(state['visited'], _visited_start())
+    _pack_bits(state['cleared'], _cleared_start(size))
+    _pack_bits(state['collected'], _collected_start(size))
+    _pack_bits(state['docked'], _docked_start(size))
+    _pack_missions(size)
+
+
+def _pack_missions(size):
+    record = _blocks[_missions_start(size) // BLOCK_SIZE]
+    slot = 0
+    while slot < missions.MAX_ACTIVE:
+        base = slot * MISSION_BYTES
+        event = missions.slot_event(slot)
+        if event < 0:
+            record[base + MISSION_EVENT] = MISSION_FREE
+        else:
+            record[base + MISSION_EVENT] = event
+            _put16(record, base + MISSION_TARGET, missions.slot_target(slot))
+            record[base + MISSION_NEED] = _clamp(missions.slot_need(slot), 0xff)
+            record[base + MISSION_DONE] = _clamp(missions.slot_done(slot), 0xff)
+            _put16(record, base + MISSION_REWARD, _clamp(missions.slot_reward(slot), 0xffff))
+        slot += 1
+    _pack_bits(missions.taken_bits(), _taken_start(size))
+
+
+def _unpack_missions(size):
+    # Call after missions.reset(): refill the slots and the offer bits.
+    record = _blocks[_missions_start(size) // BLOCK_SIZE]
+    slot = 0
+    while slot < missions.MAX_ACTIVE:
+        base = slot * MISSION_BYTES
+        if record[base + MISSION_EVENT] != MISSION_FREE:
+            missions.restore(slot, record[base + MISSION_EVENT], _get16(record, base + MISSION_TARGET),
+                             record[base + MISSION_NEED], record[base + MISSION_DONE],
+                             _get16(record, base + MISSION_REWARD))
+        slot += 1
+    _unpack_bits(missions.taken_bits(), _taken_start(size))
+
+
+def _pack_bits(bits, start):
+    index = 0
+    while index < len(bits):
+        address = start + index
+        _blocks[address // BLOCK_SIZE][address % BLOCK_SIZE] = bits[index]
+        index += 1
+
+
+def _unpack_bits(bits, start):
+    index = 0
+    while index < len(bits):
+        address = start + index
+        bits[index] = _blocks[address // BLOCK_SIZE][address % BLOCK_SIZE]
+        index += 1
+
+
+def _bitset_bytes(count):
+    return (count + 7) >> 3
+
+
+def _blocks_for(byte_count):
+    return (byte_count + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+
+def _visited_start():
+    return BLOCK_SIZE
+
+
+def _cleared_start(size):
+    return _visited_start() + _blocks_for(_bitset_bytes(size)) * BLOCK_SIZE
+
+
+def _collected_start(size):
+    return _cleared_start(size) + _blocks_for(_bitset_bytes(size)) * BLOCK_SIZE
+
+
+def _docked_start(size):
+    return _collected_start(size) + _blocks_for(_bitset_bytes(size * galaxy.MAX_PLANETS)) * BLOCK_SIZE
+
+
+def _missions_start(size):
+    return _docked_start(size) + _blocks_for(_bitset_bytes(size)) * BLOCK_SIZE
+
+
+def _taken_start(size):
+    return _missions_start(size) + BLOCK_SIZE
+
+
+def _block_count(size):
+    end = _taken_start(size) + _bitset_bytes(size * missions.OFFERS_PER_STATION)
+    return _blocks_for(end)
+
+
+def _resize(count):
+    # Grow or shrink the packed image; new blocks start unwritten (None).
+    while len(_blocks) < count:
+        _blocks.append(control.create_buffer(BLOCK_SIZE))
+        _written.append(None)
+    while len(_blocks) > count:
+        _blocks.pop()
+        _written.pop()
+
+
+def _remember(block):
+    if _written[block] is None:
+        _written[block] = control.create_buffer(BLOCK_SIZE)
+    _copy_block(_blocks[block], _written[block])
+
+
+def _block_changed(block):
+    current = _blocks[block]
+    stored = _written[block]
+    if stored is None:
+        return True
+    offset = 0
+    while offset < BLOCK_SIZE:
+        if current[offset] != stored[offset]:
+            return True
+        offset += 1
+    return False
+
+
+def _copy_block(source, target):
+    offset = 0
+    while offset < BLOCK_SIZE:
+        target[offset] = source[offset]
+        offset += 1
+
+
+def _read_block(block):
+    key = KEY_PREFIX + str(block)
+    if not settings.exists(key):
+        return None
+    return settings.read_buffer(key)
+
+
+def _clamp(value, maximum):
+    if value < 0:
+        return 0
+    if value > maximum:
+        return maximum
+    return int(value)
+
+
+def _put16(buf, offset, value):
+    buf[offset] = value & 0xff
+    buf[offset + 1] = (value >> 8) & 0xff
+
+
+def _put32(buf, offset, value):
+    _put16(buf, offset, value & 0xffff)
+    _put16(buf, offset + 2, (value >> 16) & 0xffff)
+
+
+def _get16(buf, offset):
+    return buf[offset] | (buf[offset + 1] << 8)
+
+
+def _get32(buf, offset):
+    return _get16(buf, offset) | (_get16(buf, offset + 2) << 16)
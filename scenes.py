@@ -0,0 +1,44 @@
+# scenes.py
+# Scene registry: every scene registers its handlers once, at import, into a
+# flat table indexed by scene id * HANDLER_SLOTS + slot, so dispatching an
+# event is one list lookup however many scenes exist.
+
+GALAXY_SCENE = 0
+SPACE_SCENE = 1
+PLANET_SCENE = 2
+STATION_SCENE = 3
+
+SLOT_SETUP = 0
+SLOT_TEARDOWN = 1
+SLOT_BUTTON_A = 2
+SLOT_BUTTON_B = 3
+SLOT_DIRECTION = 4
+SLOT_MENU = 5
+SLOT_UPDATE = 6
+HANDLER_SLOTS = 7
+
+_handlers = []
+
+
+def register(scene_id, setup, teardown, button_a, button_b, direction, menu, update):
+    # Handlers take the game state (direction also takes dx, dy); input
+    # handlers return an action name or None. Pass None for unused slots.
+    while len(_handlers) < (scene_id + 1) * HANDLER_SLOTS:
+        _handlers.append(None)
+    base = scene_id * HANDLER_SLOTS
+    _handlers[base + SLOT_SETUP] = setup
+    _handlers[base + SLOT_TEARDOWN] = teardown
+    _handlers[base + SLOT_BUTTON_A] = button_a
+    _handlers[base + SLOT_BUTTON_B] = button_b
+    _handlers[base + SLOT_DIRECTION] = direction
+    _handlers[base + SLOT_MENU] = menu
+    _handlers[base + SLOT_UPDATE] = update
+
+
+def handler(scene_id, slot):
+    return _handlers[scene_id * HANDLER_SLOTS + slot]
+
+
+def to_map(state):
+    # Shared menu handler for scenes that the menu button leaves.
+    return 'map'
@@ -0,0 +1,153 @@
+# scheduler.py
+# Central per-frame update loop with a fixed simulation step.
+#
+# Systems register once with a priority and an optional rate (run every Nth
+# step). A single game.on_update handler turns elapsed game time into whole
+# STEP_MS steps, runs the due systems in priority order, and skips LOW work
+# once the frame has used FRAME_BUDGET_US. Every system keeps call, skip and
+# timing counters for profiling. In lockstep (set by replay.py) every frame
+# runs exactly one step, whatever time elapsed, so steps line up with frames.
+
+import profiler
+
+# Input systems (replay) run first so later systems see this step's buttons.
+PRIORITY_INPUT = 0
+PRIORITY_CRITICAL = 1
+PRIORITY_NORMAL = 2
+PRIORITY_LOW = 3
+
+# 30 Hz simulation; a slow frame catches up at most MAX_STEPS_PER_FRAME steps.
+STEP_MS = 33
+MAX_STEPS_PER_FRAME = 2
+FRAME_BUDGET_US = 20000
+
+# Systems (parallel arrays), kept sorted by priority, then registration order.
+_names = []
+_handlers = []
+_priorities = []
+_every = []
+_calls = []
+_skips = []
+_time_us = []
+_max_us = []
+
+_registered = False
+_last_ms = -1
+_accumulator = 0
+_step_count = 0
+_overruns = 0
+_lockstep = False
+
+
+def register(name, handler, priority=PRIORITY_NORMAL, every=1):
+    # handler() runs on steps where step % every == 0; every=2 gives 15 Hz.
+    global _registered
+    index = len(_names)
+    while index > 0 and _priorities[index - 1] > priority:
+        index -= 1
+    _names.insert(index, name)
+    _handlers.insert(index, handler)
+    _priorities.insert(index, priority)
+    _every.insert(index, max(1, every))
+    _calls.insert(index, 0)
+    _skips.insert(index, 0)
+    _time_us.insert(index, 0)
+    _max_us.insert(index, 0)
+    if not _registered:
+        game.on_update(_on_frame)
+        _registered = True
+
+
+def system_count():
+    return len(_names)
+
+
+def system_name(index):
+    return _names[index]
+
+
+def system_calls(index):
+    return _calls[index]
+
+
+def system_skips(index):
+    return _skips[index]
+
+
+def system_time_us(index):
+    return _time_us[index]
+
+
+def system_max_us(index):
+    return _max_us[index]
+
+
+def set_lockstep(enabled):
+    global _lockstep
+    _lockstep = enabled
+
+
+def step_count():
+    return _step_count
+
+
+def overrun_count():
+    return _overruns
+
+
+def reset_stats():
+    global _overruns
+    index = 0
+    while index < len(_names):
+        _calls[index] = 0
+        _skips[index] = 0
+        _time_us[index] = 0
+        _max_us[index] = 0
+        index += 1
+    _overruns = 0
+
+
+def _on_frame():
+    global _last_ms, _accumulator, _overruns
+    if profiler.ENABLED:
+        profiler.frame()
+    now = game.runtime()
+    if _last_ms < 0:
+        _accumulator = STEP_MS
+    else:
+        _accumulator += now - _last_ms
+    _last_ms = now
+    if _lockstep:
+        _accumulator = STEP_MS
+    if _accumulator > STEP_MS * MAX_STEPS_PER_FRAME:
+        _accumulator = STEP_MS * MAX_STEPS_PER_FRAME
+    frame_start = control.micros()
+    over_budget = False
+    while _accumulator >= STEP_MS:
+        _accumulator -= STEP_MS
+        over_budget = _run_step(frame_start) or over_budget
+    if over_budget:
+        _overruns += 1
+
+
+def _run_step(frame_start):
+    # One fixed step; returns True when LOW work had to be skipped.
+    global _step_count
+    skipped = False
+    index = 0
+    while index < len(_names):
+        if _step_count % _every[index] == 0:
+            start = control.micros()
+            if _priorities[index] == PRIORITY_LOW and start - frame_start > FRAME_BUDGET_US:
+                _skips[index] += 1
+                skipped = True
+            else:
+                _handlers[index]()
+                elapsed = control.micros() - start
+                _calls[index] += 1
+                _time_us[index] += elapsed
+                if elapsed > _max_us[index]:
+                    _max_us[index] = elapsed
+        index += 1
+    _step_count += 1
+    return skipped
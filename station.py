@@ -1,7 +1,16 @@
 # station.py
 # Space station interactions for upgrades and refueling.
 
-STATION_TEXT_KIND = SpriteKind.create()
+import hud
+import listview
+import market
+import missions
+import scenes
+
+HELP_TEXT = 'Up/down to cycle, A to choose, B to depart'
+# Menu panel under the HUD strip: a title row and LIST_ROWS rows.
+LIST_TOP = 12
+LIST_ROWS = 9
 
 STATION_OPTIONS = [
     {
@@ -21,6 +30,17 @@ STATION_OPTIONS = [
     }
 ]
 
+# Menu rows of this visit (parallel arrays): what A does and its argument
+# (service option, commodity or mission offer).
+ENTRY_SERVICE = 0
+ENTRY_BUY = 1
+ENTRY_SELL = 2
+ENTRY_MISSION = 3
+_entry_kind = []
+_entry_arg = []
+# Row of the first market entry (buy, then sell, per commodity).
+_market_row = 0
+
 _active_state = None
 
 
@@ -30,39 +50,49 @@ def start_station_scene(state):
     scene.set_background_color(8)
     state['station_index'] = 0
     state['station_status'] = 'menu'
-    _ensure_option_text(state)
-    _refresh_station_text(state)
+    market.visit(state['galaxy'], state['active_system'])
+    missions.roll_offers(state['galaxy'], state['active_system'])
+    _build_entries()
+    listview.show(0, LIST_TOP, 160, LIST_ROWS, len(_entry_kind), _row_text, _title(state))
+    hud.show_message(HELP_TEXT)
 
 
 def cleanup_station_scene(state):
-    label = state.get('station_text')
-    if label:
-        label.destroy()
-        state['station_text'] = None
+    listview.hide()
     state['station_status'] = 'idle'
 
 
 def handle_button_a(state):
     if state.get('station_status') != 'menu':
         return None
-    option = STATION_OPTIONS[state['station_index']]
+    kind = _entry_kind[state['station_index']]
+    arg = _entry_arg[state['station_index']]
+    if kind == ENTRY_MISSION:
+        _accept_mission(state, arg)
+    elif kind == ENTRY_BUY or kind == ENTRY_SELL:
+        _trade(state, kind, arg)
+    else:
+        _buy_service(state, STATION_OPTIONS[arg])
+    return None
+
+
+def _buy_service(state, option):
     cost = option['cost']
     if state['player'].get('credits', 0) < cost:
-        _set_hud_text(state, 'Need {} credits'.format(cost))
-        return None
+        hud.show_message('Need {} credits'.format(cost))
+        return
     state['player']['credits'] -= cost
     effect = option['effect']
     if effect == 'refuel':
         state['player']['fuel'] = min(100, state['player'].get('fuel', 0) + 30)
-        _set_hud_text(state, 'Refueled +30')
+        hud.show_message('Refueled +30')
     elif effect == 'repair':
         state['player']['hull'] = min(10, state['player'].get('hull', 5) + 3)
-        _set_hud_text(state, 'Hull repaired')
+        hud.show_message('Hull repaired')
     elif effect == 'weapon':
         state['player']['weapon'] = state['player'].get('weapon', 0) + 1
-        _set_hud_text(state, 'Weapon upgraded')
-    _refresh_station_text(state)
-    return None
+        hud.show_message('Weapon upgraded')
+    listview.set_title(_title(state))
 
 
 def handle_button_b(state):
@@ -73,45 +103,89 @@ def handle_button_b(state):
 def handle_direction(state, dx, dy):
     if dy == 0:
         return None
-    index = state.get('station_index', 0)
-    index += -1 if dy < 0 else 1
-    if index < 0:
-        index = len(STATION_OPTIONS) - 1
-    if index >= len(STATION_OPTIONS):
-        index = 0
-    state['station_index'] = index
-    _refresh_station_text(state)
+    state['station_index'] = listview.move(-1 if dy < 0 else 1)
     return None
 
 
-def _ensure_option_text(state):
-    if state.get('station_text') is None:
-        img = image.create(160, 48)
-        label = sprites.create(img, STATION_TEXT_KIND)
-        label.set_flag(SpriteFlag.RELATIVE_TO_CAMERA, True)
-        label.left = 0
-        label.top = 20
-        label.z = 90
-        state['station_text'] = label
-
-
-def _refresh_station_text(state):
-    option = STATION_OPTIONS[state['station_index']]
-    credits = state['player'].get('credits', 0)
-    label = state.get('station_text')
-    if label:
-        img = label.image
-        img.fill(0)
-        img.print('Station Services', 2, 2, 1)
-        img.print(option['name'], 2, 14, 1)
-        img.print('Cost {} cr'.format(option['cost']), 2, 26, 1)
-        img.print('Credits {}'.format(credits), 2, 38, 1)
-    _set_hud_text(state, 'Use up/down to cycle, A to buy, B to depart')
-
-
-def _set_hud_text(state, text):
-    hud = state.get('hud_text')
-    if hud:
-        hud.image.fill(0)
-        hud.image.print(text, 1, 1, 1)
-
+def _build_entries():
+    global _market_row
+    while len(_entry_kind) > 0:
+        _entry_kind.pop()
+        _entry_arg.pop()
+    _add_entries(ENTRY_SERVICE, len(STATION_OPTIONS))
+    _market_row = len(_entry_kind)
+    good = 0
+    while good < market.COMMODITY_COUNT:
+        _entry_kind.append(ENTRY_BUY)
+        _entry_arg.append(good)
+        _entry_kind.append(ENTRY_SELL)
+        _entry_arg.append(good)
+        good += 1
+    _add_entries(ENTRY_MISSION, missions.offer_count())
+
+
+def _add_entries(kind, count):
+    arg = 0
+    while arg < count:
+        _entry_kind.append(kind)
+        _entry_arg.append(arg)
+        arg += 1
+
+
+def _trade(state, kind, good):
+    name = market.COMMODITY_NAMES[good]
+    if kind == ENTRY_BUY:
+        price = market.buy(state, good)
+        if price > 0:
+            hud.show_message('Bought {} for {} cr'.format(name, price))
+        elif market.stock(good) <= 0:
+            hud.show_message('{} sold out'.format(name))
+        else:
+            hud.show_message('Need {} credits'.format(market.buy_price(good)))
+    else:
+        price = market.sell(state, good)
+        if price > 0:
+            hud.show_message('Sold {} for {} cr'.format(name, price))
+        else:
+            hud.show_message('No {} in the hold'.format(name))
+    # Price, stock and hold show on both of the commodity's rows.
+    listview.redraw_row(_market_row + good * 2)
+    listview.redraw_row(_market_row + good * 2 + 1)
+    listview.set_title(_title(state))
+
+
+def _accept_mission(state, offer):
+    if missions.offer_taken(offer):
+        hud.show_message('Mission already taken')
+    elif missions.accept(offer):
+        hud.show_message('Accepted: ' + missions.offer_label(offer))
+    else:
+        hud.show_message('Mission log full ({})'.format(missions.MAX_ACTIVE))
+    listview.redraw_row(state['station_index'])
+    listview.set_title(_title(state))
+
+
+def _title(state):
+    return 'Cr {}  Jobs {}/{}'.format(state['player'].get('credits', 0), missions.active_count(),
+                                   missions.MAX_ACTIVE)
+
+
+def _row_text(index):
+    kind = _entry_kind[index]
+    arg = _entry_arg[index]
+    if kind == ENTRY_SERVICE:
+        option = STATION_OPTIONS[arg]
+        return '{} {}cr'.format(option['name'], option['cost'])
+    if kind == ENTRY_BUY:
+        return 'Buy {} {}cr ({} left)'.format(market.COMMODITY_NAMES[arg], market.buy_price(arg),
+                                             market.stock(arg))
+    if kind == ENTRY_SELL:
+        return 'Sell {} {}cr ({} held)'.format(market.COMMODITY_NAMES[arg], market.sell_price(arg),
+                                              market.cargo(_active_state, arg))
+    if missions.offer_taken(arg):
+        return missions.offer_label(arg) + ' taken'
+    return '{} +{}'.format(missions.offer_label(arg), missions.offer_reward(arg))
+
+
+scenes.register(scenes.STATION_SCENE, start_station_scene, cleanup_station_scene,
+                handle_button_a, handle_button_b, handle_direction, scenes.to_map, None)
@@ -0,0 +1,186 @@
+# surface.py
+# Chunk bookkeeping for planet surfaces larger than the screen.
+#
+# The surface is split into CHUNK_TILES x CHUNK_TILES tile chunks; a planet
+# gets 2-4 chunks per side depending on its size. sync() is called every
+# frame with the camera position: chunks within SPAWN_MARGIN of the view are
+# entered and chunks beyond KEEP_MARGIN are left, through callbacks that
+# spawn and release the chunk's sprites. At most LIVE_CHUNKS_MAX chunks are
+# live (the farthest goes first), so sprites stay bounded whatever the
+# planet size. Spawns are seeded per chunk, and collected resources are kept
+# as bits per chunk so a chunk that comes back does not refill.
+
+import rng
+import terrain
+
+CHUNK_TILES = 16
+TILE_PIXELS = 16
+CHUNK_PIXELS = CHUNK_TILES * TILE_PIXELS
+MAX_CHUNKS_PER_SIDE = terrain.TERRAIN_SIZE // CHUNK_TILES
+MIN_CHUNKS_PER_SIDE = 2
+# Planet size units per chunk of surface width.
+SIZE_PER_CHUNK = 12
+SCREEN_WIDTH = 160
+SCREEN_HEIGHT = 120
+# With a 32px spawn margin the view touches at most 2x2 chunks.
+SPAWN_MARGIN = 32
+KEEP_MARGIN = 64
+LIVE_CHUNKS_MAX = 4
+CHUNK_SALT = 0x6c8e
+
+_side = MIN_CHUNKS_PER_SIDE
+_live = []
+# Collected resource bits per chunk, and how many of the surface's total.
+_taken = []
+_collected = 0
+_total = 0
+# Spawn and keep ranges packed into one int, to skip unchanged frames.
+_last_key = -1
+
+
+def begin(planet, resources_in_chunk):
+    # New landing: size the surface and forget live chunks and pickups.
+    # resources_in_chunk(chunk) gives each chunk's resource count.
+    global _side, _collected, _total, _last_key
+    side = planet['size'] // SIZE_PER_CHUNK
+    if side < MIN_CHUNKS_PER_SIDE:
+        side = MIN_CHUNKS_PER_SIDE
+    if side > MAX_CHUNKS_PER_SIDE:
+        side = MAX_CHUNKS_PER_SIDE
+    _side = side
+    while len(_live) > 0:
+        _live.pop()
+    while len(_taken) < MAX_CHUNKS_PER_SIDE * MAX_CHUNKS_PER_SIDE:
+        _taken.append(0)
+    _total = 0
+    chunk = 0
+    while chunk < MAX_CHUNKS_PER_SIDE * MAX_CHUNKS_PER_SIDE:
+        _taken[chunk] = 0
+        if chunk < side * side:
+            _total += resources_in_chunk(chunk)
+        chunk += 1
+    _collected = 0
+    _last_key = -1
+
+
+def end():
+    global _last_key
+    while len(_live) > 0:
+        _live.pop()
+    _last_key = -1
+
+
+def extent_px():
+    return _side * CHUNK_PIXELS
+
+
+def chunk_left_tile(chunk):
+    return (chunk % _side) * CHUNK_TILES
+
+
+def chunk_top_tile(chunk):
+    return (chunk // _side) * CHUNK_TILES
+
+
+def chunk_seed(planet_seed, chunk):
+    return rng.next_value(rng.encounter(planet_seed ^ (CHUNK_SALT * (chunk + 1))))
+
+
+def live_count():
+    return len(_live)
+
+
+def take(chunk, node):
+    global _collected
+    if not is_taken(chunk, node):
+        _taken[chunk] = _taken[chunk] | (1 << node)
+        _collected += 1
+
+
+def is_taken(chunk, node):
+    return (_taken[chunk] >> node) & 1 == 1
+
+
+def collected():
+    return _collected
+
+
+def total():
+    return _total
+
+
+def camera_center(x, y):
+    # Camera centre following (x, y), kept inside the surface.
+    cx = _clamp(x, SCREEN_WIDTH // 2, extent_px() - SCREEN_WIDTH // 2)
+    cy = _clamp(y, SCREEN_HEIGHT // 2, extent_px() - SCREEN_HEIGHT // 2)
+    return cx, cy
+
+
+def sync(left, top, on_enter, on_leave):
+    # Enter and leave chunks for a view whose top-left is (left, top).
+    global _last_key
+    c0 = _chunk_of(left - SPAWN_MARGIN)
+    c1 = _chunk_of(left + SCREEN_WIDTH + SPAWN_MARGIN)
+    r0 = _chunk_of(top - SPAWN_MARGIN)
+    r1 = _chunk_of(top + SCREEN_HEIGHT + SPAWN_MARGIN)
+    k0 = _chunk_of(left - KEEP_MARGIN)
+    k1 = _chunk_of(left + SCREEN_WIDTH + KEEP_MARGIN)
+    q0 = _chunk_of(top - KEEP_MARGIN)
+    q1 = _chunk_of(top + SCREEN_HEIGHT + KEEP_MARGIN)
+    key = ((((((c0 * 4 + c1) * 4 + r0) * 4 + r1) * 4 + k0) * 4 + k1) * 4 + q0) * 4 + q1
+    if key == _last_key:
+        return
+    _last_key = key
+    index = len(_live) - 1
+    while index >= 0:
+        chunk = _live[index]
+        col = chunk % _side
+        row = chunk // _side
+        if col < k0 or col > k1 or row < q0 or row > q1:
+            _live.pop(index)
+            on_leave(chunk)
+        index -= 1
+    row = r0
+    while row <= r1:
+        col = c0
+        while col <= c1:
+            chunk = row * _side + col
+            if chunk not in _live:
+                if len(_live) >= LIVE_CHUNKS_MAX:
+                    _drop_farthest(left, top, on_leave)
+                _live.append(chunk)
+                on_enter(chunk)
+            col += 1
+        row += 1
+
+
+def _drop_farthest(left, top, on_leave):
+    cx = left + SCREEN_WIDTH // 2
+    cy = top + SCREEN_HEIGHT // 2
+    far = 0
+    far_distance = -1
+    index = 0
+    while index < len(_live):
+        chunk = _live[index]
+        dx = (chunk % _side) * CHUNK_PIXELS + CHUNK_PIXELS // 2 - cx
+        dy = (chunk // _side) * CHUNK_PIXELS + CHUNK_PIXELS // 2 - cy
+        distance = dx * dx + dy * dy
+        if distance > far_distance:
+            far = index
+            far_distance = distance
+        index += 1
+    chunk = _live.pop(far)
+    on_leave(chunk)
+
+
+def _chunk_of(pixel):
+    # Sprite positions are fractional; chunk indices must be ints.
+    return _clamp(int(pixel // CHUNK_PIXELS), 0, _side - 1)
+
+
+def _clamp(value, low, high):
+    if value < low:
+        return low
+    if value > high:
+        return high
+    return value
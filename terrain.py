@@ -0,0 +1,410 @@
+# terrain.py
+# Cellular-automata planet terrain with a small LRU cache of recent planets.
+#
+# A map is one byte per tile in a buffer laid out the way
+# tiles.create_tilemap() expects (4-byte width/height header, then rows), so
+# a cached map is handed to the tilemap without conversion. Generation is a
+# random rock fill, SMOOTH_PASSES smoothing passes ping-ponging between the
+# map and one shared scratch buffer, then flood-filled lakes and deposits.
+# It runs as a resumable job: begin() then step(budget_us) once per frame,
+# or step_units() when the frame count must not depend on timing (replays).
+
+import assets
+import galaxy
+import rng
+
+TERRAIN_SIZE = 64
+TILEMAP_HEADER = 4
+TILE_FLOOR = 0
+TILE_ROCK = 1
+TILE_WATER = 2
+TILE_FEATURE = 3
+TILE_TYPES = 4
+
+# Even, so the smoothed result ends up back in the map buffer.
+SMOOTH_PASSES = 4
+PLANET_CACHE_SIZE = 3
+
+# The explorer lands at (80, 60), i.e. tile (5, 3); keep that area open.
+LANDING_TILE_X = 5
+LANDING_TILE_Y = 3
+LANDING_RADIUS = 2
+
+LAKE_MAX_TILES = 48
+DEPOSIT_MAX_TILES = 6
+
+# Per biome: initial rock percentage, lake count, deposit count.
+_biome_rock = {
+    'ice': 44,
+    'desert': 40,
+    'jungle': 47,
+    'volcanic': 50,
+    'ocean': 38,
+    'crystal': 46
+}
+_biome_lakes = {
+    'ice': 2,
+    'desert': 0,
+    'jungle': 3,
+    'volcanic': 1,
+    'ocean': 6,
+    'crystal': 1
+}
+_biome_deposits = {
+    'ice': 3,
+    'desert': 2,
+    'jungle': 2,
+    'volcanic': 4,
+    'ocean': 1,
+    'crystal': 6
+}
+
+# Cache slots (parallel arrays); buffers and wall layers are reused on eviction.
+_cache_seeds = []
+_cache_maps = []
+_cache_walls = []
+_cache_used = []
+_clock = 0
+
+_scratch = None
+_blank_tilemap = None
+_col_sums = []
+_stack = []
+
+# The one generation job in flight (_job_slot < 0 when idle). _job_row counts
+# rows in the row phases and lakes/deposits placed in the scatter phases.
+PHASE_FILL = 0
+PHASE_SMOOTH = 1
+PHASE_LAKES = 2
+PHASE_DEPOSITS = 3
+PHASE_WALLS = 4
+
+_job_slot = -1
+_job_phase = PHASE_FILL
+_job_row = 0
+_job_pass = 0
+_job_biome = ''
+_job_rng = rng.world(0)
+_row_draws = []
+
+
+def begin_planet(planet):
+    return begin(planet['seed'], planet['biome'])
+
+
+def load(seed, biome):
+    # Synchronous generation; scenes use begin()/step() instead.
+    slot = begin(seed, biome)
+    while not step(0):
+        pass
+    return slot
+
+
+def begin(seed, biome):
+    # Start (or resume) building the map for `seed` and return its cache
+    # slot. A cache hit is ready at once; otherwise drive step() each frame.
+    global _clock, _job_slot, _job_phase, _job_row, _job_pass, _job_biome
+    _clock += 1
+    slot = _find_slot(seed)
+    if slot >= 0:
+        _cache_used[slot] = _clock
+        return slot
+    cancel()
+    slot = _claim_slot(seed)
+    _cache_used[slot] = _clock
+    _prepare_scratch()
+    tiles = _cache_maps[slot]
+    tiles[0] = TERRAIN_SIZE & 0xff
+    tiles[1] = TERRAIN_SIZE >> 8
+    tiles[2] = TERRAIN_SIZE & 0xff
+    tiles[3] = TERRAIN_SIZE >> 8
+    _job_rng[0] = seed & rng.WORLD_MASK
+    _job_slot = slot
+    _job_phase = PHASE_FILL
+    _job_row = 0
+    _job_pass = 0
+    _job_biome = biome
+    return slot
+
+
+def step(budget_us):
+    # Advance the running job by whole rows (or one lake/deposit) until
+    # `budget_us` microseconds have passed; at least one unit always runs.
+    # Returns True once the map is ready.
+    if _job_slot < 0:
+        return True
+    start = control.micros()
+    while _job_slot >= 0:
+        _step_unit()
+        if control.micros() - start >= budget_us:
+            break
+    return _job_slot < 0
+
+
+def step_units(units):
+    # Like step(), but a fixed number of work units instead of a time budget.
+    if _job_slot < 0:
+        return True
+    while _job_slot >= 0 and units > 0:
+        _step_unit()
+        units -= 1
+    return _job_slot < 0
+
+
+def is_ready(slot):
+    return slot != _job_slot
+
+
+def cancel():
+    # Drop an unfinished job; its half-built slot is forgotten.
+    global _job_slot
+    if _job_slot >= 0:
+        _cache_seeds[_job_slot] = -1
+        _cache_used[_job_slot] = 0
+        _job_slot = -1
+
+
+def tile_map(slot):
+    return _cache_maps[slot]
+
+
+def wall_layer(slot):
+    return _cache_walls[slot]
+
+
+def tile_at(tiles, tx, ty):
+    if tx < 0 or ty < 0 or tx >= TERRAIN_SIZE or ty >= TERRAIN_SIZE:
+        return TILE_ROCK
+    return tiles[TILEMAP_HEADER + ty * TERRAIN_SIZE + tx]
+
+
+def is_open(tiles, tx, ty):
+    tile = tile_at(tiles, tx, ty)
+    return tile == TILE_FLOOR or tile == TILE_FEATURE
+
+
+def nearest_open(tiles, tx, ty, max_tx, max_ty):
+    # Closest walkable tile to (tx, ty) inside [0, max_tx] x [0, max_ty],
+    # searched in growing square rings; returns tx + ty * TERRAIN_SIZE or -1.
+    return nearest_open_in(tiles, tx, ty, 0, 0, max_tx, max_ty)
+
+
+def nearest_open_in(tiles, tx, ty, min_tx, min_ty, max_tx, max_ty):
+    # nearest_open() inside [min_tx, max_tx] x [min_ty, max_ty].
+    radius = 0
+    while radius <= TERRAIN_SIZE:
+        y = ty - radius
+        while y <= ty + radius:
+            x = tx - radius
+            while x <= tx + radius:
+                on_ring = y == ty - radius or y == ty + radius or x == tx - radius or x == tx + radius
+                if (on_ring and x >= min_tx and y >= min_ty and x <= max_tx and y <= max_ty
+                        and is_open(tiles, x, y)):
+                    return x + y * TERRAIN_SIZE
+                x += 1
+            y += 1
+        radius += 1
+    return -1
+
+
+def apply(slot, biome):
+    # Show the cached map as the current tilemap with rock and water as walls.
+    biome_index = _biome_index(biome)
+    tileset = []
+    tile = 0
+    while tile < TILE_TYPES:
+        tileset.append(assets.get_image(assets.IMG_TILE, biome_index * TILE_TYPES + tile))
+        tile += 1
+    tiles.set_current_tilemap(tiles.create_tilemap(_cache_maps[slot], _cache_walls[slot], tileset, TileScale.SIXTEEN))
+
+
+def clear():
+    # Replace the planet tilemap with one transparent tile so later scenes
+    # show their plain background again.
+    global _blank_tilemap
+    if _blank_tilemap is None:
+        data = control.create_buffer(TILEMAP_HEADER + 1)
+        data[0] = 1
+        data[2] = 1
+        _blank_tilemap = tiles.create_tilemap(data, image.create(1, 1), [image.create(16, 16)], TileScale.SIXTEEN)
+    tiles.set_current_tilemap(_blank_tilemap)
+
+
+def _find_slot(seed):
+    slot = 0
+    while slot < len(_cache_seeds):
+        if _cache_seeds[slot] == seed:
+            return slot
+        slot += 1
+    return -1
+
+
+def _claim_slot(seed):
+    if len(_cache_seeds) < PLANET_CACHE_SIZE:
+        _cache_seeds.append(seed)
+        _cache_maps.append(control.create_buffer(TILEMAP_HEADER + TERRAIN_SIZE * TERRAIN_SIZE))
+        _cache_walls.append(image.create(TERRAIN_SIZE, TERRAIN_SIZE))
+        _cache_used.append(0)
+        return len(_cache_seeds) - 1
+    victim = 0
+    slot = 1
+    while slot < len(_cache_seeds):
+        if _cache_used[slot] < _cache_used[victim]:
+            victim = slot
+        slot += 1
+    _cache_seeds[victim] = seed
+    return victim
+
+
+def _prepare_scratch():
+    global _scratch
+    if _scratch is None:
+        _scratch = control.create_buffer(TILEMAP_HEADER + TERRAIN_SIZE * TERRAIN_SIZE)
+    while len(_col_sums) < TERRAIN_SIZE:
+        _col_sums.append(0)
+
+
+def _step_unit():
+    # Phases: rock fill by row, SMOOTH_PASSES smoothing passes by row
+    # (ping-ponging map and scratch), one lake or deposit per unit, then the
+    # wall layer by row.
+    global _job_slot, _job_phase, _job_row, _job_pass
+    tiles = _cache_maps[_job_slot]
+    if _job_phase == PHASE_FILL:
+        _fill_row(tiles, _job_row, _biome_rock.get(_job_biome, 45), _job_rng)
+    elif _job_phase == PHASE_SMOOTH:
+        if _job_pass % 2 == 0:
+            _smooth_row(tiles, _scratch, _job_row)
+        else:
+            _smooth_row(_scratch, tiles, _job_row)
+    elif _job_phase == PHASE_LAKES:
+        _scatter_one(tiles, _job_rng, TILE_WATER, LAKE_MAX_TILES)
+    elif _job_phase == PHASE_DEPOSITS:
+        _scatter_one(tiles, _job_rng, TILE_FEATURE, DEPOSIT_MAX_TILES)
+    else:
+        _build_wall_row(tiles, _cache_walls[_job_slot], _job_row)
+    _job_row += 1
+    if _job_phase == PHASE_FILL and _job_row >= TERRAIN_SIZE:
+        _job_phase = PHASE_SMOOTH
+        _job_row = 0
+    elif _job_phase == PHASE_SMOOTH and _job_row >= TERRAIN_SIZE:
+        _job_pass += 1
+        _job_row = 0
+        if _job_pass >= SMOOTH_PASSES:
+            _job_phase = PHASE_LAKES
+    if _job_phase == PHASE_LAKES and _job_row >= _biome_lakes.get(_job_biome, 1):
+        _job_phase = PHASE_DEPOSITS
+        _job_row = 0
+    if _job_phase == PHASE_DEPOSITS and _job_row >= _biome_deposits.get(_job_biome, 2):
+        _carve_landing(tiles)
+        _job_phase = PHASE_WALLS
+        _job_row = 0
+    if _job_phase == PHASE_WALLS and _job_row >= TERRAIN_SIZE:
+        _job_slot = -1
+
+
+def _fill_row(tiles, row, rock_percent, gen):
+    # Edge tiles are rock and take no draw; interior rows take one batch.
+    base = TILEMAP_HEADER + row * TERRAIN_SIZE
+    if row == 0 or row == TERRAIN_SIZE - 1:
+        x = 0
+        while x < TERRAIN_SIZE:
+            tiles[base + x] = TILE_ROCK
+            x += 1
+        return
+    rng.fill(gen, TERRAIN_SIZE - 2, 0, 99, _row_draws)
+    tiles[base] = TILE_ROCK
+    tiles[base + TERRAIN_SIZE - 1] = TILE_ROCK
+    x = 1
+    while x < TERRAIN_SIZE - 1:
+        if _row_draws[x - 1] < rock_percent:
+            tiles[base + x] = TILE_ROCK
+        else:
+            tiles[base + x] = TILE_FLOOR
+        x += 1
+
+
+def _smooth_row(source, target, row):
+    # 4-5 rule: rock with more than 4 rock neighbours, floor with fewer than
+    # 4, otherwise unchanged. Neighbours come from per-column 3-row sums.
+    base = TILEMAP_HEADER + row * TERRAIN_SIZE
+    if row == 0 or row == TERRAIN_SIZE - 1:
+        x = 0
+        while x < TERRAIN_SIZE:
+            target[base + x] = TILE_ROCK
+            x += 1
+        return
+    above = base - TERRAIN_SIZE
+    below = base + TERRAIN_SIZE
+    x = 0
+    while x < TERRAIN_SIZE:
+        _col_sums[x] = source[above + x] + source[base + x] + source[below + x]
+        x += 1
+    target[base] = TILE_ROCK
+    target[base + TERRAIN_SIZE - 1] = TILE_ROCK
+    window = _col_sums[0] + _col_sums[1] + _col_sums[2]
+    x = 1
+    while x < TERRAIN_SIZE - 1:
+        neighbours = window - source[base + x]
+        if neighbours > 4:
+            target[base + x] = TILE_ROCK
+        elif neighbours < 4:
+            target[base + x] = TILE_FLOOR
+        else:
+            target[base + x] = source[base + x]
+        if x + 2 < TERRAIN_SIZE:
+            window += _col_sums[x + 2] - _col_sums[x - 1]
+        x += 1
+
+
+def _scatter_one(tiles, gen, tile, max_tiles):
+    tx = 1 + rng.below(gen, TERRAIN_SIZE - 2)
+    ty = 1 + rng.below(gen, TERRAIN_SIZE - 2)
+    _flood(tiles, TILEMAP_HEADER + ty * TERRAIN_SIZE + tx, tile, max_tiles)
+
+
+def _flood(tiles, start, tile, max_tiles):
+    # Bounded 4-way flood fill over floor tiles. Map edges are always rock,
+    # so neighbour indices never leave the buffer.
+    filled = 0
+    _stack.append(start)
+    while len(_stack) > 0:
+        index = _stack.pop()
+        if filled < max_tiles and tiles[index] == TILE_FLOOR:
+            tiles[index] = tile
+            filled += 1
+            _stack.append(index + 1)
+            _stack.append(index - 1)
+            _stack.append(index + TERRAIN_SIZE)
+            _stack.append(index - TERRAIN_SIZE)
+
+
+def _carve_landing(tiles):
+    y = LANDING_TILE_Y - LANDING_RADIUS
+    while y <= LANDING_TILE_Y + LANDING_RADIUS:
+        x = LANDING_TILE_X - LANDING_RADIUS
+        while x <= LANDING_TILE_X + LANDING_RADIUS:
+            tiles[TILEMAP_HEADER + y * TERRAIN_SIZE + x] = TILE_FLOOR
+            x += 1
+        y += 1
+
+
+def _build_wall_row(tiles, walls, y):
+    base = TILEMAP_HEADER + y * TERRAIN_SIZE
+    x = 0
+    while x < TERRAIN_SIZE:
+        tile = tiles[base + x]
+        if tile == TILE_ROCK or tile == TILE_WATER:
+            walls.set_pixel(x, y, 1)
+        else:
+            walls.set_pixel(x, y, 0)
+        x += 1
+
+
+def _biome_index(biome):
+    index = 0
+    while index < len(galaxy.PLANET_BIOMES):
+        if galaxy.PLANET_BIOMES[index] == biome:
+            return index
+        index += 1
+    return 0
@@ -0,0 +1,714 @@
+# arcade_shim.py
+# Pure-CPython stand-in for the MakeCode Arcade APIs used by SpaceGame.
+#
+# Call install() before importing any game module: it publishes the Arcade
+# globals (sprites, image, scene, controller, control, game, SpriteKind, ...)
+# as builtins so the unmodified device scripts run headless. The runtime is a
+# fixed-step clock: every step() advances simulated time by FRAME_MS, delivers
+# queued controller events, runs update handlers, moves sprites and dispatches
+# overlaps, in roughly the order the device firmware does.
+
+import builtins
+import time
+
+SCREEN_WIDTH = 160
+SCREEN_HEIGHT = 120
+FRAME_MS = 33
+
+
+class GameOver(Exception):
+    # Raised by game.over(); the device stops the program at that point.
+
+    def __init__(self, win):
+        Exception.__init__(self, 'game over (win={})'.format(win))
+        self.win = win
+
+
+class _Runtime:
+    def __init__(self):
+        self.sprites = []
+        self.overlap_handlers = []
+        self.update_handlers = []
+        self.interval_handlers = []
+        self.movers = []
+        self.pending_events = []
+        self.millis = 0
+        self.frame = 0
+        self.background_color = 0
+        self.tilemap = None
+        self.camera_x = 0
+        self.camera_y = 0
+        self.splashes = []
+        self.settings = {}
+        self.settings_writes = 0
+        self.settings_bytes = 0
+
+    def reset_world(self):
+        # Drop sprites and scene state but keep registered handlers, which the
+        # game modules install once per program run.
+        for sprite in self.sprites:
+            sprite._destroyed = True
+        self.sprites = []
+        self.movers = []
+        self.pending_events = []
+        self.camera_x = 0
+        self.camera_y = 0
+        self.background_color = 0
+        self.tilemap = None
+
+
+runtime = _Runtime()
+
+
+# ---------------------------------------------------------------- images
+
+class Image:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._pixels = bytearray(width * height)
+
+    def fill(self, color):
+        self._pixels[:] = bytes([color & 0xf]) * (self.width * self.height)
+
+    def set_pixel(self, x, y, color):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self._pixels[y * self.width + x] = color & 0xf
+
+    def get_pixel(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._pixels[y * self.width + x]
+        return 0
+
+    def fill_rect(self, x, y, w, h, color):
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if x1 <= x0:
+            return
+        row = bytes([color & 0xf]) * (x1 - x0)
+        while y0 < y1:
+            start = y0 * self.width
+            self._pixels[start + x0:start + x1] = row
+            y0 += 1
+
+    def draw_rect(self, x, y, w, h, color):
+        self.fill_rect(x, y, w, 1, color)
+        self.fill_rect(x, y + h - 1, w, 1, color)
+        self.fill_rect(x, y, 1, h, color)
+        self.fill_rect(x + w - 1, y, 1, h, color)
+
+    def draw_line(self, x0, y0, x1, y1, color):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.set_pixel(x0, y0, color)
+            if x0 == x1 and y0 == y1:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def draw_circle(self, cx, cy, r, color):
+        # Midpoint circle, matching the outline-only device primitive.
+        x = r
+        y = 0
+        err = 1 - r
+        while x >= y:
+            for px, py in ((x, y), (y, x), (-y, x), (-x, y),
+                           (-x, -y), (-y, -x), (y, -x), (x, -y)):
+                self.set_pixel(cx + px, cy + py, color)
+            y += 1
+            if err < 0:
+                err += 2 * y + 1
+            else:
+                x -= 1
+                err += 2 * (y - x) + 1
+
+    def fill_circle(self, cx, cy, r, color):
+        y = -r
+        while y <= r:
+            x = -r
+            while x <= r:
+                if x * x + y * y <= r * r:
+                    self.set_pixel(cx + x, cy + y, color)
+                x += 1
+            y += 1
+
+    def print(self, text, x, y, color=1, font=None):
+        # The device font is 6x8 per glyph. Glyph shapes do not matter for
+        # profiling, but the per-pixel work does, so every glyph cell is
+        # rasterised from a pattern derived from its character code.
+        cx = x
+        for ch in str(text):
+            code = ord(ch)
+            if ch != ' ':
+                row = 0
+                while row < 7:
+                    bits = (code * (row + 3)) & 0x1f
+                    col = 0
+                    while col < 5:
+                        if bits & (1 << col):
+                            self.set_pixel(cx + col, y + row, color)
+                        col += 1
+                    row += 1
+            cx += 6
+
+    def draw_transparent_image(self, src, x, y):
+        sy = 0
+        while sy < src.height:
+            sx = 0
+            while sx < src.width:
+                c = src._pixels[sy * src.width + sx]
+                if c:
+                    self.set_pixel(x + sx, y + sy, c)
+                sx += 1
+            sy += 1
+
+    def clone(self):
+        copy = Image(self.width, self.height)
+        copy._pixels[:] = self._pixels
+        return copy
+
+    def equals(self, other):
+        return (self.width == other.width and self.height == other.height
+                and self._pixels == other._pixels)
+
+
+class _ImageNamespace:
+    @staticmethod
+    def create(width, height):
+        return Image(width, height)
+
+
+# --------------------------------------------------------------- sprites
+
+class SpriteKind:
+    player = 1
+    projectile = 2
+    food = 3
+    enemy = 4
+    _next_kind = 1000
+
+    @staticmethod
+    def create():
+        SpriteKind._next_kind += 1
+        return SpriteKind._next_kind
+
+
+class SpriteFlag:
+    GHOST = 1 << 0
+    AUTO_DESTROY = 1 << 1
+    STAY_IN_SCREEN = 1 << 2
+    DESTROY_ON_WALL = 1 << 3
+    BOUNCE_ON_WALL = 1 << 4
+    SHOW_PHYSICS = 1 << 5
+    INVISIBLE = 1 << 6
+    RELATIVE_TO_CAMERA = 1 << 8
+
+
+class Sprite:
+    def __init__(self, img, kind):
+        self.image = img
+        self._kind = kind
+        self.x = 0
+        self.y = 0
+        self.vx = 0
+        self.vy = 0
+        self.z = 0
+        self.flags = 0
+        self._data = {}
+        self._destroyed = False
+
+    @property
+    def width(self):
+        return self.image.width
+
+    @property
+    def height(self):
+        return self.image.height
+
+    @property
+    def left(self):
+        return self.x - self.image.width / 2
+
+    @left.setter
+    def left(self, value):
+        self.x = value + self.image.width / 2
+
+    @property
+    def right(self):
+        return self.x + self.image.width / 2
+
+    @right.setter
+    def right(self, value):
+        self.x = value - self.image.width / 2
+
+    @property
+    def top(self):
+        return self.y - self.image.height / 2
+
+    @top.setter
+    def top(self, value):
+        self.y = value + self.image.height / 2
+
+    @property
+    def bottom(self):
+        return self.y + self.image.height / 2
+
+    @bottom.setter
+    def bottom(self, value):
+        self.y = value - self.image.height / 2
+
+    def kind(self):
+        return self._kind
+
+    def set_kind(self, kind):
+        self._kind = kind
+
+    def set_image(self, img):
+        self.image = img
+
+    def set_position(self, x, y):
+        self.x = x
+        self.y = y
+
+    def set_velocity(self, vx, vy):
+        self.vx = vx
+        self.vy = vy
+
+    def set_flag(self, flag, on):
+        if on:
+            self.flags |= flag
+        else:
+            self.flags &= ~flag
+
+    def set_data_number(self, key, value):
+        self._data[key] = value
+
+    def data_number(self, key):
+        return self._data.get(key, 0)
+
+    def destroy(self):
+        if self._destroyed:
+            return
+        self._destroyed = True
+        if self in runtime.sprites:
+            runtime.sprites.remove(self)
+        runtime.movers = [m for m in runtime.movers if m[0] is not self]
+
+
+def _overlaps(a, b):
+    return (a.left < b.right and b.left < a.right
+            and a.top < b.bottom and b.top < a.bottom)
+
+
+class _SpritesNamespace:
+    @staticmethod
+    def create(img, kind=SpriteKind.player):
+        sprite = Sprite(img, kind)
+        sprite.x = SCREEN_WIDTH // 2 + runtime.camera_x
+        sprite.y = SCREEN_HEIGHT // 2 + runtime.camera_y
+        runtime.sprites.append(sprite)
+        return sprite
+
+    @staticmethod
+    def create_projectile_from_sprite(img, source, vx, vy):
+        proj = _SpritesNamespace.create(img, SpriteKind.projectile)
+        proj.set_position(source.x, source.y)
+        proj.set_velocity(vx, vy)
+        proj.set_flag(SpriteFlag.AUTO_DESTROY, True)
+        return proj
+
+    @staticmethod
+    def all_of_kind(kind):
+        return [s for s in runtime.sprites if s._kind == kind]
+
+    @staticmethod
+    def destroy_all_sprites_of_kind(kind):
+        for sprite in _SpritesNamespace.all_of_kind(kind):
+            sprite.destroy()
+
+    @staticmethod
+    def on_overlap(kind_a, kind_b, handler):
+        runtime.overlap_handlers.append((kind_a, kind_b, handler))
+
+
+# ----------------------------------------------------------------- scene
+
+class CameraProperty:
+    X = 0
+    Y = 1
+    LEFT = 2
+    RIGHT = 3
+    TOP = 4
+    BOTTOM = 5
+
+
+class _SceneNamespace:
+    @staticmethod
+    def set_background_color(color):
+        runtime.background_color = color
+
+    @staticmethod
+    def background_color():
+        return runtime.background_color
+
+    @staticmethod
+    def screen_width():
+        return SCREEN_WIDTH
+
+    @staticmethod
+    def screen_height():
+        return SCREEN_HEIGHT
+
+    @staticmethod
+    def center_camera_at(x, y):
+        runtime.camera_x = int(x) - SCREEN_WIDTH // 2
+        runtime.camera_y = int(y) - SCREEN_HEIGHT // 2
+
+    @staticmethod
+    def camera_property(prop):
+        if prop == CameraProperty.X:
+            return runtime.camera_x + SCREEN_WIDTH // 2
+        if prop == CameraProperty.Y:
+            return runtime.camera_y + SCREEN_HEIGHT // 2
+        if prop == CameraProperty.LEFT:
+            return runtime.camera_x
+        if prop == CameraProperty.RIGHT:
+            return runtime.camera_x + SCREEN_WIDTH
+        if prop == CameraProperty.TOP:
+            return runtime.camera_y
+        return runtime.camera_y + SCREEN_HEIGHT
+
+
+# ----------------------------------------------------------------- tiles
+
+class TileScale:
+    EIGHT = 3
+    SIXTEEN = 4
+    THIRTY_TWO = 5
+
+
+class Tilemap:
+    # Device tilemap data: a buffer with a little-endian width/height header
+    # followed by one tile index per byte, plus a 1-bit wall layer image.
+
+    def __init__(self, data, walls, tileset, scale):
+        self.data = data
+        self.walls = walls
+        self.tileset = tileset
+        self.scale = scale
+        self.width = data[0] | (data[1] << 8)
+        self.height = data[2] | (data[3] << 8)
+
+    def is_wall_at(self, x, y):
+        col = int(x) >> self.scale
+        row = int(y) >> self.scale
+        if col < 0 or row < 0 or col >= self.width or row >= self.height:
+            return False
+        return self.walls.get_pixel(col, row) != 0
+
+
+class _TilesNamespace:
+    @staticmethod
+    def create_tilemap(data, walls, tileset, scale):
+        return Tilemap(data, walls, tileset, scale)
+
+    @staticmethod
+    def set_current_tilemap(tilemap):
+        runtime.tilemap = tilemap
+
+
+# ------------------------------------------------------------ controller
+
+class ControllerButtonEvent:
+    PRESSED = 1
+    RELEASED = 2
+    REPEATED = 3
+
+
+class _Button:
+    def __init__(self, name):
+        self.name = name
+        self.pressed = False
+        self.handlers = {}
+
+    def on_event(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_pressed(self):
+        return self.pressed
+
+    def set_pressed(self, pressed):
+        if pressed == self.pressed:
+            return
+        self.pressed = pressed
+        event = ControllerButtonEvent.PRESSED if pressed else ControllerButtonEvent.RELEASED
+        handler = self.handlers.get(event)
+        if handler:
+            handler()
+
+
+class _ControllerNamespace:
+    def __init__(self):
+        self.left = _Button('left')
+        self.right = _Button('right')
+        self.up = _Button('up')
+        self.down = _Button('down')
+        self.A = _Button('A')
+        self.B = _Button('B')
+        self.menu = _Button('menu')
+        self.buttons = [self.left, self.right, self.up, self.down,
+                        self.A, self.B, self.menu]
+
+    def button(self, name):
+        for btn in self.buttons:
+            if btn.name == name:
+                return btn
+        raise KeyError(name)
+
+    def move_sprite(self, sprite, vx=100, vy=100):
+        runtime.movers = [m for m in runtime.movers if m[0] is not sprite]
+        if vx or vy:
+            runtime.movers.append((sprite, vx, vy))
+
+
+controller = _ControllerNamespace()
+
+
+# ---------------------------------------------------------- control/game
+
+class _ControlNamespace:
+    @staticmethod
+    def millis():
+        return runtime.millis
+
+    @staticmethod
+    def micros():
+        # Wall-clock, unlike millis(): code budgeting real work per frame
+        # must see how long that work actually took.
+        return int(time.perf_counter() * 1000000)
+
+    @staticmethod
+    def create_buffer(size):
+        return bytearray(size)
+
+
+class _GameNamespace:
+    @staticmethod
+    def on_update(handler):
+        runtime.update_handlers.append(handler)
+
+    @staticmethod
+    def on_update_interval(period, handler):
+        runtime.interval_handlers.append([period, runtime.millis + period, handler])
+
+    @staticmethod
+    def runtime():
+        return runtime.millis
+
+    @staticmethod
+    def splash(title, subtitle=None):
+        runtime.splashes.append(title)
+
+    @staticmethod
+    def show_long_text(text, dialog_layout=None):
+        runtime.splashes.append(text)
+
+    @staticmethod
+    def over(win=False):
+        raise GameOver(win)
+
+
+# -------------------------------------------------------------- settings
+
+class _SettingsNamespace:
+    # Flash-backed key-value store; writes are counted so benches can see
+    # how much a save costs in flash traffic.
+
+    @staticmethod
+    def write_buffer(key, value):
+        runtime.settings[key] = bytearray(value)
+        runtime.settings_writes += 1
+        runtime.settings_bytes += len(value)
+
+    @staticmethod
+    def read_buffer(key):
+        value = runtime.settings.get(key)
+        if value is None:
+            return None
+        return bytearray(value)
+
+    @staticmethod
+    def write_number(key, value):
+        runtime.settings[key] = value
+        runtime.settings_writes += 1
+        runtime.settings_bytes += 4
+
+    @staticmethod
+    def read_number(key):
+        return runtime.settings.get(key, 0)
+
+    @staticmethod
+    def exists(key):
+        return key in runtime.settings
+
+    @staticmethod
+    def remove(key):
+        runtime.settings.pop(key, None)
+
+
+# --------------------------------------------------------------- driving
+
+def press(name):
+    # Queue a press for the next frame, like a real button edge.
+    runtime.pending_events.append((name, True))
+
+
+def release(name):
+    runtime.pending_events.append((name, False))
+
+
+def tap(name):
+    press(name)
+    release(name)
+
+
+def _deliver_events():
+    # One edge per button per frame: a queued release waits for the next
+    # frame so tap() produces a press on one frame and a release on the next.
+    events = runtime.pending_events
+    runtime.pending_events = []
+    seen = set()
+    for index, (name, pressed) in enumerate(events):
+        if name in seen:
+            runtime.pending_events.extend(events[index:])
+            return
+        seen.add(name)
+        controller.button(name).set_pressed(pressed)
+
+
+def _apply_movers():
+    for sprite, vx, vy in runtime.movers:
+        dx = (1 if controller.right.pressed else 0) - (1 if controller.left.pressed else 0)
+        dy = (1 if controller.down.pressed else 0) - (1 if controller.up.pressed else 0)
+        sprite.vx = dx * vx
+        sprite.vy = dy * vy
+
+
+def _move_sprites(dt):
+    left = runtime.camera_x
+    top = runtime.camera_y
+    tilemap = runtime.tilemap
+    for sprite in list(runtime.sprites):
+        if sprite.vx or sprite.vy:
+            if tilemap is not None and not sprite.flags & SpriteFlag.GHOST:
+                _move_against_walls(sprite, tilemap, dt)
+            else:
+                sprite.x += sprite.vx * dt
+                sprite.y += sprite.vy * dt
+        flags = sprite.flags
+        if flags & SpriteFlag.STAY_IN_SCREEN:
+            if sprite.left < left:
+                sprite.left = left
+            if sprite.right > left + SCREEN_WIDTH:
+                sprite.right = left + SCREEN_WIDTH
+            if sprite.top < top:
+                sprite.top = top
+            if sprite.bottom > top + SCREEN_HEIGHT:
+                sprite.bottom = top + SCREEN_HEIGHT
+        elif flags & SpriteFlag.AUTO_DESTROY:
+            if (sprite.right < left or sprite.left > left + SCREEN_WIDTH
+                    or sprite.bottom < top or sprite.top > top + SCREEN_HEIGHT):
+                sprite.destroy()
+
+
+def _move_against_walls(sprite, tilemap, dt):
+    # Per-axis move that stops (or bounces) when the sprite centre would
+    # enter a wall tile; coarser than the device's edge tests but the same
+    # amount of per-sprite lookup work.
+    x = sprite.x + sprite.vx * dt
+    if tilemap.is_wall_at(x, sprite.y):
+        sprite.vx = -sprite.vx if sprite.flags & SpriteFlag.BOUNCE_ON_WALL else 0
+    else:
+        sprite.x = x
+    y = sprite.y + sprite.vy * dt
+    if tilemap.is_wall_at(sprite.x, y):
+        sprite.vy = -sprite.vy if sprite.flags & SpriteFlag.BOUNCE_ON_WALL else 0
+    else:
+        sprite.y = y
+
+
+def _dispatch_overlaps():
+    for kind_a, kind_b, handler in runtime.overlap_handlers:
+        group_a = [s for s in runtime.sprites if s._kind == kind_a]
+        group_b = [s for s in runtime.sprites if s._kind == kind_b]
+        for a in group_a:
+            for b in group_b:
+                if a is b or a._destroyed or b._destroyed:
+                    continue
+                if (a.flags | b.flags) & SpriteFlag.GHOST:
+                    continue
+                if _overlaps(a, b):
+                    handler(a, b)
+
+
+def _run_intervals():
+    for entry in runtime.interval_handlers:
+        if runtime.millis >= entry[1]:
+            entry[1] = runtime.millis + entry[0]
+            entry[2]()
+
+
+def step(frames=1):
+    # Advance the simulation by whole frames at a fixed FRAME_MS timestep.
+    dt = FRAME_MS / 1000.0
+    while frames > 0:
+        runtime.millis += FRAME_MS
+        runtime.frame += 1
+        _deliver_events()
+        for handler in list(runtime.update_handlers):
+            handler()
+        _apply_movers()
+        _move_sprites(dt)
+        _dispatch_overlaps()
+        _run_intervals()
+        frames -= 1
+
+
+def sprite_count(kind=None):
+    if kind is None:
+        return len(runtime.sprites)
+    return len([s for s in runtime.sprites if s._kind == kind])
+
+
+_GLOBALS = {
+    'image': _ImageNamespace,
+    'sprites': _SpritesNamespace,
+    'scene': _SceneNamespace,
+    'controller': controller,
+    'control': _ControlNamespace,
+    'game': _GameNamespace,
+    'SpriteKind': SpriteKind,
+    'SpriteFlag': SpriteFlag,
+    'CameraProperty': CameraProperty,
+    'tiles': _TilesNamespace,
+    'TileScale': TileScale,
+    'settings': _SettingsNamespace,
+    'ControllerButtonEvent': ControllerButtonEvent,
+}
+
+
+def install():
+    for name, value in _GLOBALS.items():
+        setattr(builtins, name, value)
+    return runtime
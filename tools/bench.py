@@ -0,0 +1,758 @@
+# bench.py
+# Tick-driven benchmark harness: runs the game headless on arcade_shim and
+# reports per-frame cost, allocations and sprite counts for each scene.
+#
+#   python tools/bench.py                 # every scenario, 300 frames each
+#   python tools/bench.py space -n 600    # one scenario, longer run
+#   python tools/bench.py planet-walk     # held input across planet chunk borders
+#   python tools/bench.py --memory        # add tracemalloc peak (slower)
+#   python tools/bench.py overlap         # broadphase vs naive pair scan
+#   python tools/bench.py terrain         # planet map generation per biome
+#   python tools/bench.py landing         # descent frames and worst frame
+#   python tools/bench.py save            # save size and incremental writes
+#   python tools/bench.py systems         # scheduler counters per system
+#   python tools/bench.py ai              # enemy steering cost at 4/16/64
+#   python tools/bench.py waves           # wave plans and live enemy cap
+#   python tools/bench.py profile         # profiler scopes and sprite counts
+#   python tools/bench.py route           # jump graph build and route queries
+#   python tools/bench.py menu            # station list rows painted per keypress
+#   python tools/bench.py surface         # planet chunk streaming while sweeping the surface
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import arcade_shim
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_SEED = 424242
+
+_game = None
+
+
+def load_game():
+    # Import main.py once; it registers controls and builds a galaxy on import.
+    # The import runs as a profiled build so every module's track_kind()
+    # registers; bench_profile switches the profiler on when it runs.
+    global _game
+    if _game is None:
+        arcade_shim.install()
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+        import profiler
+        profiler.ENABLED = True
+        try:
+            import main
+        finally:
+            profiler.ENABLED = False
+        _game = main
+    return _game
+
+
+def reset_game(seed=BENCH_SEED, galaxy_size=None):
+    main = load_game()
+    if galaxy_size is None:
+        galaxy_size = main.galaxy.GALAXY_SYSTEM_COUNT
+    main.game_state['galaxy_size'] = galaxy_size
+    # Leave through the normal scene teardown so pooled sprites and
+    # registered colliders are released the way the game does it.
+    if main.game_state['scene'] != main.galaxy_scene:
+        main._enter_scene(main.galaxy_scene)
+    for name in ('left', 'right', 'up', 'down', 'A', 'B', 'menu'):
+        arcade_shim.controller.button(name).set_pressed(False)
+    arcade_shim.runtime.pending_events = []
+    main.start_new_galaxy(seed)
+    return main
+
+
+class FrameStats:
+    def __init__(self, name):
+        self.name = name
+        self.frame_us = []
+        self.sprites_max = 0
+        self.sprites_end = 0
+        self.blocks_delta = 0
+        self.peak_kb = None
+        self.game_overs = 0
+
+    def report(self):
+        times = sorted(self.frame_us)
+        count = len(times)
+        if count == 0:
+            return '{:<16} (no frames)'.format(self.name)
+        mean = sum(times) / count
+        p95 = times[min(count - 1, (count * 95) // 100)]
+        line = '{:<16} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>8} {:>7} {:>7}'.format(
+            self.name, count, mean, p95, times[-1], self.blocks_delta,
+            self.sprites_max, self.sprites_end)
+        if self.peak_kb is not None:
+            line += ' {:>9.1f}'.format(self.peak_kb)
+        if self.game_overs:
+            line += '  game-over x{}'.format(self.game_overs)
+        return line
+
+
+def header(memory):
+    line = '{:<16} {:>6} {:>9} {:>9} {:>9} {:>8} {:>7} {:>7}'.format(
+        'scenario', 'frames', 'mean us', 'p95 us', 'max us', 'blocks',
+        'spr max', 'spr end')
+    if memory:
+        line += ' {:>9}'.format('peak KB')
+    return line
+
+
+def run_frames(name, frames, setup, per_frame, memory=False):
+    # setup() runs untimed; per_frame(frame) injects input before each step.
+    stats = FrameStats(name)
+    main = setup()
+    if memory:
+        tracemalloc.start()
+    blocks_start = sys.getallocatedblocks()
+    frame = 0
+    while frame < frames:
+        start = time.perf_counter()
+        try:
+            per_frame(main, frame)
+            arcade_shim.step()
+        except arcade_shim.GameOver:
+            stats.game_overs += 1
+            main = setup()
+        stats.frame_us.append((time.perf_counter() - start) * 1000000)
+        count = arcade_shim.sprite_count()
+        if count > stats.sprites_max:
+            stats.sprites_max = count
+        frame += 1
+    stats.blocks_delta = sys.getallocatedblocks() - blocks_start
+    stats.sprites_end = arcade_shim.sprite_count()
+    if memory:
+        stats.peak_kb = tracemalloc.get_traced_memory()[1] / 1024.0
+        tracemalloc.stop()
+    return stats
+
+
+# -------------------------------------------------------------- scenarios
+
+def _galaxy_setup():
+    return reset_game()
+
+
+def _galaxy_frame(main, frame):
+    # Sweep the cursor around the map and reroll the galaxy every 90 frames.
+    if frame % 90 == 89:
+        main.start_new_galaxy(BENCH_SEED + frame)
+        return
+    moves = ('right', 'right', 'down', 'left', 'left', 'up')
+    if frame % 3 == 0:
+        arcade_shim.tap(moves[(frame // 3) % len(moves)])
+
+
+def _large_galaxy_setup():
+    return reset_game(galaxy_size=4096)
+
+
+def _large_galaxy_frame(main, frame):
+    # Pan diagonally across a 64x64 galaxy so the map keeps scrolling.
+    if frame % 90 == 89:
+        main.start_new_galaxy(BENCH_SEED + frame)
+        return
+    if frame % 2 == 0:
+        arcade_shim.tap('right' if (frame // 2) % 2 == 0 else 'down')
+
+
+def _space_setup():
+    main = reset_game()
+    main.game_state['player']['hull'] = 1000
+    main.game_state['cursor_index'] = 0
+    main._enter_selected_system()
+    return main
+
+
+def _hold_towards(delta, negative, positive):
+    # Hold the direction button that closes `delta`, release the other.
+    if delta < -2:
+        want = negative
+    elif delta > 2:
+        want = positive
+    else:
+        want = None
+    for name in (negative, positive):
+        pressed = arcade_shim.controller.button(name).is_pressed()
+        if name == want and not pressed:
+            arcade_shim.press(name)
+        elif name != want and pressed:
+            arcade_shim.release(name)
+
+
+def _space_frame(main, frame):
+    # Line up under an enemy and fire; once the wave is cleared, start over.
+    state = main.game_state
+    if state.get('space_status') == 'finished':
+        main._enter_scene(main.galaxy_scene)
+        main._enter_selected_system()
+        return
+    player = state.get('space_player')
+    targets = [e for e in state.get('space_enemies', [])
+               if not e.flags & arcade_shim.SpriteFlag.INVISIBLE]
+    if player and targets:
+        target = targets[0]
+        _hold_towards(target.x - player.x, 'left', 'right')
+        _hold_towards(target.y + 30 - player.y, 'up', 'down')
+    if frame % 4 == 0:
+        arcade_shim.tap('A')
+
+
+def _planet_setup():
+    main = reset_game()
+    main.game_state['player']['hull'] = 1000
+    main.game_state['cursor_index'] = 0
+    main._enter_selected_system()
+    main._transition_to_planet()
+    return main
+
+
+def _planet_frame(main, frame):
+    # Walk a box around the surface, relanding every 150 frames.
+    if frame % 150 == 149:
+        main._enter_scene(main.galaxy_scene)
+        main._transition_to_planet()
+        return
+    leg = (frame // 25) % 4
+    if frame % 25 == 0:
+        for name in ('left', 'right', 'up', 'down'):
+            arcade_shim.release(name)
+        arcade_shim.press(('right', 'down', 'left', 'up')[leg])
+
+
+def _walk_setup():
+    # Land on the widest surface in the galaxy and wait out the descent.
+    main = reset_game()
+    main.game_state['player']['hull'] = 100000
+    import surface
+    store = main.game_state['galaxy']
+    widest = 0
+    widest_size = -1
+    for index in range(main.galaxy.system_count(store)):
+        if main.galaxy.system_planet_count(store, index) > 0:
+            size = main.galaxy.planet_descriptor(store, index, 0)['size']
+            if size > widest_size:
+                widest = index
+                widest_size = size
+    main.game_state['cursor_index'] = widest
+    main._enter_selected_system()
+    main._transition_to_planet()
+    while main.game_state['planet_status'] == 'descending':
+        arcade_shim.step()
+    return main
+
+
+def _walk_frame(main, frame):
+    # Hold diagonals with the controller, so the explorer moves by fractional
+    # steps and crosses chunk borders both ways.
+    leg = (frame // 200) % 4
+    if frame % 200 == 0:
+        for name in ('left', 'right', 'up', 'down'):
+            arcade_shim.release(name)
+        for name in (('right', 'down'), ('right', 'up'), ('left', 'up'), ('left', 'down'))[leg]:
+            arcade_shim.press(name)
+
+
+def _station_setup():
+    main = reset_game()
+    main.game_state['player']['credits'] = 1000000
+    main.game_state['active_system'] = 0
+    main._enter_scene(main.station_scene)
+    return main
+
+
+def _station_frame(main, frame):
+    # Cycle the option list and buy something every few frames.
+    if frame % 6 == 0:
+        arcade_shim.tap('down')
+    elif frame % 6 == 3:
+        arcade_shim.tap('A')
+
+
+# ---------------------------------------------------------- micro benches
+
+def _aabb(a, b):
+    return (a.left < b.right and b.left < a.right
+            and a.top < b.bottom and b.top < a.bottom)
+
+
+def bench_overlap(frames):
+    # Spatial-hash broadphase against the naive all-pairs scan that
+    # sprites.on_overlap performs, on the same moving sprite sets.
+    load_game()
+    import broadphase
+    import random
+
+    kind_a = arcade_shim.SpriteKind.create()
+    kind_b = arcade_shim.SpriteKind.create()
+    found = [0]
+
+    def count_pair(a, b):
+        found[0] += 1
+
+    broadphase.on_overlap(kind_a, kind_b, count_pair)
+    print('{:<10} {:>12} {:>12} {:>8} {:>8}'.format(
+        'entities', 'naive us', 'hash us', 'pairs', 'speedup'))
+    for total in (10, 40, 200):
+        rng = random.Random(total)
+        group_a = []
+        group_b = []
+        for i in range(total):
+            kind = kind_a if i % 2 == 0 else kind_b
+            img = arcade_shim.Image(8, 8)
+            sprite = arcade_shim.Sprite(img, kind)
+            sprite.set_position(rng.uniform(0, 320), rng.uniform(0, 240))
+            sprite.set_velocity(rng.uniform(-1.5, 1.5), rng.uniform(-1.5, 1.5))
+            (group_a if kind == kind_a else group_b).append(sprite)
+            broadphase.add(sprite)
+        everyone = group_a + group_b
+        naive_time = 0.0
+        hash_time = 0.0
+        naive_pairs = 0
+        found[0] = 0
+        for _ in range(frames):
+            for sprite in everyone:
+                sprite.x = (sprite.x + sprite.vx) % 320
+                sprite.y = (sprite.y + sprite.vy) % 240
+            start = time.perf_counter()
+            for a in group_a:
+                for b in group_b:
+                    if _aabb(a, b):
+                        naive_pairs += 1
+            naive_time += time.perf_counter() - start
+            start = time.perf_counter()
+            broadphase.step()
+            hash_time += time.perf_counter() - start
+        broadphase.clear()
+        if naive_pairs != found[0]:
+            print('  mismatch: naive {} vs hash {}'.format(naive_pairs, found[0]))
+        naive_us = naive_time * 1000000 / frames
+        hash_us = hash_time * 1000000 / frames
+        print('{:<10} {:>12.1f} {:>12.1f} {:>8} {:>7.1f}x'.format(
+            total, naive_us, hash_us, found[0], naive_us / hash_us))
+
+
+def bench_terrain(frames):
+    # Planet map generation per biome (cache misses on fresh seeds) and the
+    # cost of relanding on a cached planet.
+    load_game()
+    import galaxy
+    import terrain
+
+    runs = max(1, frames // 30)
+    print('{:<10} {:>12} {:>12} {:>8}'.format('biome', 'generate us', 'hit us', 'open %'))
+    for biome_index, biome in enumerate(galaxy.PLANET_BIOMES):
+        miss_time = 0.0
+        hit_time = 0.0
+        open_tiles = 0
+        for run in range(runs):
+            seed = BENCH_SEED + biome_index * 1000 + run
+            start = time.perf_counter()
+            slot = terrain.load(seed, biome)
+            miss_time += time.perf_counter() - start
+            start = time.perf_counter()
+            terrain.load(seed, biome)
+            hit_time += time.perf_counter() - start
+            tiles = terrain.tile_map(slot)
+            for ty in range(terrain.TERRAIN_SIZE):
+                for tx in range(terrain.TERRAIN_SIZE):
+                    if terrain.is_open(tiles, tx, ty):
+                        open_tiles += 1
+        area = runs * terrain.TERRAIN_SIZE * terrain.TERRAIN_SIZE
+        print('{:<10} {:>12.1f} {:>12.1f} {:>7.1f}%'.format(
+            biome, miss_time * 1000000 / runs, hit_time * 1000000 / runs,
+            open_tiles * 100.0 / area))
+
+
+# Landing caps: frames from touchdown to a playable surface, and the worst
+# single frame while descending (budget plus room for the rest of the frame).
+LANDING_MAX_FRAMES = 15
+LANDING_FRAME_CAP_US = 9000
+
+
+def bench_landing(frames):
+    # Land on fresh planets through the real scene code and measure how long
+    # the frame-budgeted terrain job keeps the player descending.
+    main = reset_game()
+    runs = max(1, min(main.galaxy.system_count(main.game_state['galaxy']), frames // 30))
+    print('{:<8} {:>8} {:>12} {:>12} {:>8}'.format('system', 'frames', 'total us', 'worst us', 'cap'))
+    over = 0
+    for index in range(runs):
+        main.game_state['cursor_index'] = index
+        main._enter_selected_system()
+        start = time.perf_counter()
+        main._transition_to_planet()
+        worst = (time.perf_counter() - start) * 1000000
+        total = worst
+        landing_frames = 0
+        while main.game_state['planet_status'] == 'descending':
+            start = time.perf_counter()
+            arcade_shim.step()
+            elapsed = (time.perf_counter() - start) * 1000000
+            total += elapsed
+            worst = max(worst, elapsed)
+            landing_frames += 1
+        within = landing_frames <= LANDING_MAX_FRAMES and worst <= LANDING_FRAME_CAP_US
+        if not within:
+            over += 1
+        print('{:<8} {:>8} {:>12.1f} {:>12.1f} {:>8}'.format(
+            index, landing_frames, total, worst, 'ok' if within else 'OVER'))
+        main._enter_scene(main.galaxy_scene)
+    print('caps: {} frames, {} us/frame; {} of {} landings over'.format(
+        LANDING_MAX_FRAMES, LANDING_FRAME_CAP_US, over, runs))
+
+
+def bench_save(frames):
+    # Save cost: full first write, then the incremental write after a typical
+    # event (one system visited, credits changed), and a restore round trip.
+    main = load_game()
+    import save
+
+    print('{:<10} {:>10} {:>12} {:>12} {:>12} {:>10}'.format(
+        'systems', 'save bytes', 'first blocks', 'event blocks', 'event us', 'restore'))
+    runs = max(1, frames // 10)
+    for size in (25, 4096):
+        reset_game(galaxy_size=size)
+        state = main.game_state
+        save.save(state)
+        arcade_shim.runtime.settings = {}
+        save._written[:] = [None] * len(save._written)
+        first = save.save(state)
+        event_blocks = 0
+        elapsed = 0.0
+        for run in range(runs):
+            save.mark(state['visited'], (run * 37) % size)
+            state['player']['credits'] += 5
+            state['player']['cargo'][1 + run % 3] = run & 0xff
+            start = time.perf_counter()
+            event_blocks += save.save(state)
+            elapsed += time.perf_counter() - start
+        expected = (state['galaxy_seed'], dict(state['player']), bytes(state['visited']),
+                    bytes(state['cleared']), bytes(state['collected']))
+        state['galaxy_seed'] = 0
+        restored = save.load(state)
+        actual = (state['galaxy_seed'], dict(state['player']), bytes(state['visited']),
+                  bytes(state['cleared']), bytes(state['collected']))
+        print('{:<10} {:>10} {:>12} {:>12.1f} {:>12.1f} {:>10}'.format(
+            size, save.save_bytes(), first, event_blocks / runs, elapsed * 1000000 / runs,
+            'ok' if restored and actual == expected else 'MISMATCH'))
+    reset_game()
+
+
+def bench_systems(frames):
+    # Per-system scheduler counters over the space and planet scenarios.
+    load_game()
+    import scheduler
+
+    for name, setup, per_frame in SCENARIOS:
+        if name not in ('space', 'planet'):
+            continue
+        scheduler.reset_stats()
+        steps = scheduler.step_count()
+        run_frames(name, frames, setup, per_frame)
+        print('{} ({} steps, {} over budget)'.format(
+            name, scheduler.step_count() - steps, scheduler.overrun_count()))
+        print('  {:<12} {:>6} {:>6} {:>10} {:>10}'.format('system', 'calls', 'skips', 'mean us', 'max us'))
+        for index in range(scheduler.system_count()):
+            calls = scheduler.system_calls(index)
+            mean = scheduler.system_time_us(index) / calls if calls else 0.0
+            print('  {:<12} {:>6} {:>6} {:>10.1f} {:>10}'.format(
+                scheduler.system_name(index), calls, scheduler.system_skips(index),
+                mean, scheduler.system_max_us(index)))
+
+
+def bench_ai(frames):
+    # One enemy_ai.tick() over swarms of 4, 16 and 64 mixed archetypes
+    # chasing a player that circles the arena.
+    load_game()
+    import enemy_ai
+
+    print('{:<10} {:>12} {:>14}'.format('enemies', 'tick us', 'per enemy us'))
+    for total in (4, 16, 64):
+        enemy_ai.clear()
+        player = arcade_shim.Sprite(arcade_shim.Image(12, 12), arcade_shim.SpriteKind.player)
+        enemy_ai.set_target(player)
+        swarm = []
+        for index in range(total):
+            sprite = arcade_shim.Sprite(arcade_shim.Image(10, 10), arcade_shim.SpriteKind.enemy)
+            sprite.set_position((index * 37) % 160, (index * 53) % 120)
+            swarm.append(sprite)
+            enemy_ai.add(sprite, index % enemy_ai.ARCH_COUNT, 2)
+        elapsed = 0.0
+        dt = arcade_shim.FRAME_MS / 1000.0
+        for frame in range(frames):
+            player.set_position(80 + (frame % 60) - 30, 60 + ((frame // 2) % 40) - 20)
+            for sprite in swarm:
+                sprite.x += sprite.vx * dt
+                sprite.y += sprite.vy * dt
+            start = time.perf_counter()
+            enemy_ai.tick()
+            elapsed += time.perf_counter() - start
+        tick_us = elapsed * 1000000 / frames
+        print('{:<10} {:>12.1f} {:>14.2f}'.format(total, tick_us, tick_us / total))
+    enemy_ai.clear()
+
+
+def bench_waves(frames):
+    # Wave plans across the bench galaxy, then a space run that checks the
+    # live enemy count never exceeds the cap while later waves stream in.
+    main = reset_game()
+    import combat
+    import waves
+
+    store = main.game_state['galaxy']
+    systems = main.galaxy.system_count(store)
+    plans = [0] * (waves.MAX_WAVES + 1)
+    spawns = 0
+    start = time.perf_counter()
+    for index in range(systems):
+        waves.plan(main.galaxy.system_seed(store, index), main.galaxy.system_difficulty(store, index),
+                   combat.MAX_ENEMIES, combat.enemy_ai.ARCH_COUNT)
+        plans[waves.wave_count()] += 1
+        spawns += waves.queued()
+    plan_us = (time.perf_counter() - start) * 1000000 / systems
+    waves.clear()
+    print('{} systems: {} one-wave, {} two-wave, {} three-wave; {:.1f} enemies, {:.1f} us per plan'.format(
+        systems, plans[1], plans[2], plans[3], spawns / systems, plan_us))
+
+    live_max = 0
+    wave_max = 0
+    cleared = 0
+
+    def per_frame(main, frame):
+        nonlocal live_max, wave_max, cleared
+        if main.game_state.get('space_status') == 'finished':
+            cleared += 1
+        _space_frame(main, frame)
+        live_max = max(live_max, combat.pool.live_count(combat.SPACE_ENEMY_KIND))
+        wave_max = max(wave_max, waves.wave_number())
+
+    stats = run_frames('waves', frames, _space_setup, per_frame)
+    print('space: {} encounters cleared, reached wave {}, live enemies max {} (cap {}), sprites max {}'.format(
+        cleared, wave_max, live_max, combat.MAX_ENEMIES, stats.sprites_max))
+
+
+def bench_profile(frames):
+    # Run every scenario with profiler.py switched on and print what the
+    # on-device overlay would show, per scene.
+    load_game()
+    import profiler
+
+    profiler.ENABLED = True
+    try:
+        for name, setup, per_frame in SCENARIOS:
+            profiler.reset()
+            run_frames(name, frames, setup, per_frame)
+            recent = profiler.recent_frames()
+            print('{}: {} frames, last {} mean {:.1f} us max {} us'.format(
+                name, profiler.frame_count(), len(recent),
+                sum(recent) / max(len(recent), 1), max(recent or [0])))
+            for scene_id in range(profiler.SCENE_SLOTS):
+                seen = profiler.scene_frames(scene_id)
+                scopes = []
+                for scope in range(profiler.SCOPE_COUNT):
+                    calls = profiler.scope_calls(scope, scene_id)
+                    if calls:
+                        scopes.append('{} {}x {:.0f}/{} us'.format(
+                            profiler.SCOPE_NAMES[scope], calls,
+                            profiler.scope_total_us(scope, scene_id) / calls,
+                            profiler.scope_max_us(scope, scene_id)))
+                if seen or scopes:
+                    mean = profiler.scene_frame_us(scene_id) / seen if seen else 0.0
+                    print('  scene {} {:>5} frames {:>8.1f} us  {}'.format(
+                        scene_id, seen, mean, ', '.join(scopes)))
+            print('  sprites ' + ' '.join('{} {}/{}'.format(
+                profiler.kind_name(index), profiler.kind_live(index), profiler.kind_max(index))
+                for index in range(profiler.kind_count())))
+    finally:
+        profiler.ENABLED = False
+
+
+def bench_route(frames):
+    # Jump graph build and each route query at 25, 1024 and 4096 systems;
+    # the cached column repeats the station query with the same start/fuel.
+    load_game()
+    import galaxy
+    import route
+
+    print('{:<8} {:>7} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'systems', 'edges', 'build ms', 'path ms', 'station ms', 'reach ms', 'cached us'))
+    for count in (25, 1024, 4096):
+        store = galaxy.build_galaxy(BENCH_SEED, count)
+        last = galaxy.system_count(store) - 1
+        start = time.perf_counter()
+        route.build(store)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        route.path(store, 0, last)
+        path_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        route.nearest_station(store, last // 2, 255)
+        station_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        route.reachable(store, last // 2, 40)
+        reach_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(frames):
+            route.nearest_station(store, last // 2, 255)
+        cached_us = (time.perf_counter() - start) * 1000000 / frames
+        print('{:<8} {:>7} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+            count, route.edge_end(last), build_ms, path_ms, station_ms, reach_ms, cached_us))
+    route.invalidate()
+
+
+def bench_menu(frames):
+    # Station menu keypresses: rows painted and time per cursor move, for
+    # the station's own list and for a long synthetic list.
+    main = _station_setup()
+    import listview
+    import station
+
+    state = main.game_state
+    print('{:<10} {:>6} {:>12} {:>10} {:>10}'.format('list', 'rows', 'rows/press', 'us/press', 'max us'))
+    for name, count in (('station', len(station._entry_kind)), ('long', 60)):
+        if name == 'long':
+            listview.show(0, station.LIST_TOP, 160, station.LIST_ROWS, count, lambda index: 'Item {}'.format(index), 'Long')
+        before = listview.rows_drawn()
+        elapsed = 0.0
+        worst = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            if name == 'station':
+                station.handle_direction(state, 0, 1)
+            else:
+                listview.move(1)
+            spent = time.perf_counter() - start
+            elapsed += spent
+            worst = max(worst, spent)
+        print('{:<10} {:>6} {:>12.2f} {:>10.1f} {:>10.1f}'.format(
+            name, count, (listview.rows_drawn() - before) / frames, elapsed * 1000000 / frames, worst * 1000000))
+    main._enter_scene(main.galaxy_scene)
+
+
+def bench_surface(frames):
+    # Land on planets of each surface width and sweep the explorer across
+    # the whole surface row by row, checking live chunks and sprites stay
+    # bounded while chunks stream in and out.
+    main = reset_game()
+    main.game_state['player']['hull'] = 100000
+    import planet
+    import surface
+
+    store = main.game_state['galaxy']
+    landings = {}
+    for index in range(main.galaxy.system_count(store)):
+        if main.galaxy.system_planet_count(store, index) > 0:
+            size = main.galaxy.planet_descriptor(store, index, 0)['size']
+            side = max(surface.MIN_CHUNKS_PER_SIDE, min(surface.MAX_CHUNKS_PER_SIDE, size // surface.SIZE_PER_CHUNK))
+            landings.setdefault(side, index)
+    print('{:<6} {:>6} {:>7} {:>8} {:>8} {:>6} {:>6} {:>8} {:>9}'.format(
+        'system', 'chunks', 'frames', 'entered', 'live max', 'res', 'enemy', 'spr max', 'mean us'))
+    for side in sorted(landings):
+        index = landings[side]
+        main.game_state['cursor_index'] = index
+        main._enter_selected_system()
+        main._transition_to_planet()
+        while main.game_state['planet_status'] == 'descending':
+            arcade_shim.step()
+        explorer = main.game_state['planet_player']
+        extent = surface.extent_px()
+        entered = 0
+        original = planet._enter_chunk
+
+        def counting(chunk):
+            nonlocal entered
+            entered += 1
+            original(chunk)
+
+        planet._enter_chunk = counting
+        live_max = res_max = enemy_max = sprites_max = 0
+        elapsed = 0.0
+        steps = 0
+        row = 60
+        while row < extent and steps < frames * 10:
+            x = 80
+            while x < extent and steps < frames * 10:
+                explorer.set_position(x if (row // 120) % 2 == 0 else extent - x, row)
+                start = time.perf_counter()
+                arcade_shim.step()
+                elapsed += time.perf_counter() - start
+                live_max = max(live_max, surface.live_count())
+                res_max = max(res_max, planet.pool.live_count(planet.PLANET_RESOURCE_KIND))
+                enemy_max = max(enemy_max, planet.pool.live_count(planet.PLANET_ENEMY_KIND))
+                sprites_max = max(sprites_max, arcade_shim.sprite_count())
+                x += 8
+                steps += 1
+            row += 120
+        planet._enter_chunk = original
+        print('{:<6} {:>6} {:>7} {:>8} {:>8} {:>6} {:>6} {:>8} {:>9.1f}'.format(
+            index, '{}x{}'.format(side, side), steps, entered, live_max, res_max, enemy_max,
+            sprites_max, elapsed * 1000000 / max(steps, 1)))
+        main._enter_scene(main.galaxy_scene)
+    print('caps: {} live chunks, {} resources, {} enemies'.format(
+        surface.LIVE_CHUNKS_MAX, planet.MAX_RESOURCES, planet.MAX_GROUND_ENEMIES))
+
+
+MICRO_BENCHES = [
+    ('overlap', bench_overlap),
+    ('terrain', bench_terrain),
+    ('landing', bench_landing),
+    ('save', bench_save),
+    ('systems', bench_systems),
+    ('ai', bench_ai),
+    ('waves', bench_waves),
+    ('profile', bench_profile),
+    ('route', bench_route),
+    ('menu', bench_menu),
+    ('surface', bench_surface),
+]
+
+
+SCENARIOS = [
+    ('galaxy', _galaxy_setup, _galaxy_frame),
+    ('galaxy-4k', _large_galaxy_setup, _large_galaxy_frame),
+    ('space', _space_setup, _space_frame),
+    ('planet', _planet_setup, _planet_frame),
+    ('planet-walk', _walk_setup, _walk_frame),
+    ('station', _station_setup, _station_frame),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless SpaceGame benchmarks')
+    parser.add_argument('scenarios', nargs='*',
+                        help='scenario names (default: all)')
+    parser.add_argument('-n', '--frames', type=int, default=300,
+                        help='simulated frames per scenario')
+    parser.add_argument('--memory', action='store_true',
+                        help='track peak Python heap with tracemalloc')
+    args = parser.parse_args(argv)
+
+    names = [entry[0] for entry in SCENARIOS]
+    micro_names = [entry[0] for entry in MICRO_BENCHES]
+    selected = args.scenarios or (names + micro_names)
+    unknown = [name for name in selected if name not in names + micro_names]
+    if unknown:
+        parser.error('unknown scenario(s): ' + ', '.join(unknown))
+
+    if any(name in selected for name in names):
+        print(header(args.memory))
+    for name, setup, per_frame in SCENARIOS:
+        if name in selected:
+            stats = run_frames(name, args.frames, setup, per_frame, args.memory)
+            print(stats.report())
+    for name, bench in MICRO_BENCHES:
+        if name in selected:
+            print()
+            print('[{}]'.format(name))
+            bench(args.frames)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# check_golden.py
+# Golden-value check: existing seeds must keep producing the same galaxies,
+# planet maps and encounter spawns. Run after touching any RNG or worldgen
+# code; exits non-zero on a mismatch.
+#
+#   python tools/check_golden.py          # compare against GOLDEN
+#   python tools/check_golden.py --print  # print current values
+
+import sys
+import zlib
+
+import arcade_shim
+import bench
+
+SEEDS = [1, 424242, 0xdeadbeef]
+
+# Recorded from the per-module LCGs before they were merged into rng.py.
+GOLDEN = {
+    'encounter:1': 0xaaf6953e,
+    'encounter:3735928559': 0x6544342e,
+    'encounter:424242': 0xb92ace8e,
+    'galaxy:1': 0x36c407bf,
+    'galaxy:3735928559': 0xa085c085,
+    'galaxy:424242': 0x5d5b69ec,
+    'terrain:1': 0xc5e8e541,
+    'terrain:3735928559': 0xa52b6a2f,
+    'terrain:424242': 0xf6c27ce0,
+}
+
+
+def _crc(values):
+    return zlib.crc32(repr(values).encode('ascii')) & 0xffffffff
+
+
+def galaxy_values(main, seed):
+    galaxy = main.galaxy
+    store = galaxy.build_galaxy(seed, 64)
+    systems = []
+    for index in range(galaxy.system_count(store)):
+        planets = []
+        for p in range(galaxy.system_planet_count(store, index)):
+            planets.append(sorted(galaxy.planet_descriptor(store, index, p).items()))
+        systems.append((galaxy.system_star_type(store, index),
+                        galaxy.system_difficulty(store, index),
+                        galaxy.system_has_station(store, index),
+                        galaxy.system_seed(store, index),
+                        planets))
+    return systems
+
+
+def terrain_values(main, seed):
+    import terrain
+    maps = []
+    for biome in main.galaxy.PLANET_BIOMES:
+        slot = terrain.load(seed, biome)
+        maps.append(bytes(terrain.tile_map(slot)))
+    return maps
+
+
+def encounter_values(main, seed):
+    # Enemy wave of system 0 and the surface spawns of its first planet.
+    main = bench.reset_game(seed)
+    main.game_state['cursor_index'] = 0
+    main.game_state['player']['hull'] = 1000
+    main._enter_selected_system()
+    enemies = [(e.x, e.y, e.vx, e.vy) for e in main.game_state['space_enemies']]
+    main._transition_to_planet()
+    while main.game_state['planet_status'] == 'descending':
+        arcade_shim.step()
+    nodes = [(n.x, n.y) for n in main.game_state['planet_resources']]
+    ground = [(e.x, e.y, e.vx, e.vy) for e in main.game_state['planet_enemies']]
+    main._enter_scene(main.galaxy_scene)
+    return enemies, nodes, ground
+
+
+def property_checks(main):
+    # Jump-ahead and batch draws must agree with plain sequential draws, the
+    # split 16-bit multiply with the full product it stands in for, and
+    # regenerate_system() and system_header() with the store they shortcut.
+    import rng
+    checks = []
+    for make in (rng.world, rng.encounter):
+        split = make(0xfffffff)
+        state, multiplier, increment, mask = split
+        same = True
+        for _ in range(1000):
+            state = (multiplier * state + increment) & mask
+            same = same and rng.next_value(split) == state
+        checks.append(('split ' + make.__name__, same))
+        for draws in (0, 1, 7, 1000, 123457):
+            stepped = make(99)
+            for _ in range(draws):
+                rng.next_value(stepped)
+            checks.append(('skip {} x{}'.format(make.__name__, draws),
+                           rng.skip(make(99), draws)[0] == stepped[0]))
+        looped = make(5)
+        expected = [rng.between(looped, -3, 40) for _ in range(50)]
+        batched = make(5)
+        checks.append(('fill ' + make.__name__,
+                       rng.fill(batched, 50, -3, 40) == expected and batched[0] == looped[0]))
+    galaxy = main.galaxy
+    for seed in SEEDS:
+        store = galaxy.build_galaxy(seed, 64)
+        same = all(galaxy.regenerate_system(seed, index) == galaxy.planet_descriptor(store, index, 0)
+                   for index in range(64))
+        checks.append(('regenerate {}'.format(seed), same))
+        same = all(galaxy.system_header(seed, index)
+                   == galaxy.STAR_TYPES.index(galaxy.system_star_type(store, index)) * 2
+                   + (1 if galaxy.system_has_station(store, index) else 0)
+                   for index in range(64))
+        checks.append(('header {}'.format(seed), same))
+    return checks
+
+
+def current_values():
+    main = bench.load_game()
+    values = {}
+    for seed in SEEDS:
+        values['galaxy:{}'.format(seed)] = _crc(galaxy_values(main, seed))
+        values['terrain:{}'.format(seed)] = _crc(terrain_values(main, seed))
+        values['encounter:{}'.format(seed)] = _crc(encounter_values(main, seed))
+    return values
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    values = current_values()
+    if '--print' in argv:
+        for key in sorted(values):
+            print("    '{}': 0x{:08x},".format(key, values[key]))
+        return 0
+    failures = 0
+    for key in sorted(GOLDEN):
+        status = 'ok'
+        if values.get(key) != GOLDEN[key]:
+            status = 'MISMATCH (got 0x{:08x})'.format(values.get(key, 0))
+            failures += 1
+        print('{:<22} {}'.format(key, status))
+    for name, ok in property_checks(bench.load_game()):
+        if not ok:
+            failures += 1
+        print('{:<22} {}'.format(name, 'ok' if ok else 'FAILED'))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
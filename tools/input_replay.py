@@ -0,0 +1,167 @@
+# input_replay.py
+# Record and play back input runs headless through replay.py.
+#
+#   python tools/input_replay.py record run.rp -n 3000    # seeded random input
+#   python tools/input_replay.py play run.rp              # as fast as possible
+#   python tools/input_replay.py play run.rp --realtime   # paced at FRAME_MS
+#   python tools/input_replay.py verify -n 3000           # record, replay, compare
+#
+# A recording holds the galaxy seed and size plus the per-step button masks,
+# so playing it in a fresh process reproduces the run exactly. Both commands
+# print a digest of the final game state; equal digests mean the replay
+# matched. Frame timings make a recording a fixed benchmark scenario.
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import arcade_shim
+import bench
+
+BUTTONS = ('left', 'right', 'up', 'down', 'A', 'B', 'menu')
+DIRECTIONS = (None, 'left', 'right', 'up', 'down')
+
+
+def digest(main):
+    # CRC of the scene, the player record and every visible sprite.
+    state = main.game_state
+    visible = [(s.kind(), round(s.x, 3), round(s.y, 3)) for s in arcade_shim.runtime.sprites
+               if not s.flags & arcade_shim.SpriteFlag.INVISIBLE]
+    values = (state['scene'], sorted(state['player'].items()), visible)
+    return zlib.crc32(repr(values).encode('ascii')) & 0xffffffff
+
+
+def _timing(frame_us):
+    if not frame_us:
+        return 'no frames'
+    ordered = sorted(frame_us)
+    return 'mean {:.1f} us, p95 {:.1f} us, max {:.1f} us'.format(
+        sum(frame_us) / len(frame_us), ordered[int(len(ordered) * 0.95)], ordered[-1])
+
+
+def record(path, frames, seed, input_seed):
+    bench.load_game()
+    import replay
+    replay.RECORD = True
+    main = bench.reset_game(seed)
+    chooser = random.Random(input_seed)
+    held = None
+    ended = ''
+    frame = 0
+    while frame < frames:
+        if replay.runs_left() == 0:
+            # Stop while every step so far is still in the buffer.
+            ended = ' (recording buffer full)'
+            break
+        # Hold a direction for a while, tap A often, B and menu now and then.
+        if chooser.random() < 0.08:
+            wanted = chooser.choice(DIRECTIONS)
+            if wanted != held:
+                if held is not None:
+                    arcade_shim.release(held)
+                if wanted is not None:
+                    arcade_shim.press(wanted)
+                held = wanted
+        roll = chooser.random()
+        if roll < 0.25:
+            arcade_shim.tap('A')
+        elif roll < 0.29:
+            arcade_shim.tap('B')
+        elif roll < 0.30:
+            arcade_shim.tap('menu')
+        try:
+            arcade_shim.step()
+        except arcade_shim.GameOver:
+            ended = ' (ended by game over)'
+            frame += 1
+            break
+        frame += 1
+    replay.stop_recording()
+    data = replay.recording()
+    with open(path, 'wb') as handle:
+        handle.write(bytes(data))
+    print('recorded {} frames in {} bytes ({} runs), seed {}{}'.format(
+        frame, len(data), (len(data) - replay.HEADER_SIZE) // 2, seed, ended))
+    print('digest 0x{:08x}'.format(digest(main)))
+    return digest(main)
+
+
+def play(path, realtime):
+    main = bench.load_game()
+    import replay
+    with open(path, 'rb') as handle:
+        data = bytearray(handle.read())
+    if not replay.is_valid(data):
+        print('{}: not a replay recording'.format(path))
+        return None
+    main.game_state['galaxy_size'] = replay.recorded_galaxy_size(data)
+    main.start_new_galaxy(replay.recorded_seed(data))
+    replay.play(data)
+    steps = replay.recorded_steps(data)
+    frame_us = []
+    started = time.perf_counter()
+    frame = 0
+    while frame < steps:
+        start = time.perf_counter()
+        try:
+            arcade_shim.step()
+        except arcade_shim.GameOver:
+            frame += 1
+            break
+        frame_us.append((time.perf_counter() - start) * 1000000)
+        if realtime:
+            time.sleep(max(0.0, arcade_shim.FRAME_MS / 1000.0 - (time.perf_counter() - start)))
+        frame += 1
+    elapsed = time.perf_counter() - started
+    print('played {} frames in {:.2f} s ({:.0f}x real time); {}'.format(
+        frame, elapsed, frame * arcade_shim.FRAME_MS / 1000.0 / max(elapsed, 1e-9), _timing(frame_us)))
+    print('digest 0x{:08x}'.format(digest(main)))
+    return digest(main)
+
+
+def verify(frames, seed, input_seed):
+    # Record here, replay in a fresh interpreter, and compare digests.
+    handle, path = tempfile.mkstemp(suffix='.rp')
+    os.close(handle)
+    try:
+        expected = record(path, frames, seed, input_seed)
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), 'play', path],
+                                capture_output=True, text=True)
+        print(result.stdout, end='')
+        matched = 'digest 0x{:08x}'.format(expected) in result.stdout
+        print('replay matches' if matched else 'REPLAY DIVERGED')
+        return 0 if matched else 1
+    finally:
+        os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record and replay SpaceGame input')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rec = commands.add_parser('record', help='record seeded random input')
+    rec.add_argument('path')
+    ply = commands.add_parser('play', help='play a recording back')
+    ply.add_argument('path')
+    ply.add_argument('--realtime', action='store_true', help='pace frames at FRAME_MS')
+    ver = commands.add_parser('verify', help='record, replay in a new process, compare')
+    for sub in (rec, ver):
+        sub.add_argument('-n', '--frames', type=int, default=3000)
+        sub.add_argument('--seed', type=int, default=bench.BENCH_SEED)
+        sub.add_argument('--input-seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record(args.path, args.frames, args.seed, args.input_seed)
+        return 0
+    if args.command == 'play':
+        return 0 if play(args.path, args.realtime) is not None else 1
+    return verify(args.frames, args.seed, args.input_seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
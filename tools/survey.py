@@ -0,0 +1,272 @@
+# survey.py
+# Offline galaxy survey: generate whole seed ranges with galaxy.py on every
+# core and write a compact binary index that answers seed queries quickly.
+#
+#   python tools/survey.py build survey.idx --start 0 --count 1000000
+#   python tools/survey.py query survey.idx --min-stations 5 --system0-biome crystal
+#
+# Index layout (little-endian):
+#   header   MAGIC, version, record size, galaxy size, first seed, seed count,
+#            bitmap count
+#   records  one RECORD_SIZE record per seed, in seed order
+#   bitmaps  per bitmap: u16 name length, name, then ceil(count / 8) bytes of
+#            a bitset over record numbers
+# Queries AND the bitsets for their predicates as Python integers, so they
+# cost a few big-int operations rather than a pass over every record.
+
+import argparse
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import galaxy  # noqa: E402  (device module; pure Python, needs no shim)
+
+MAGIC = b'SGSV'
+VERSION = 2
+HEADER = struct.Struct('<4sHHHIII')
+CHUNK_SEEDS = 4096
+
+# Record: stations, planets, difficulty histogram (1..4), per-biome planet
+# counts, system 0 biome mask, system 0 difficulty, system 0 flags, padding.
+# Counts are u16, so a galaxy may hold up to MAX_SIZE systems.
+RECORD = struct.Struct('<HH4H6HBBBx')
+RECORD_SIZE = RECORD.size
+MAX_SIZE = 0xffff // galaxy.MAX_PLANETS
+DIFFICULTY_LEVELS = 4
+# Station-count thresholds with a precomputed bitmap; higher minimums are
+# answered from the records of the last thresholded set.
+STATION_BITMAPS = 12
+
+
+def survey_seed(store, seed):
+    # Stats for one galaxy, generated system by system into a one-slot store.
+    store['seed'] = seed
+    stations = 0
+    planets = 0
+    difficulty = [0] * DIFFICULTY_LEVELS
+    biomes = [0] * len(galaxy.PLANET_BIOMES)
+    system0_mask = 0
+    system0_difficulty = 0
+    system0_flags = 0
+    for index in range(store['count']):
+        galaxy._generate_system(store, 0, index)
+        count = store['planet_count'][0]
+        level = store['system_difficulty'][0]
+        flags = store['system_flags'][0]
+        if flags & galaxy.SYSTEM_FLAG_STATION:
+            stations += 1
+        planets += count
+        difficulty[level - 1] += 1
+        for p in range(count):
+            biome = store['planet_biome'][p]
+            biomes[biome] += 1
+            if index == 0:
+                system0_mask |= 1 << biome
+        if index == 0:
+            system0_difficulty = level
+            system0_flags = flags
+    return RECORD.pack(stations, planets, *difficulty, *biomes,
+                       system0_mask, system0_difficulty, system0_flags)
+
+
+def bitmap_names():
+    names = ['stations>={}'.format(k) for k in range(1, STATION_BITMAPS + 1)]
+    names += ['has:' + biome for biome in galaxy.PLANET_BIOMES]
+    names += ['system0:' + biome for biome in galaxy.PLANET_BIOMES]
+    names += ['system0-difficulty:{}'.format(d) for d in range(1, DIFFICULTY_LEVELS + 1)]
+    names.append('system0-station')
+    return names
+
+
+def _record_bits(record):
+    # Membership of one record in each bitmap, in bitmap_names() order.
+    fields = RECORD.unpack(record)
+    stations = fields[0]
+    biome_counts = fields[6:12]
+    mask = fields[12]
+    bits = []
+    for k in range(1, STATION_BITMAPS + 1):
+        bits.append(stations >= k)
+    for b in range(len(galaxy.PLANET_BIOMES)):
+        bits.append(biome_counts[b] > 0)
+    for b in range(len(galaxy.PLANET_BIOMES)):
+        bits.append((mask >> b) & 1 == 1)
+    for d in range(1, DIFFICULTY_LEVELS + 1):
+        bits.append(fields[13] == d)
+    bits.append(fields[14] & galaxy.SYSTEM_FLAG_STATION != 0)
+    return bits
+
+
+def survey_chunk(job):
+    # Worker entry: (first seed, seed count, galaxy size) -> records plus one
+    # chunk-local bitset per bitmap.
+    first, count, size = job
+    store = galaxy._new_store(0, size, 1)
+    records = bytearray()
+    bitmaps = [0] * len(bitmap_names())
+    for offset in range(count):
+        record = survey_seed(store, (first + offset) & 0xffffffff)
+        records += record
+        for slot, member in enumerate(_record_bits(record)):
+            if member:
+                bitmaps[slot] |= 1 << offset
+    return first, bytes(records), bitmaps
+
+
+def build(path, start, count, size, jobs):
+    names = bitmap_names()
+    bitmaps = [0] * len(names)
+    jobs_list = []
+    seed = start
+    while seed < start + count:
+        chunk = min(CHUNK_SEEDS, start + count - seed)
+        jobs_list.append((seed, chunk, size))
+        seed += chunk
+    began = time.perf_counter()
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, size, start, count, len(names)))
+        with multiprocessing.Pool(jobs) as workers:
+            # imap keeps results in seed order, so records stream straight out.
+            for first, records, chunk_bits in workers.imap(survey_chunk, jobs_list):
+                out.write(records)
+                shift = first - start
+                for slot, bits in enumerate(chunk_bits):
+                    if bits:
+                        bitmaps[slot] |= bits << shift
+        byte_count = (count + 7) // 8
+        for name, bits in zip(names, bitmaps):
+            encoded = name.encode('ascii')
+            out.write(struct.pack('<H', len(encoded)))
+            out.write(encoded)
+            out.write(bits.to_bytes(byte_count, 'little'))
+    elapsed = time.perf_counter() - began
+    print('surveyed {} seeds in {:.1f}s ({:.0f} seeds/s, {} workers) -> {}'.format(
+        count, elapsed, count / elapsed, jobs, path))
+
+
+class SurveyIndex:
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            data = source.read()
+        magic, version, record_size, size, start, count, bitmap_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError('{} is not a version {} survey index'.format(path, VERSION))
+        self.galaxy_size = size
+        self.start = start
+        self.count = count
+        offset = HEADER.size
+        self.records = memoryview(data)[offset:offset + count * RECORD_SIZE]
+        offset += count * RECORD_SIZE
+        byte_count = (count + 7) // 8
+        self.bitmaps = {}
+        for _ in range(bitmap_count):
+            length = struct.unpack_from('<H', data, offset)[0]
+            name = bytes(data[offset + 2:offset + 2 + length]).decode('ascii')
+            offset += 2 + length
+            self.bitmaps[name] = int.from_bytes(data[offset:offset + byte_count], 'little')
+            offset += byte_count
+
+    def record(self, number):
+        return RECORD.unpack_from(self.records, number * RECORD_SIZE)
+
+    def select(self, min_stations=0, has_biomes=(), system0_biomes=(),
+               system0_difficulty=None, system0_station=False):
+        # Bitset of matching record numbers.
+        selected = (1 << self.count) - 1
+        if min_stations > 0:
+            selected &= self.bitmaps['stations>={}'.format(min(min_stations, STATION_BITMAPS))]
+        for biome in has_biomes:
+            selected &= self.bitmaps['has:' + biome]
+        for biome in system0_biomes:
+            selected &= self.bitmaps['system0:' + biome]
+        if system0_difficulty is not None:
+            selected &= self.bitmaps['system0-difficulty:{}'.format(system0_difficulty)]
+        if system0_station:
+            selected &= self.bitmaps['system0-station']
+        if min_stations > STATION_BITMAPS:
+            for number in list(_set_bits(selected)):
+                if self.record(number)[0] < min_stations:
+                    selected &= ~(1 << number)
+        return selected
+
+
+def _set_bits(bits):
+    # Record numbers in a bitset, lowest first.
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def describe(index, number):
+    fields = index.record(number)
+    biomes = ' '.join('{}:{}'.format(name[:3], fields[6 + b])
+                      for b, name in enumerate(galaxy.PLANET_BIOMES) if fields[6 + b])
+    return 'seed {:>10}  stations {:>2}  planets {:>2}  difficulty {}  {}'.format(
+        (index.start + number) & 0xffffffff, fields[0], fields[1],
+        '/'.join(str(v) for v in fields[2:6]), biomes)
+
+
+def query(args):
+    loaded = time.perf_counter()
+    index = SurveyIndex(args.index)
+    began = time.perf_counter()
+    selected = index.select(args.min_stations, args.has_biome, args.system0_biome,
+                            args.system0_difficulty, args.system0_station)
+    matches = bin(selected).count('1')
+    first = []
+    for number in _set_bits(selected):
+        if len(first) >= args.limit:
+            break
+        first.append(number)
+    elapsed = (time.perf_counter() - began) * 1000
+    for number in first:
+        print(describe(index, number))
+    print('{} of {} seeds match ({:.1f} ms query, {:.1f} ms load)'.format(
+        matches, index.count, elapsed, (began - loaded) * 1000))
+
+
+def _galaxy_size(text):
+    size = int(text)
+    if size < 1 or size > MAX_SIZE:
+        raise argparse.ArgumentTypeError('galaxy size must be 1..{}'.format(MAX_SIZE))
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline galaxy seed survey')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='generate a seed range into an index')
+    build_cmd.add_argument('index')
+    build_cmd.add_argument('--start', type=int, default=0)
+    build_cmd.add_argument('--count', type=int, default=100000)
+    build_cmd.add_argument('--size', type=_galaxy_size, default=galaxy.GALAXY_SYSTEM_COUNT,
+                           help='systems per galaxy')
+    build_cmd.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    query_cmd = commands.add_parser('query', help='list seeds matching predicates')
+    query_cmd.add_argument('index')
+    query_cmd.add_argument('--min-stations', type=int, default=0)
+    query_cmd.add_argument('--has-biome', action='append', default=[],
+                           choices=galaxy.PLANET_BIOMES)
+    query_cmd.add_argument('--system0-biome', action='append', default=[],
+                           choices=galaxy.PLANET_BIOMES)
+    query_cmd.add_argument('--system0-difficulty', type=int,
+                           choices=range(1, DIFFICULTY_LEVELS + 1))
+    query_cmd.add_argument('--system0-station', action='store_true')
+    query_cmd.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        build(args.index, args.start, args.count, args.size, args.jobs)
+    else:
+        query(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# waves.py
+# Seeded wave director for space encounters.
+#
+# plan() rolls the whole encounter up front: 1-3 waves whose spawns are
+# packed into one int each (archetype, position, velocity) in a flat queue.
+# Combat pulls spawns with next_spawn() whenever a live slot frees up, so
+# queued enemies cost one int each until they are on screen.
+
+import rng
+
+MAX_WAVES = 3
+# Later waves bring WAVE_BASE + difficulty enemies and enter near the top.
+WAVE_BASE = 3
+ENTRY_MAX_Y = 30
+
+# Archetypes and the wave count come from their own streams so the spawn
+# positions of the first wave stay as before.
+ARCHETYPE_SALT = 0x5eed
+WAVE_SALT = 0x3a7e
+
+# Spawn layout: archetype bits 0-1, x bits 2-9, y bits 10-16, vx + 40 bits
+# 17-23, vy + 40 bits 24-30.
+VELOCITY_BIAS = 40
+
+_queue = []
+# Queue index one past the last spawn of each wave.
+_wave_end = []
+_next = 0
+_wave = 0
+
+
+def plan(seed, difficulty, first_size, archetype_count):
+    global _next, _wave
+    clear()
+    gen = rng.encounter(seed)
+    archetypes = rng.encounter(seed ^ ARCHETYPE_SALT)
+    waves = rng.encounter(seed ^ WAVE_SALT)
+    total = 1 + rng.below(waves, difficulty + 1)
+    if total > MAX_WAVES:
+        total = MAX_WAVES
+    size = first_size
+    top = 110
+    wave = 0
+    while wave < total:
+        count = 0
+        while count < size:
+            archetype = rng.below(archetypes, archetype_count)
+            x = rng.between(gen, 10, 150)
+            y = rng.between(gen, 10, top)
+            vx = rng.between(gen, -40, 40) + VELOCITY_BIAS
+            vy = rng.between(gen, -40, 40) + VELOCITY_BIAS
+            _queue.append(archetype | (x << 2) | (y << 10) | (vx << 17) | (vy << 24))
+            count += 1
+        _wave_end.append(len(_queue))
+        size = WAVE_BASE + difficulty
+        top = ENTRY_MAX_Y
+        wave += 1
+    _next = 0
+    _wave = 0
+
+
+def clear():
+    global _next, _wave
+    while len(_queue) > 0:
+        _queue.pop()
+    while len(_wave_end) > 0:
+        _wave_end.pop()
+    _next = 0
+    _wave = 0
+
+
+def next_spawn():
+    # The next packed spawn of the current wave, or -1 once it is used up.
+    global _next
+    if _wave >= len(_wave_end) or _next >= _wave_end[_wave]:
+        return -1
+    spawn = _queue[_next]
+    _next += 1
+    return spawn
+
+
+def start_next_wave():
+    # Move on once the current wave is spent; False when none are left.
+    global _wave
+    if _wave + 1 >= len(_wave_end):
+        return False
+    _wave += 1
+    return True
+
+
+def wave_number():
+    return _wave + 1
+
+
+def wave_count():
+    return len(_wave_end)
+
+
+def queued():
+    return len(_queue) - _next
+
+
+def spawn_archetype(spawn):
+    return spawn & 3
+
+
+def spawn_x(spawn):
+    return (spawn >> 2) & 0xff
+
+
+def spawn_y(spawn):
+    return (spawn >> 10) & 0x7f
+
+
+def spawn_vx(spawn):
+    return ((spawn >> 17) & 0x7f) - VELOCITY_BIAS
+
+
+def spawn_vy(spawn):
+    return ((spawn >> 24) & 0x7f) - VELOCITY_BIAS